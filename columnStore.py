@@ -0,0 +1,931 @@
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+Compact, columnar storage for the large reference data sets (e.g. G-NAF addresses)
+
+A column file holds a set of named, fixed width columns (Python array module typecodes),
+a set of named string tables (lists of strings, referenced from the columns by index)
+and a small amount of JSON meta data. The file layout is
+
+    MAGIC
+    8 byte little endian length of the JSON header
+    JSON header (byte order, meta data, plus the offset/length/typecode of every column and string table)
+    the columns and string tables, each aligned on an 8 byte boundary
+
+readColumnFile() memory maps the file, so the columns are never read into memory;
+they are returned as memoryviews, cast to their typecode, which can be indexed like arrays.
+The string tables are decoded into lists of strings.
+
+A MeshBlockTable is the ABS mesh block to SA1 mapping (from MB_2021_AUST.zip), compiled into a column file alongside MB_2021_AUST.zip,
+so that it can be memory mapped, in milliseconds, rather than read from the zip file every time.
+
+A PMIStore holds the records of a PMI file (e.g. master.csv from mkPMI.py) compactly - one interned string index per column per record,
+integer UR numbers and a bitset for each of the Alias, Merged and Deleted flags - so that it can be read in one pass and accessed by row number.
+The unused UR numbers, in the range of UR numbers, are described by the gaps of the sorted UR numbers, found in one linear pass.
+
+A NameTable is a names file (e.g. AustralianSurnames.csv), compiled into a column file alongside the names file,
+holding the count and the cumulative count of every name, and the names themselves as one block of utf-8 text,
+so that a name is only decoded when it is selected.
+
+SYNOPSIS
+    from columnStore import AddressStore
+
+    builder = AddressStoreBuilder()
+    builder.add(sa1, StreetNumber, StreetName, StreetType, StreetSuffix, Suburb, State, Postcode, mb, longitude, latitude)
+    ...
+    store = builder.finish()
+    store.save('GNAF_CORE.psv.store')
+    store = AddressStore.load('GNAF_CORE.psv.store')
+    for row in range(*store.SA1range(sa1)):
+        streetName = store.get(row, 'streetName')
+
+    MB = getMeshBlockTable(inputDir)
+    if mb in MB:
+        sa1 = MB[mb]
+
+    builder = PMIStoreBuilder(heading)
+    for row in csvreader:
+        builder.add(row)
+    master = builder.finish()
+    familyName = master.get(row, 'familyName')
+
+    surnames = getNameTable(inputDir, 'AustralianSurnames.csv')
+    for key, (total, names) in surnames.buckets(200, 5000).items():
+        name = random.choice(names)
+'''
+
+import sys
+import os
+import io
+import csv
+import mmap
+import json
+import array
+import bisect
+import functools
+import math
+import struct
+import zipfile
+import operator
+import logging
+
+
+MAGIC = b'MKHPCOLS1\n'
+
+
+def writeColumnFile(filename, columns, tables, meta):
+    '''
+Write a column file - columns is a dict of arrays, tables is a dict of lists of strings
+    '''
+
+    header = {'byteorder':sys.byteorder, 'meta':meta, 'columns':{}, 'tables':{}}
+    blobs = []
+    offset = 0
+    for name, column in columns.items():
+        length = len(column) * column.itemsize
+        header['columns'][name] = [column.typecode, offset, length]
+        blobs.append(column)
+        offset += length
+        padding = (-offset) % 8
+        blobs.append(b'\0' * padding)
+        offset += padding
+    for name, table in tables.items():
+        blob = '\n'.join(table).encode('utf-8')
+        header['tables'][name] = [offset, len(blob), len(table)]
+        blobs.append(blob)
+        offset += len(blob)
+        padding = (-offset) % 8
+        blobs.append(b'\0' * padding)
+        offset += padding
+    headerBytes = json.dumps(header).encode('utf-8')
+    headerBytes += b' ' * ((-(len(MAGIC) + 8 + len(headerBytes))) % 8)
+    tmpFile = filename + '.tmp'
+    with open(tmpFile, 'wb') as cf:
+        cf.write(MAGIC)
+        cf.write(struct.pack('<Q', len(headerBytes)))
+        cf.write(headerBytes)
+        for blob in blobs:
+            cf.write(blob)
+    os.replace(tmpFile, filename)
+
+
+def readColumnFile(filename):
+    '''
+Memory map a column file and return the columns (as memoryviews), the string tables and the meta data
+    '''
+
+    with open(filename, 'rb') as cf:
+        if cf.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{filename} is not a column file')
+        headerLength = struct.unpack('<Q', cf.read(8))[0]
+        header = json.loads(cf.read(headerLength).decode('utf-8'))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{filename} was created on a machine with a different byte order')
+        start = len(MAGIC) + 8 + headerLength
+        mm = mmap.mmap(cf.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    columns = {}
+    for name, (typecode, offset, length) in header['columns'].items():
+        columns[name] = view[start + offset:start + offset + length].cast(typecode)
+    tables = {}
+    for name, (offset, length, count) in header['tables'].items():
+        if count == 0:
+            tables[name] = []
+        else:
+            tables[name] = bytes(view[start + offset:start + offset + length]).decode('utf-8').split('\n')
+    return columns, tables, header['meta']
+
+
+class StringTable:
+    '''
+Intern strings, assigning each distinct string the next integer index
+    '''
+
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def intern(self, string):
+        '''
+Return the index of this string, adding it to the table if necessary
+        '''
+        idx = self.index.get(string)
+        if idx is None:
+            idx = len(self.strings)
+            self.index[string] = idx
+            self.strings.append(string)
+        return idx
+
+
+# The columns in an AddressStore - name, typecode and, for string columns, the string table
+addressColumns = [('streetNo', 'I', 'streetNo'), ('streetName', 'I', 'streetName'), ('streetType', 'I', 'streetType'),
+                  ('streetSuffix', 'I', 'streetSuffix'), ('suburb', 'I', 'suburb'), ('state', 'I', 'state'),
+                  ('postcode', 'I', 'postcode'), ('mb', 'q', None), ('longitude', 'i', None), ('latitude', 'i', None)]
+coordinateScale = 10000000      # longitude and latitude are stored as integer multiples of 1e-7 degrees (about 1cm)
+
+
+class AddressStore:
+    '''
+A columnar store of G-NAF addresses, sorted by SA1.
+
+Street number, street name, street type, street suffix, suburb, state and postcode are indices into string tables,
+mesh block codes are 64 bit integers and longitude/latitude are fixed point 32 bit integers.
+The addresses in SA1 SA1table[i] are rows SA1offsets[i] to SA1offsets[i + 1] - 1.
+The grid is a GridIndex of the longitude/latitude of every address, for finding the addresses near a point.
+    '''
+
+    def __init__(self, columns, tables, SA1table, SA1offsets, grid=None):
+        self.columns = columns
+        self.tables = tables
+        self.SA1table = SA1table
+        self.SA1offsets = SA1offsets
+        self.SA1index = {sa1:i for i, sa1 in enumerate(SA1table)}
+        if grid is None:
+            grid = GridIndex.build(columns['longitude'], columns['latitude'])
+        self.grid = grid
+
+    def __len__(self):
+        return len(self.columns['mb'])
+
+    def SA1range(self, sa1):
+        '''
+Return the range (first, last + 1) of rows for this SA1
+        '''
+        i = self.SA1index[sa1]
+        return (self.SA1offsets[i], self.SA1offsets[i + 1])
+
+    def SA1of(self, row):
+        '''
+Return the SA1 of this row
+        '''
+        return self.SA1table[bisect.bisect_right(self.SA1offsets, row) - 1]
+
+    def get(self, row, column):
+        '''
+Return the value of this column, for this row, as a string
+        '''
+        value = self.columns[column][row]
+        if column in self.tables:
+            return self.tables[column][value]
+        if column == 'mb':
+            return str(value)
+        return f'{value / coordinateScale:.7f}'
+
+    def save(self, filename):
+        '''
+Save this store as a column file
+        '''
+        columns = dict(self.columns)
+        columns['SA1offsets'] = self.SA1offsets
+        columns['gridCells'] = self.grid.cells
+        columns['gridOffsets'] = self.grid.offsets
+        columns['gridRows'] = self.grid.rows
+        tables = dict(self.tables)
+        tables['SA1'] = self.SA1table
+        writeColumnFile(filename, columns, tables, {'type':'AddressStore', 'rows':len(self), 'gridCellSize':self.grid.cellSize})
+
+    @classmethod
+    def load(cls, filename):
+        '''
+Memory map an AddressStore from a column file
+        '''
+        columns, tables, meta = readColumnFile(filename)
+        if meta.get('type') != 'AddressStore':
+            raise ValueError(f'{filename} is not an address store')
+        SA1offsets = columns.pop('SA1offsets')
+        SA1table = tables.pop('SA1')
+        grid = GridIndex(columns.pop('gridCells'), columns.pop('gridOffsets'), columns.pop('gridRows'), meta['gridCellSize'], columns['longitude'], columns['latitude'])
+        return cls(columns, tables, SA1table, SA1offsets, grid)
+
+
+class AddressStoreBuilder:
+    '''
+Accumulate addresses, in any order, and then build an AddressStore sorted by SA1
+    '''
+
+    def __init__(self):
+        self.SA1s = StringTable()
+        self.SA1col = array.array('I')
+        self.tables = {}
+        self.columns = {}
+        for name, typecode, table in addressColumns:
+            self.columns[name] = array.array(typecode)
+            if table is not None:
+                self.tables[name] = StringTable()
+
+    def add(self, sa1, StreetNumber, StreetName, StreetType, StreetSuffix, Suburb, State, Postcode, mb, longitude, latitude):
+        '''
+Add an address
+        '''
+        self.SA1col.append(self.SA1s.intern(sa1))
+        self.columns['streetNo'].append(self.tables['streetNo'].intern(StreetNumber))
+        self.columns['streetName'].append(self.tables['streetName'].intern(StreetName))
+        self.columns['streetType'].append(self.tables['streetType'].intern(StreetType))
+        self.columns['streetSuffix'].append(self.tables['streetSuffix'].intern(StreetSuffix))
+        self.columns['suburb'].append(self.tables['suburb'].intern(Suburb))
+        self.columns['state'].append(self.tables['state'].intern(State))
+        self.columns['postcode'].append(self.tables['postcode'].intern(Postcode))
+        self.columns['mb'].append(int(mb))
+        self.columns['longitude'].append(round(float(longitude) * coordinateScale))
+        self.columns['latitude'].append(round(float(latitude) * coordinateScale))
+
+    def merge(self, other):
+        '''
+Append the addresses accumulated by another builder (e.g. one that read a later part of the same file)
+        '''
+        SA1map = [self.SA1s.intern(sa1) for sa1 in other.SA1s.strings]
+        self.SA1col.extend(SA1map[idx] for idx in other.SA1col)
+        for name, typecode, table in addressColumns:
+            if table is None:
+                self.columns[name].extend(other.columns[name])
+            else:
+                stringMap = [self.tables[name].intern(string) for string in other.tables[name].strings]
+                self.columns[name].extend(stringMap[idx] for idx in other.columns[name])
+
+    def finish(self):
+        '''
+Sort the addresses by SA1 (a stable counting sort) and return the AddressStore
+        '''
+        SA1table = sorted(self.SA1s.strings)
+        newIndex = array.array('I', [0] * len(SA1table))
+        for i, sa1 in enumerate(SA1table):
+            newIndex[self.SA1s.index[sa1]] = i
+        SA1offsets = array.array('Q', [0] * (len(SA1table) + 1))
+        for oldIdx in self.SA1col:
+            SA1offsets[newIndex[oldIdx] + 1] += 1
+        for i in range(len(SA1table)):
+            SA1offsets[i + 1] += SA1offsets[i]
+        nextRow = array.array('Q', SA1offsets[:-1])
+        order = array.array('Q', [0] * len(self.SA1col))
+        for row, oldIdx in enumerate(self.SA1col):
+            i = newIndex[oldIdx]
+            order[nextRow[i]] = row
+            nextRow[i] += 1
+        columns = {}
+        for name, typecode, table in addressColumns:
+            column = self.columns[name]
+            columns[name] = array.array(typecode, (column[row] for row in order))
+            self.columns[name] = None
+        tables = {name:table.strings for name, table in self.tables.items()}
+        return AddressStore(columns, tables, SA1table, SA1offsets, GridIndex.build(columns['longitude'], columns['latitude']))
+
+
+earthRadius = 6371.0088        # The mean radius of the earth, in km
+kmPerDegree = earthRadius * math.pi / 180
+gridCellSize = 100000           # The size of a GridIndex cell, in units of 1e-7 degrees (0.01 degrees, about 1km)
+
+
+class GridIndex:
+    '''
+A uniform longitude/latitude grid over a set of points (the addresses in an AddressStore), for finding the points near a location.
+
+Each cell is cellSize (1e-7 degrees) square, and the cells are numbered row by row (latitude), from the south west.
+The rows (points) are held in cell order (rows), and the points in cells[i] are rows[offsets[i]] to rows[offsets[i + 1] - 1].
+So the points in one grid row, between two longitudes, are a contiguous run of rows, found with two binary searches,
+and the points in a bounding box are a few such runs, however many points there are in total.
+Distances are great circle distances in km. The grid does not wrap at longitude 180.
+    '''
+
+    def __init__(self, cells, offsets, rows, cellSize, longitudes, latitudes):
+        self.cells = cells              # The sorted numbers of the cells that contain points
+        self.offsets = offsets          # The start of each cell in rows
+        self.rows = rows                # The points, in cell order
+        self.cellSize = cellSize
+        self.longitudes = longitudes    # The coordinates of each point, in units of 1e-7 degrees
+        self.latitudes = latitudes
+
+    @classmethod
+    def build(cls, longitudes, latitudes, cellSize=gridCellSize):
+        '''
+Build the grid for these points (a stable counting sort of the points by cell)
+        '''
+        width = 3600000000 // cellSize + 2
+        keys = array.array('q', (((latitude // cellSize) + width // 2) * width + (longitude // cellSize) + width // 2 for longitude, latitude in zip(longitudes, latitudes)))
+        cells = array.array('q', sorted(set(keys)))
+        cellIndex = {cell:i for i, cell in enumerate(cells)}
+        offsets = array.array('Q', [0] * (len(cells) + 1))
+        for key in keys:
+            offsets[cellIndex[key] + 1] += 1
+        for i in range(len(cells)):
+            offsets[i + 1] += offsets[i]
+        nextRow = array.array('Q', offsets[:-1])
+        rows = array.array('I', [0] * len(keys))
+        for row, key in enumerate(keys):
+            i = cellIndex[key]
+            rows[nextRow[i]] = row
+            nextRow[i] += 1
+        return cls(cells, offsets, rows, cellSize, longitudes, latitudes)
+
+    def distance(self, row, longitude, latitude):
+        '''
+Return the great circle distance (km) from this point (row) to longitude, latitude (degrees)
+        '''
+        lat1 = math.radians(latitude)
+        lat2 = math.radians(self.latitudes[row] / coordinateScale)
+        dLat = lat2 - lat1
+        dLon = math.radians(self.longitudes[row] / coordinateScale - longitude)
+        a = math.sin(dLat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dLon / 2) ** 2
+        return 2 * earthRadius * math.asin(min(1.0, math.sqrt(a)))
+
+    def runs(self, longitude, latitude, radius):
+        '''
+Return the runs (start, end) of rows that cover the bounding box of the circle of this radius (km) around longitude, latitude (degrees)
+        '''
+        width = 3600000000 // self.cellSize + 2
+        dLat = radius / kmPerDegree
+        maxLat = min(89.0, abs(latitude) + dLat)
+        dLon = min(180.0, radius / (kmPerDegree * math.cos(math.radians(maxLat))))
+        x0 = math.floor((longitude - dLon) * coordinateScale) // self.cellSize + width // 2
+        x1 = math.floor((longitude + dLon) * coordinateScale) // self.cellSize + width // 2
+        y0 = math.floor((latitude - dLat) * coordinateScale) // self.cellSize + width // 2
+        y1 = math.floor((latitude + dLat) * coordinateScale) // self.cellSize + width // 2
+        runs = []
+        for y in range(y0, y1 + 1):
+            first = bisect.bisect_left(self.cells, y * width + x0)
+            last = bisect.bisect_right(self.cells, y * width + x1)
+            if first < last:
+                runs.append((self.offsets[first], self.offsets[last]))
+        return runs
+
+    def within(self, longitude, latitude, radius):
+        '''
+Return the points (rows) within radius (km) of longitude, latitude (degrees)
+        '''
+        points = []
+        for start, end in self.runs(longitude, latitude, radius):
+            for i in range(start, end):
+                row = self.rows[i]
+                if self.distance(row, longitude, latitude) <= radius:
+                    points.append(row)
+        return points
+
+    def randomWithin(self, longitude, latitude, radius, rng, tries=20):
+        '''
+Return a random point (row) within radius (km) of longitude, latitude (degrees), or None if there isn't one.
+Each point in the bounding box is equally likely to be tried, so the selection is uniform;
+if tries random points all fall outside the circle, then the points within the circle are found exhaustively.
+        '''
+        runs = self.runs(longitude, latitude, radius)
+        total = sum(end - start for start, end in runs)
+        if total == 0:
+            return None
+        for _ in range(tries):
+            i = rng.randrange(total)
+            for start, end in runs:
+                if i < end - start:
+                    row = self.rows[start + i]
+                    break
+                i -= end - start
+            if self.distance(row, longitude, latitude) <= radius:
+                return row
+        points = self.within(longitude, latitude, radius)
+        if not points:
+            return None
+        return points[rng.randrange(len(points))]
+
+    def nearest(self, longitude, latitude, k=1):
+        '''
+Return the k points (rows) nearest to longitude, latitude (degrees), nearest first.
+The search radius starts at one cell and doubles until it contains k points.
+        '''
+        radius = self.cellSize / coordinateScale * kmPerDegree
+        while True:
+            points = self.within(longitude, latitude, radius)
+            if (len(points) >= k) or (radius > earthRadius * math.pi):
+                break
+            radius *= 2
+        points.sort(key=lambda row: (self.distance(row, longitude, latitude), row))
+        return points[:k]
+
+
+class PMIStore:
+    '''
+A columnar store of the records of a PMI file, in file order.
+Every column is an index into a string table, except UR, which is a column of 64 bit integers
+(any UR number that isn't a plain number is interned in otherURs and stored as -1 - its index).
+The Alias, Merged and Deleted flags (a non-empty Alias or Merged column, a 'D' in the Deleted column) are also held as bitsets, one bit per row.
+    '''
+
+    def __init__(self, heading, columns, tables, URs, otherURs, flags):
+        self.heading = heading
+        self.columns = columns
+        self.tables = tables
+        self.URs = URs
+        self.otherURs = otherURs
+        self.flags = flags
+        self.flagRowsCache = {}
+        self.URgapsCache = None
+
+    def __len__(self):
+        return len(self.URs)
+
+    def __contains__(self, column):
+        return column in self.heading
+
+    def get(self, row, column):
+        '''
+Return the value of this column, for this row, as a string
+        '''
+        if column == 'UR':
+            UR = self.URs[row]
+            if UR < 0:
+                return self.otherURs[-1 - UR]
+            return str(UR)
+        return self.tables[column][self.columns[column][row]]
+
+    def URno(self, row):
+        '''
+Return the UR number of this row as an integer, or None if it is not a plain number
+        '''
+        UR = self.URs[row]
+        if UR < 0:
+            return None
+        return UR
+
+    def URgaps(self):
+        '''
+Return (lo, hi, gaps) - the lowest and highest integer UR numbers and the gaps (UR number less lo less rank) of the distinct integer UR numbers,
+in ascending order, or (None, None, None) if there are no integer UR numbers.
+The gaps describe the unused UR numbers between lo and hi; the k'th unused UR number is lo + k plus the number of gaps that are no more than k
+(see sampling.sampleAbsent()). Once the UR numbers are sorted the gaps are found in one linear pass.
+        '''
+        if self.URgapsCache is None:
+            gaps = array.array('q')
+            lo = hi = None
+            for UR in sorted(UR for UR in self.URs if UR >= 0):
+                if lo is None:
+                    lo = UR
+                elif UR == hi:          # A duplicate UR number
+                    continue
+                gaps.append(UR - lo - len(gaps))
+                hi = UR
+            self.URgapsCache = (lo, hi, gaps if lo is not None else None)
+        return self.URgapsCache
+
+    def flag(self, name, row):
+        '''
+Return True if the flag name ('Alias', 'Merged' or 'Deleted') is set for this row
+        '''
+        bits = self.flags.get(name)
+        return (bits is not None) and ((bits[row >> 3] >> (row & 7)) & 1) == 1
+
+    def flagRows(self, name):
+        '''
+Return the rows, in file order, for which the flag name ('Alias', 'Merged' or 'Deleted') is set
+        '''
+        if name not in self.flagRowsCache:
+            rows = array.array('Q')
+            bits = self.flags.get(name)
+            if bits is not None:
+                for i, byte in enumerate(bits):
+                    while byte:
+                        low = byte & -byte
+                        rows.append((i << 3) + low.bit_length() - 1)
+                        byte ^= low
+            self.flagRowsCache[name] = rows
+        return self.flagRowsCache[name]
+
+
+class PMIStoreBuilder:
+    '''
+Accumulate the rows of a PMI file, one at a time, and then build a PMIStore
+    '''
+
+    def __init__(self, heading):
+        self.heading = list(heading)
+        if 'UR' not in self.heading:
+            raise ValueError('no column named "UR"')
+        self.URcol = self.heading.index('UR')
+        self.columnIndexes = [(column, i) for i, column in enumerate(self.heading) if column != 'UR']
+        self.columns = {column:array.array('I') for column, i in self.columnIndexes}
+        self.tables = {column:StringTable() for column, i in self.columnIndexes}
+        # The position, column append method and string table of each string column, so add() makes no method lookups
+        self.stringColumns = [(i, self.columns[column].append, self.tables[column].index, self.tables[column].strings) for column, i in self.columnIndexes]
+        self.URs = array.array('q')
+        self.otherURs = StringTable()
+        self.flagTests = []
+        if 'Alias' in self.heading:
+            self.flagTests.append(('Alias', self.heading.index('Alias'), lambda value: value != ''))
+        if 'Merged' in self.heading:
+            self.flagTests.append(('Merged', self.heading.index('Merged'), lambda value: value != ''))
+        if 'Deleted' in self.heading:
+            self.flagTests.append(('Deleted', self.heading.index('Deleted'), lambda value: value == 'D'))
+        self.flags = {name:bytearray() for name, i, test in self.flagTests}
+
+    def add(self, row):
+        '''
+Add a row (a list of strings, in the order of the heading)
+        '''
+        rowNo = len(self.URs)
+        if (rowNo & 7) == 0:
+            for bits in self.flags.values():
+                bits.append(0)
+        UR = row[self.URcol]
+        if UR.isascii() and UR.isdigit() and ((UR[0] != '0') or (UR == '0')):
+            self.URs.append(int(UR))
+        else:
+            self.URs.append(-1 - self.otherURs.intern(UR))
+        for i, append, index, strings in self.stringColumns:
+            value = row[i]
+            idx = index.get(value)
+            if idx is None:
+                idx = len(strings)
+                index[value] = idx
+                strings.append(value)
+            append(idx)
+        for name, i, test in self.flagTests:
+            if test(row[i]):
+                self.flags[name][rowNo >> 3] |= 1 << (rowNo & 7)
+
+    def finish(self):
+        '''
+Return the PMIStore
+        '''
+        tables = {column:table.strings for column, table in self.tables.items()}
+        return PMIStore(self.heading, self.columns, tables, self.URs, self.otherURs.strings, self.flags)
+
+
+meshBlockCacheSize = 4096      # The number of recently used mesh blocks remembered by a MeshBlockTable
+
+
+class MeshBlockTable:
+    '''
+The ABS mesh blocks, as a sorted column of integer mesh block codes (searched with a binary search) and a column of the SA1 of each mesh block.
+
+ASGS codes are hierarchical; the SA4 code is the first 3 digits of the SA1 code, the SA3 code the first 5 and the SA2 code the first 9.
+So the SA1 code is all that is needed to find the SA2, SA3 and SA4 of a mesh block.
+The SA2 and SA4 names are string tables, in the order of the sorted SA2 and SA4 code columns.
+A MeshBlockTable is a read only mapping of mesh block code to SA1 code (both strings), so it can replace a dict of the same.
+A binary search costs more than a dict lookup, so the most recently used mesh blocks are remembered (addresses in the same street
+are generally in the same few mesh blocks); use SA1() in hot loops, which returns None, rather than raising KeyError, for an unknown mesh block.
+    '''
+
+    def __init__(self, MBcodes, SA1codes, SA2codes, SA2names, SA4codes, SA4names, meta=None):
+        self.MBcodes = MBcodes
+        self.SA1codes = SA1codes
+        self.SA2codes = SA2codes
+        self.SA2names = SA2names
+        self.SA4codes = SA4codes
+        self.SA4names = SA4names
+        self.meta = meta if meta is not None else {}
+        self.SA1 = functools.lru_cache(maxsize=meshBlockCacheSize)(self.findSA1)
+
+    def __reduce__(self):
+        # memoryviews can't be pickled (e.g. sent to a worker process), so send copies of the columns
+        return (self.__class__, (array.array('q', self.MBcodes), array.array('q', self.SA1codes), array.array('q', self.SA2codes), self.SA2names,
+                                 array.array('q', self.SA4codes), self.SA4names, self.meta))
+
+    def __len__(self):
+        return len(self.MBcodes)
+
+    def find(self, mb):
+        '''
+Return the row of this mesh block code, or None if it is not a mesh block
+        '''
+        try:
+            code = int(mb)
+        except (TypeError, ValueError):
+            return None
+        row = bisect.bisect_left(self.MBcodes, code)
+        if (row < len(self.MBcodes)) and (self.MBcodes[row] == code):
+            return row
+        return None
+
+    def findSA1(self, mb):
+        '''
+Return the SA1 code of this mesh block code, or None if it is not a mesh block
+        '''
+        row = self.find(mb)
+        if row is None:
+            return None
+        return str(self.SA1codes[row])
+
+    def __contains__(self, mb):
+        return self.SA1(mb) is not None
+
+    def __getitem__(self, mb):
+        sa1 = self.SA1(mb)
+        if sa1 is None:
+            raise KeyError(mb)
+        return sa1
+
+    def get(self, mb, default=None):
+        '''
+Return the SA1 code of this mesh block code, or default if it is not a mesh block
+        '''
+        sa1 = self.SA1(mb)
+        if sa1 is None:
+            return default
+        return sa1
+
+    def SA2s(self):
+        '''
+Return a dictionary of the SA2s (key=SA2 code, value=SA2 name)
+        '''
+        return {str(code):name for code, name in zip(self.SA2codes, self.SA2names)}
+
+    def SA4s(self):
+        '''
+Return a dictionary of the SA4s (key=SA4 code, value=SA4 name)
+        '''
+        return {str(code):name for code, name in zip(self.SA4codes, self.SA4names)}
+
+    def SA2inSA4(self):
+        '''
+Return a dictionary of the sets of SA2s in each SA4 (key=SA4 code, value=set of SA2 codes)
+        '''
+        SA2inSA4 = {}
+        for code in self.SA2codes:
+            SA2code = str(code)
+            SA4code = SA2code[:3]
+            if SA4code not in SA2inSA4:
+                SA2inSA4[SA4code] = set()
+            SA2inSA4[SA4code].add(SA2code)
+        return SA2inSA4
+
+    def save(self, filename):
+        '''
+Save this table as a column file
+        '''
+        columns = {'MBcodes':self.MBcodes, 'SA1codes':self.SA1codes, 'SA2codes':self.SA2codes, 'SA4codes':self.SA4codes}
+        tables = {'SA2names':self.SA2names, 'SA4names':self.SA4names}
+        meta = dict(self.meta)
+        meta['type'] = 'MeshBlockTable'
+        writeColumnFile(filename, columns, tables, meta)
+
+    @classmethod
+    def load(cls, filename):
+        '''
+Memory map a MeshBlockTable from a column file
+        '''
+        columns, tables, meta = readColumnFile(filename)
+        if meta.get('type') != 'MeshBlockTable':
+            raise ValueError(f'{filename} is not a mesh block table')
+        return cls(columns['MBcodes'], columns['SA1codes'], columns['SA2codes'], tables['SA2names'], columns['SA4codes'], tables['SA4names'], meta)
+
+    @classmethod
+    def build(cls, rows, meta=None):
+        '''
+Build a MeshBlockTable from rows of (mesh block code, SA1 code, SA2 code, SA2 name, SA4 code, SA4 name).
+Rows with codes that are not plain numbers, without leading zeros, are skipped, as they could not be stored as integers.
+        '''
+        meshBlocks = []
+        SA2s = {}
+        SA4s = {}
+        for mb, sa1, SA2code, SA2name, SA4code, SA4name in rows:
+            if not all(code.isdigit() and (code[0] != '0') for code in (mb, sa1, SA2code, SA4code)):
+                continue
+            meshBlocks.append((int(mb), int(sa1)))
+            SA2s[int(SA2code)] = SA2name
+            SA4s[int(SA4code)] = SA4name
+        meshBlocks.sort()
+        MBcodes = array.array('q', (mb for mb, sa1 in meshBlocks))
+        SA1codes = array.array('q', (sa1 for mb, sa1 in meshBlocks))
+        SA2codes = array.array('q', sorted(SA2s))
+        SA4codes = array.array('q', sorted(SA4s))
+        return cls(MBcodes, SA1codes, SA2codes, [SA2s[code] for code in SA2codes], SA4codes, [SA4s[code] for code in SA4codes], meta)
+
+
+def meshBlockTableFile(inputDir):
+    '''
+The name of the compiled mesh block table for the MB_2021_AUST.zip file in inputDir
+    '''
+    return os.path.join(inputDir, 'MB_2021_AUST.zip.table')
+
+
+def getMeshBlockTable(inputDir, rebuild=False):
+    '''
+Return the MeshBlockTable for MB_2021_AUST.zip in inputDir, memory mapped from the compiled mesh block table if it is current,
+otherwise compiled from MB_2021_AUST.zip and saved (if possible) for next time.
+The compiled table is current if the size and modification time of MB_2021_AUST.zip are unchanged.
+    '''
+
+    MBfile = os.path.join(inputDir, 'MB_2021_AUST.zip')
+    tableFile = meshBlockTableFile(inputDir)
+    stat = os.stat(MBfile)
+    source = [stat.st_size, stat.st_mtime_ns]
+    if (not rebuild) and os.path.isfile(tableFile):
+        try:
+            table = MeshBlockTable.load(tableFile)
+            if table.meta.get('source') == source:
+                logging.info('Reading mesh block table (%s)', tableFile)
+                return table
+            logging.info('Mesh block table (%s) is out of date', tableFile)
+        except (OSError, ValueError, KeyError) as detail:
+            logging.warning('Cannot read mesh block table (%s) - %s', tableFile, detail)
+
+    # Read in Mesh Block data
+    # MB_CODE_2021,MB_CATEGORY_2021,CHANGE_FLAG_2021,CHANGE_LABEL_2021,SA1_CODE_2021,SA2_CODE_2021,SA2_NAME_2021,SA3_CODE_2021,SA3_NAME_2021,SA4_CODE_2021,SA4_NAME_2021,GCCSA_CODE_2021,GCCSA_NAME_2021,STATE_CODE_2021,STATE_NAME_2021,AUS_CODE_2021,AUS_NAME_2021,AREA_ALBERS_SQKM,ASGS_LOCI_URI_2021
+    logging.info('Reading Mesh Blocks')
+    with zipfile.ZipFile(MBfile) as zf:
+        with zf.open('MB_2021_AUST.csv', 'r') as mb:
+            mbReader = csv.reader(io.TextIOWrapper(mb, encoding='utf-8-sig'), dialect=csv.excel)
+            heading = next(mbReader)
+            getColumns = operator.itemgetter(*(heading.index(column) for column in ('MB_CODE_2021', 'SA1_CODE_2021', 'SA2_CODE_2021', 'SA2_NAME_2021', 'SA4_CODE_2021', 'SA4_NAME_2021')))
+            table = MeshBlockTable.build((getColumns(row) for row in mbReader if row), {'source':source})
+    logging.info('Writing mesh block table (%s)', tableFile)
+    try:
+        table.save(tableFile)
+        return MeshBlockTable.load(tableFile)
+    except OSError as detail:
+        logging.warning('Cannot write mesh block table (%s) - %s', tableFile, detail)
+    return table
+
+
+class NameList:
+    '''
+A read only sequence of some of the names in a NameTable (a bucket of similarly popular names), decoded as they are indexed
+    '''
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return self.table.name(self.rows[i])
+
+    def __iter__(self):
+        return (self.table.name(row) for row in self.rows)
+
+
+class NameTable:
+    '''
+A names file (Name,Count - one row per name), as a column of the counts, a column of the cumulative counts
+(so the total popularity of any range of rows is one subtraction) and the names, as one block of utf-8 text, with a column of the offset of each name.
+If the counts are in descending order (meta 'descending'), then every bucket of similarly popular names is a range of rows,
+found with a binary search, so bucketing the names costs the number of buckets, not the number of names.
+    '''
+
+    def __init__(self, counts, cumCounts, nameOffsets, names, meta=None):
+        self.counts = counts
+        self.cumCounts = cumCounts
+        self.nameOffsets = nameOffsets
+        self.names = names
+        self.meta = meta if meta is not None else {}
+
+    def __len__(self):
+        return len(self.counts)
+
+    def name(self, row):
+        '''
+Return the name in this row
+        '''
+        return str(self.names[self.nameOffsets[row]:self.nameOffsets[row + 1]], 'utf-8')
+
+    def buckets(self, bucketSize, limit=None):
+        '''
+Bucket the first limit names (default all the names) into groups of similarly popular names (int(count / bucketSize)).
+Return a dictionary (key=bucket, value=(total count of the names in the bucket, NameList of the names in the bucket)),
+with the buckets, and the names in each bucket, in file order.
+        '''
+        if (limit is None) or (limit > len(self.counts)):
+            limit = len(self.counts)
+        buckets = {}
+        if self.meta.get('descending'):
+            start = 0
+            while start < limit:
+                bucket = int(self.counts[start] / bucketSize)
+                # The first row of the next bucket is the first row with a count below the smallest count in this bucket
+                end = bisect.bisect_right(self.counts, -bucket * bucketSize, start, limit, key=operator.neg)
+                buckets[bucket] = (self.cumCounts[end] - self.cumCounts[start], NameList(self, range(start, end)))
+                start = end
+            return buckets
+        rows = {}
+        sums = {}
+        for row in range(limit):
+            count = self.counts[row]
+            bucket = int(count / bucketSize)
+            if bucket in rows:
+                sums[bucket] += count
+                rows[bucket].append(row)
+            else:
+                sums[bucket] = count
+                rows[bucket] = array.array('I', [row])
+        for bucket, bucketRows in rows.items():
+            buckets[bucket] = (sums[bucket], NameList(self, bucketRows))
+        return buckets
+
+    def save(self, filename):
+        '''
+Save this table as a column file
+        '''
+        columns = {'counts':self.counts, 'cumCounts':self.cumCounts, 'nameOffsets':self.nameOffsets, 'names':self.names}
+        meta = dict(self.meta)
+        meta['type'] = 'NameTable'
+        writeColumnFile(filename, columns, {}, meta)
+
+    @classmethod
+    def load(cls, filename):
+        '''
+Memory map a NameTable from a column file
+        '''
+        columns, _, meta = readColumnFile(filename)
+        if meta.get('type') != 'NameTable':
+            raise ValueError(f'{filename} is not a name table')
+        return cls(columns['counts'], columns['cumCounts'], columns['nameOffsets'], columns['names'], meta)
+
+    @classmethod
+    def build(cls, rows, meta=None):
+        '''
+Build a NameTable from rows of (name, count)
+        '''
+        counts = array.array('q')
+        cumCounts = array.array('q', [0])
+        nameOffsets = array.array('Q', [0])
+        names = bytearray()
+        for name, count in rows:
+            counts.append(count)
+            cumCounts.append(cumCounts[-1] + count)
+            names += name.encode('utf-8')
+            nameOffsets.append(len(names))
+        meta = dict(meta) if meta is not None else {}
+        meta['descending'] = all(counts[i] >= counts[i + 1] for i in range(len(counts) - 1))
+        return cls(counts, cumCounts, nameOffsets, array.array('B', names), meta)
+
+
+def nameTableFile(inputDir, namesFile):
+    '''
+The name of the compiled name table for the names file namesFile in inputDir
+    '''
+    return os.path.join(inputDir, namesFile + '.names')
+
+
+def getNameTable(inputDir, namesFile, rebuild=False):
+    '''
+Return the NameTable for the names file namesFile (Name,Count) in inputDir, memory mapped from the compiled name table if it is current,
+otherwise compiled from namesFile and saved (if possible) for next time.
+The compiled table is current if the size and modification time of namesFile are unchanged,
+or if namesFile is not present (the compiled name table has been shipped without it).
+    '''
+
+    filename = os.path.join(inputDir, namesFile)
+    tableFile = nameTableFile(inputDir, namesFile)
+    source = None
+    if os.path.isfile(filename):
+        stat = os.stat(filename)
+        source = [stat.st_size, stat.st_mtime_ns]
+    if (not rebuild or (source is None)) and os.path.isfile(tableFile):
+        try:
+            table = NameTable.load(tableFile)
+            if (source is None) or (table.meta.get('source') == source):
+                logging.info('Reading name table (%s)', tableFile)
+                return table
+            logging.info('Name table (%s) is out of date', tableFile)
+        except (OSError, ValueError, KeyError) as detail:
+            logging.warning('Cannot read name table (%s) - %s', tableFile, detail)
+
+    logging.info('Reading names (%s)', filename)
+    with open(filename, 'rt', newline='', encoding='utf-8') as csvfile:
+        csvreader = csv.reader(csvfile, csv.excel)
+        next(csvreader, None)           # Skip the heading
+        table = NameTable.build(((row[0], int(row[1])) for row in csvreader if row), {'source':source})
+    logging.info('Writing name table (%s)', tableFile)
+    try:
+        table.save(tableFile)
+        return NameTable.load(tableFile)
+    except OSError as detail:
+        logging.warning('Cannot write name table (%s) - %s', tableFile, detail)
+    return table
@@ -0,0 +1,142 @@
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+Read a G-NAF CORE (pipe delimited) file in parallel
+
+The file is split into byte ranges (chunks), each starting at the beginning of a line and ending at the end of a line,
+and each chunk is parsed by a worker function in a pool of processes.
+The results are returned in file order, so the caller can merge them as if the file had been read serially.
+G-NAF CORE has no quoted fields that span lines, so every line is a complete address.
+
+The worker function is called with (filename, heading, start, end, *args) and must be a module level function,
+so that it can be sent to the worker processes. iterRows() returns the rows of one chunk, as dictionaries keyed by the heading.
+iterColumns() is the fast path; it finds the position of each required column in the heading once,
+and then returns just those columns of each row as a tuple, rather than building (and discarding) a dictionary for every address.
+By default it returns the addressColumns, which are the only columns used by the mkHealth Population - Australia related scripts.
+
+SYNOPSIS
+    from gnafReader import mapChunks, iterRows
+
+    def countVIC(filename, heading, start, end):
+        return sum(1 for row in iterRows(filename, heading, start, end) if row['STATE'] == 'VIC')
+
+    total = sum(mapChunks('GNAF_CORE.psv', countVIC, (), workers=4))
+
+    def countSuburbs(filename, heading, start, end):
+        return len(set(row[0] for row in iterColumns(filename, heading, start, end, ('LOCALITY_NAME',))))
+'''
+
+import os
+import io
+import csv
+import operator
+import multiprocessing
+
+
+chunksPerWorker = 4         # More chunks than workers, so that the workers finish at about the same time
+
+# The G-NAF CORE columns used by the mkHealth Population - Australia related scripts, in file order
+addressColumns = ('NUMBER_FIRST', 'STREET_NAME', 'STREET_TYPE', 'STREET_SUFFIX', 'LOCALITY_NAME', 'STATE', 'POSTCODE', 'MB_CODE', 'LONGITUDE', 'LATITUDE')
+
+
+def readHeading(filename):
+    '''
+Return the column names, and the offset of the first address, of a G-NAF CORE file
+    '''
+    with open(filename, 'rb') as gnafCore:
+        line = gnafCore.readline()
+        start = gnafCore.tell()
+    heading = next(csv.reader([line.decode('utf-8-sig').rstrip('\r\n')], delimiter='|'))
+    return heading, start
+
+
+def chunkRanges(filename, start, chunks):
+    '''
+Split the file, from start to the end, into (up to) chunks byte ranges, each aligned on the start of a line
+    '''
+    with open(filename, 'rb') as gnafCore:
+        gnafCore.seek(0, io.SEEK_END)
+        size = gnafCore.tell()
+        boundaries = [start]
+        for chunk in range(1, chunks):
+            offset = start + (size - start) * chunk // chunks
+            if offset <= boundaries[-1]:
+                continue
+            gnafCore.seek(offset - 1)
+            gnafCore.readline()         # Move to the start of the next line (or stay put if offset is the start of a line)
+            offset = gnafCore.tell()
+            if boundaries[-1] < offset < size:
+                boundaries.append(offset)
+        boundaries.append(size)
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1) if boundaries[i] < boundaries[i + 1]]
+
+
+def iterLines(filename, start, end):
+    '''
+Yield the lines in the byte range start to end
+    '''
+    with open(filename, 'rb') as gnafCore:
+        gnafCore.seek(start)
+        offset = start
+        for line in gnafCore:
+            if offset >= end:
+                break
+            offset += len(line)
+            yield line.decode('utf-8')
+
+
+def iterRows(filename, heading, start, end):
+    '''
+Return the addresses in the byte range start to end as dictionaries, keyed by the heading
+    '''
+    return csv.DictReader(iterLines(filename, start, end), fieldnames=heading, delimiter='|')
+
+
+def columnIndexes(heading, columns=addressColumns):
+    '''
+Return the position of each of the columns in the heading
+    '''
+    missing = [column for column in columns if column not in heading]
+    if missing:
+        raise ValueError(f"column(s) {', '.join(missing)} not found in the heading")
+    return [heading.index(column) for column in columns]
+
+
+def iterColumns(filename, heading, start, end, columns=addressColumns):
+    '''
+Yield the columns (by default the addressColumns) of each address in the byte range start to end as a tuple, in the order of columns
+    '''
+    indexes = columnIndexes(heading, columns)
+    width = max(indexes) + 1
+    if len(indexes) == 1:
+        index = indexes[0]
+        getColumns = lambda row: (row[index],)
+    else:
+        getColumns = operator.itemgetter(*indexes)
+    for row in csv.reader(iterLines(filename, start, end), delimiter='|'):
+        if len(row) < width:        # Skip blank and truncated lines
+            continue
+        yield getColumns(row)
+
+
+def chunkWorker(args):
+    '''
+Call the worker function for one chunk (in a worker process)
+    '''
+    worker, filename, heading, start, end, workerArgs = args
+    return worker(filename, heading, start, end, *workerArgs)
+
+
+def mapChunks(filename, worker, workerArgs, workers=1, initializer=None, initargs=()):
+    '''
+Apply worker to every chunk of the file, using a pool of worker processes, and yield the results in file order.
+If workers is 1, then the whole file is one chunk and worker is called in this process.
+    '''
+    heading, start = readHeading(filename)
+    if workers <= 1:
+        yield worker(filename, heading, start, os.path.getsize(filename), *workerArgs)
+        return
+    chunks = [(worker, filename, heading, chunkStart, chunkEnd, workerArgs) for chunkStart, chunkEnd in chunkRanges(filename, start, workers * chunksPerWorker)]
+    with multiprocessing.Pool(workers, initializer, initargs) as pool:
+        yield from pool.imap(chunkWorker, chunks)
+    return
@@ -0,0 +1,80 @@
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+Collision free allocation of random looking identifiers (Medicare, IHI, DVA, CRN, provider and AHPRA numbers)
+
+An IdentifierAllocator hands out every integer in the range lo to hi - 1 exactly once, in a random looking order,
+without retries and without remembering the identifiers it has already handed out.
+It encrypts a counter (0, 1, 2 ...) with a small, keyed Feistel network, which is a permutation of [0, 4**halfBits),
+and then 'cycle walks' (re-encrypts) any value that falls outside [0, hi - lo), which makes it a permutation of [0, hi - lo).
+The only state is the key and the counter, so the memory used is the same for 10 identifiers or 10 million.
+
+The Feistel keys are drawn from the random module (or the random.Random instance passed as rng),
+so seeding the random number generator makes the order of the identifiers reproducible.
+
+Any check digits are still added by the caller (e.g. mkLuhn(), mkMedicareNo(), mkProviderNo()).
+
+SYNOPSIS
+    from identifiers import IdentifierAllocator
+
+    IHIallocator = IdentifierAllocator(0, 10000000)
+    IHIno = 800360990000000 + IHIallocator.allocate()
+    IHIno = f'{IHIno:d}{mkLuhn(str(IHIno)):d}'
+'''
+
+import random
+
+
+feistelRounds = 4
+
+
+class IdentifierAllocator:
+    '''
+Allocate each integer in the range lo to hi - 1 exactly once, in a random looking order
+    '''
+
+    def __init__(self, lo, hi, rng=None):
+        if hi <= lo:
+            raise ValueError(f'Empty identifier range ({lo}, {hi})')
+        if rng is None:
+            rng = random
+        self.lo = lo
+        self.size = hi - lo
+        bits = max(2, (self.size - 1).bit_length())
+        if bits > 128:
+            raise ValueError(f'Identifier range ({lo}, {hi}) is too large')
+        self.halfBits = (bits + 1) // 2
+        self.halfMask = (1 << self.halfBits) - 1
+        self.shift = 64 - self.halfBits
+        self.keys = [rng.getrandbits(64) for i in range(feistelRounds)]
+        self.counter = 0
+
+    def __len__(self):
+        '''
+The number of identifiers still available
+        '''
+        return self.size - self.counter
+
+    def permute(self, value):
+        '''
+Encrypt value, a number in [0, 4**halfBits), with the keyed Feistel network
+        '''
+        left = value >> self.halfBits
+        right = value & self.halfMask
+        shift = self.shift
+        for key in self.keys:
+            mixed = (((right ^ key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> shift     # The high bits of a multiplicative hash
+            left, right = right, left ^ mixed
+        return (left << self.halfBits) | right
+
+    def allocate(self):
+        '''
+Return the next identifier
+        '''
+        if self.counter >= self.size:
+            raise ValueError(f'All {self.size} identifiers in the range ({self.lo}, {self.lo + self.size}) have been allocated')
+        value = self.permute(self.counter)
+        while value >= self.size:       # Cycle walk back into the range
+            value = self.permute(value)
+        self.counter += 1
+        return self.lo + value
@@ -0,0 +1,133 @@
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+A pool of distinct items with constant time membership tests, random selection and random removal
+
+An IndexedPool keeps its items in a list, for random selection, and a dictionary of the position of each item in the list,
+for membership tests and removal. An item is removed by moving the last item into its place (swap with last),
+so adding, removing, testing and randomly selecting an item each take the same time for a pool of 10 items or 10 million.
+The order of the items is therefore only the order in which they were added until the first item is removed.
+
+A RangePool is an IndexedPool of the integers 0 to n - 1 (e.g. row numbers), held in two arrays rather than a list and a dictionary,
+so it takes a few bytes per item, rather than the hundred or so bytes per item of an IndexedPool of integers.
+
+choice() and pop() draw from the random module (or the random.Random instance passed as rng) exactly as random.choice() would,
+so a seeded random number generator makes the selections reproducible.
+
+SYNOPSIS
+    from indexedPool import IndexedPool, RangePool
+
+    skippedUR = IndexedPool()
+    skippedUR.add(URno)
+    if len(skippedUR) > 0:
+        UR = skippedUR.pop(errorRandom)         # A random skipped UR number, which can't be used again
+    if thisKey in clones:
+        ...
+
+    masterRows = RangePool(len(master))
+    row = masterRows.pop(errorRandom)           # A random master row, which won't be chosen again
+'''
+
+import random
+import array
+
+
+class IndexedPool:
+    '''
+A pool of distinct (hashable) items, with constant time add, remove, membership, random choice and random pop
+    '''
+
+    def __init__(self, items=()):
+        self.items = []         # The items, in no particular order once an item has been removed
+        self.index = {}         # key=item, value=position of the item in items
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, item):
+        '''
+Add item to the pool, if it is not already in the pool
+        '''
+        if item not in self.index:
+            self.index[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item):
+        '''
+Remove item from the pool, raising KeyError if it is not in the pool
+        '''
+        position = self.index.pop(item)
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.index[last] = position
+
+    def discard(self, item):
+        '''
+Remove item from the pool, if it is in the pool
+        '''
+        if item in self.index:
+            self.remove(item)
+
+    def choice(self, rng=None):
+        '''
+Return a random item from the pool, raising IndexError if the pool is empty
+        '''
+        if rng is None:
+            rng = random
+        return rng.choice(self.items)
+
+    def pop(self, rng=None):
+        '''
+Remove and return a random item from the pool, raising IndexError if the pool is empty
+        '''
+        item = self.choice(rng)
+        self.remove(item)
+        return item
+
+
+class RangePool(IndexedPool):
+    '''
+A pool of the integers 0 to n - 1, with the same operations as an IndexedPool, held in arrays.
+Only integers in the range 0 to n - 1 can be added.
+    '''
+
+    def __init__(self, n):      # pylint: disable=super-init-not-called
+        typecode = 'I' if n < 2**32 else 'Q'
+        self.items = array.array(typecode, range(n))
+        self.index = array.array(typecode, range(n))        # The position of each integer in items, or n if it isn't in the pool
+        self.n = n
+
+    def __contains__(self, item):
+        return (0 <= item < self.n) and (self.index[item] < len(self.items))
+
+    def add(self, item):
+        '''
+Add item to the pool, if it is not already in the pool
+        '''
+        if not 0 <= item < self.n:
+            raise ValueError(f'{item} is not in the range 0 to {self.n - 1}')
+        if self.index[item] >= len(self.items):
+            self.index[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item):
+        '''
+Remove item from the pool, raising KeyError if it is not in the pool
+        '''
+        if item not in self:
+            raise KeyError(item)
+        position = self.index[item]
+        self.index[item] = self.n
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.index[last] = position
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+A script to compile the address cache used by the mkHealth Population - Australia related scripts.
+
+randPatients.getAustralianAddresses() compiles GNAF_CORE.psv (or a subset created by selectGNAF.py) and MB_2021_AUST.zip
+into an address cache, being a file alongside the address file with '.cache' appended to the name (e.g. GNAF_CORE.psv.cache).
+The addresses themselves are saved in a columnar address store, being a file alongside the address file with '.store' appended to the name (e.g. GNAF_CORE.psv.store).
+The cache is used by all subsequent runs of mkPMI.py, mkAltPMI.py, mkDrClinic.py and mkHealthPopulation.py,
+for as long as the size and modification time (or, failing that, the SHA-256 hash) of both input files are unchanged.
+Otherwise the cache is rebuilt automatically.
+This script builds the cache on its own, so that the first run of those scripts doesn't have to.
+
+Similarly, the names files (AustralianSurnames.csv, boysnames.csv and girlsnames.csv) are compiled into name tables,
+being files alongside the names files with '.names' appended to the name (e.g. AustralianSurnames.csv.names),
+which are memory mapped, so only the names that are selected are ever read. This script also compiles any names files in dataDir.
+
+SYNOPSIS
+$ python mkAddressCache.py [-D dataDir|--dataDir=dataDir] [-A addressFile|--addressFile=addressFile] [-F|--force]
+                           [-w workers|--workers=workers] [-v loggingLevel|--loggingLevel=loggingLevel]
+                           [-L logDir|--logDir=logDir] [-l logfile|--logfile=logfile]
+
+OPTIONS
+-D dataDir|--dataDir=dataDir
+The directory containing the source address data and names files (default='data'). The cache and name tables will be created in this directory.
+
+-A addressFile|--addressFile=addressFile
+The file of GNAF_CORE addresses (or subset) (default='GNAF_CORE.psv')
+
+-F|--force
+Rebuild the cache and name tables, even if they are current
+
+-w workers|--workers=workers
+The number of worker processes used to read the addresses when the cache is built (default=1)
+
+-v loggingLevel|--verbose=loggingLevel
+Set the level of logging that you want.
+
+-L logDir|--logDir=logDir
+The name of the folder for the logging file
+
+-l logfile|--logfile=logfile
+The name of a logging file where you want all messages captured.
+'''
+
+import sys
+import os
+import argparse
+import logging
+from randPatients import getAustralianAddresses, addressCacheFile
+from columnStore import getNameTable, nameTableFile
+
+
+# This next section is plagurised from /usr/include/sysexits.h
+EX_OK = 0           # successful termination
+EX_WARN = 1         # non-fatal termination with warnings
+
+EX_USAGE = 64        # command line usage error
+EX_DATAERR = 65      # data format error
+EX_NOINPUT = 66      # cannot open input
+EX_NOUSER = 67       # addressee unknown
+EX_NOHOST = 68       # host name unknown
+EX_UNAVAILABLE = 69  # service unavailable
+EX_SOFTWARE = 70     # internal software error
+EX_OSERR = 71        # system error (e.g., can't fork)
+EX_OSFILE = 72       # critical OS file missing
+EX_CANTCREAT = 73    # can't create (user) output file
+EX_IOERR = 74        # input/output error
+EX_TEMPFAIL = 75     # temp failure; user is invited to retry
+EX_PROTOCOL = 76     # remote error in protocol
+EX_NOPERM = 77       # permission denied
+EX_CONFIG = 78       # configuration error
+
+
+if __name__ == '__main__':
+    '''
+The main code
+    '''
+
+    # Save the program name
+    progName = sys.argv[0]
+    progName = progName[0:-3]        # Strip off the .py ending
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-D', '--dataDir', dest='dataDir', default='data',
+                        help='The name of the directory containing source address data and names files and where the cache will be created(default="data")')
+    parser.add_argument('-A', '--addressFile', dest='addressFile', default='GNAF_CORE.psv',
+                        help='The file of GNAF_CORE addresses (or subset) (default="GNAF_CORE.psv")')
+    parser.add_argument('-F', '--force', dest='force', action='store_true', help='Rebuild the cache and name tables, even if they are current')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                        help='The number of worker processes used to read the addresses (default=1)')
+    parser.add_argument('-v', '--verbose', dest='loggingLevel', type=int, choices=range(0,5),
+                        help='The level of logging\n\t0=CRITICAL,1=ERROR,2=WARNING,3=INFO,4=DEBUG')
+    parser.add_argument('-L', '--logDir', dest='logDir', default='logs', help='The name of a directory for the logging file(default="logs")')
+    parser.add_argument('-l', '--logfile', dest='logfile', help='The name of a logging file')
+    args = parser.parse_args()
+
+    # Parse the command line options
+    logging_levels = {0:logging.CRITICAL, 1:logging.ERROR, 2:logging.WARNING, 3:logging.INFO, 4:logging.DEBUG}
+    logfmt = progName + ' [%(asctime)s]: %(message)s'
+    if args.loggingLevel:    # Change the logging level from "WARN" if the -v vebose option is specified
+        loggingLevel = args.loggingLevel
+        if args.logfile:        # and send it to a file if the -o logfile option is specified
+            # Check that the logDir exists
+            if not os.path.isdir(args.logDir):
+                logging.critical('Usage error - logDir (%s) does not exits', args.logDir)
+                logging.shutdown()
+                sys.exit(EX_USAGE)
+            logging.basicConfig(format=logfmt, datefmt='%d/%m/%y %H:%M:%S %p', level=logging_levels[loggingLevel],
+                                filemode='w', filename=os.path.join(args.logDir, args.logfile))
+        else:
+            logging.basicConfig(format=logfmt, datefmt='%d/%m/%y %H:%M:%S %p', level=logging_levels[loggingLevel])
+    else:
+        if args.logfile:        # send the default (WARN) logging to a file if the -o logfile option is specified
+            # Check that the logDir exists
+            if not os.path.isdir(args.logDir):
+                logging.critical('Usage error - logDir (%s) does not exits', args.logDir)
+                logging.shutdown()
+                sys.exit(EX_USAGE)
+            logging.basicConfig(format=logfmt, datefmt='%d/%m/%y %H:%M:%S %p',
+                                filemode='w', filename=os.path.join(args.logDir, args.logfile))
+        else:
+            logging.basicConfig(format=logfmt, datefmt='%d/%m/%y %H:%M:%S %p')
+
+    dataDir = args.dataDir
+    addressFile = args.addressFile
+    workers = args.workers
+
+    # Check that the dataDir and addressFile exist
+    if not os.path.isdir(dataDir):
+        logging.critical('Usage error - dataDir (%s) does not exits', dataDir)
+        logging.shutdown()
+        sys.exit(EX_USAGE)
+    if not os.path.isfile(os.path.join(dataDir, addressFile)):
+        logging.critical('Usage error - addressFile (%s) does not exits', os.path.join(dataDir, addressFile))
+        logging.shutdown()
+        sys.exit(EX_NOINPUT)
+
+    getAustralianAddresses(dataDir, addressFile, 0, rebuildCache=args.force, workers=workers)
+    cacheFile = addressCacheFile(dataDir, addressFile)
+    if not os.path.isfile(cacheFile):
+        logging.critical('Cannot create address cache (%s)', cacheFile)
+        logging.shutdown()
+        sys.exit(EX_CANTCREAT)
+    print(f'Address cache {cacheFile} is current')
+
+    # Compile the names files that are present
+    for namesFile in ('AustralianSurnames.csv', 'boysnames.csv', 'girlsnames.csv'):
+        if os.path.isfile(os.path.join(dataDir, namesFile)):
+            getNameTable(dataDir, namesFile, rebuild=args.force)
+            print(f'Name table {nameTableFile(dataDir, namesFile)} is current')
+    logging.shutdown()
+    sys.exit(EX_OK)
@@ -16,7 +16,9 @@ SYNOPSIS
 $ python mkAltPMI.py [-D dataDir|--dataDir=dataDir] [-A addressFile|--addressFile=addressFile]
                      [-I inputDir|--inputDir=inputDir] [-M masterPMIinputfile|--masterPMIfile=masterPMIinputfile]
                      [-O outputDir|--outputDir=outputDir] [-S secondaryPMIoutputfile|--secondaryPMIfile=secondaryPMIoutputfile]
+                     [-T truthFile|--truthFile=truthFile]
                      [-r|--makeRandom] [-b|-both] [-a|alias2alias] [-m|-merge2merge] [-i|--IHI] [-x|--extendNames] [-e|--errors]
+                     [-w workers|--workers=workers] [-R seed|--seed=seed] [-d referenceDate|--referenceDate=referenceDate]
                      [-v loggingLevel|--loggingLevel=loggingLevel]
                      [-L logDir|--logDir=logDir] [-l logfile|--logfile=logfile]
 
@@ -32,12 +34,18 @@ The directory containing the master PMI file (default='input')
 
 -M masterPMIinputfile|--masterPMIfile=masterPMIinputfile
 The masterPMI file to be read. Default = master.csv
+If the master PMI file's linkage file (e.g. master_truth.csv) is in the input directory, then the linked records are given the true entity of their master PMI record
 
 -O outputDir|--outputDir=outputDir
 The directory where the output will be created (default='output')
 
 -S secondaryPMIoutputfile|--secondaryPMIfile=secondaryPMIoutputfile
 The secondaryPMI file to be created. Default = secondary.csv
+A linkage file, of the true entity (person) of every secondary PMI record, is created alongside it (e.g. secondary_truth.csv)
+
+-T truthFile|--truthFile=truthFile
+A CSV file, to be created in the output directory, recording which secondary PMI records were linked, aliased, merged, deleted, cloned or given errors,
+the master or secondary PMI record they were linked to or cloned from and which fields were perturbed (default=no truth file)
 
 -r|--makeRandom
 Make random Australian addresses
@@ -60,6 +68,19 @@ Extend names with sequential letters
 -e|--errors
 Create errors, such as duplicat UR records, merged and aliases that point to non-existent records or point to deleted records.
 
+-w workers|--workers=workers
+The number of worker processes used to create the random patients (default=1)
+
+-R seed|--seed=seed
+Seed the random number generators, so that the same seed (and the same number of workers) creates the same output (default=unseeded)
+The random number streams are seeded from the seed and the name of the script, so the same seed can be used for each script in a pipeline
+(e.g. mkPMI.py then mkAltPMI.py) without the scripts creating the same patients. However, running a script twice with the same seed creates the same patients,
+so use a different seed for each file (e.g. each secondary PMI) that is to have different patients.
+
+-d referenceDate|--referenceDate=referenceDate
+The date (YYYY-MM-DD) that birthdates, ages and dates of death are relative to (default=today)
+Running a script again, with the same seed and reference date, creates exactly the same output on any day
+
 -v loggingLevel|--verbose=loggingLevel
 Set the level of logging that you want.
 
@@ -72,16 +93,18 @@ The name of a logging file where you want all messages captured.
 
 import sys
 import csv
-import io
 import os
 import argparse
 import logging
 import configparser
-import random
 import datetime
 import re
 from names import nicknames
-from randPatients import patients, patientKeys, mkRandPatients, selectFamilyName, selectBoysname, selectGirlsname, mkLuhn
+from indexedPool import IndexedPool, RangePool
+from columnStore import PMIStoreBuilder
+from sampling import sampleAbsent
+from truthFile import TruthFile, linkageFields, linkageFile, entityName, readLinkage
+from randPatients import patients, patientKeys, iterRandPatients, seedRandom, setReferenceDate, getReferenceDate, errorRandom, selectFamilyName, selectBoysname, selectGirlsname, mkLuhn
 
 
 # This next section is plagurised from /usr/include/sysexits.h
@@ -107,111 +130,103 @@ EX_CONFIG = 78       # configuration error
 
 def masterClone(thisMe, thisLinkMe):
     '''
-Clone thisLinkMe onto thisMe
+Clone the master PMI record in row thisLinkMe onto thisMe and return the list of the PMI fields that were copied from the master PMI record
     '''
 # namely: givenName,familyName,birthdate,sex,streetNo,streetName,streetType,suburb,state,postcode,longitude,latitude,country,mobile,homePhone,businessPhone,email,medicareNo,IHI,dvaNo,dvaType,height,weight,waist,hips,married,race,deathDate
 
-    thisCloneInfo = ''
-    patients[thisMe]['givenName'] = master[thisLinkMe]['givenName']
-    patients[thisMe]['familyName'] = master[thisLinkMe]['familyName']
-    if random.random() < 0.8:                # Often the address is correct
-        thisCloneInfo = 'addr'
+    thisCloned = ['givenName', 'familyName']
+    patients[thisMe]['givenName'] = master.get(thisLinkMe, 'givenName')
+    patients[thisMe]['familyName'] = master.get(thisLinkMe, 'familyName')
+    if errorRandom.random() < 0.8:                # Often the address is correct
+        thisCloned += ['streetNo', 'streetName', 'streetType', 'shortStreetType', 'suburb', 'state', 'postcode', 'longitude', 'latitude', 'country']
         if 'streetNo' in PMIfields:
-            patients[thisMe]['streetNo'] = master[thisLinkMe]['streetNo']
+            patients[thisMe]['streetNo'] = master.get(thisLinkMe, 'streetNo')
         if 'streetName' in PMIfields:
-            patients[thisMe]['streetName'] = master[thisLinkMe]['streetName']
+            patients[thisMe]['streetName'] = master.get(thisLinkMe, 'streetName')
         if 'streetType' in PMIfields:
-            patients[thisMe]['streetType'] = master[thisLinkMe]['streetType']
+            patients[thisMe]['streetType'] = master.get(thisLinkMe, 'streetType')
         if 'shortStreetType' in PMIfields:
-            patients[thisMe]['shortStreetType'] = master[thisLinkMe]['shortStreetType']
+            patients[thisMe]['shortStreetType'] = master.get(thisLinkMe, 'shortStreetType')
         if 'suburb' in PMIfields:
-            patients[thisMe]['suburb'] = master[thisLinkMe]['suburb']
+            patients[thisMe]['suburb'] = master.get(thisLinkMe, 'suburb')
         if 'state' in PMIfields:
-            patients[thisMe]['state'] = master[thisLinkMe]['state']
+            patients[thisMe]['state'] = master.get(thisLinkMe, 'state')
         if 'postcode' in PMIfields:
-            patients[thisMe]['postcode'] = master[thisLinkMe]['postcode']
+            patients[thisMe]['postcode'] = master.get(thisLinkMe, 'postcode')
         if 'longitude' in PMIfields:
-            patients[thisMe]['longitude'] = master[thisLinkMe]['longitude']
+            patients[thisMe]['longitude'] = master.get(thisLinkMe, 'longitude')
         if 'latitude' in PMIfields:
-            patients[thisMe]['latitude'] = master[thisLinkMe]['latitude']
+            patients[thisMe]['latitude'] = master.get(thisLinkMe, 'latitude')
         if 'country' in PMIfields:
-            patients[thisMe]['country'] = master[thisLinkMe]['country']
-    if random.random() < 0.2:                # Sometimes the birthdate is wrong
-        (thisYear, thisMonth, thisDay) = master[thisLinkMe]['birthdate'].split('-')
+            patients[thisMe]['country'] = master.get(thisLinkMe, 'country')
+    if errorRandom.random() < 0.2:                # Sometimes the birthdate is wrong
+        (thisYear, thisMonth, thisDay) = master.get(thisLinkMe, 'birthdate').split('-')
         thisYear = int(thisYear)
         thisMonth = int(thisMonth)
         thisDay = int(thisDay)
         thisBirthdate = datetime.date(thisYear, thisMonth, thisDay)
-        if random.random() < 0.4:                # Sometimes the year is wrong
-            thisBirthdate += datetime.timedelta(days=365)*(int(random.random()*5.0) - 2)
-        if random.random() < 0.3:                # Sometimes the month is wrong
-            thisBirthdate += datetime.timedelta(days=31)*(int(random.random()*5.0) - 2)
-        if random.random() < 0.3:                # Sometimes the day is wrong
-            thisBirthdate += datetime.timedelta(days=1)*(int(random.random()*5.0) - 2)
-        if thisBirthdate < datetime.date.today():
+        if errorRandom.random() < 0.4:                # Sometimes the year is wrong
+            thisBirthdate += datetime.timedelta(days=365)*(int(errorRandom.random()*5.0) - 2)
+        if errorRandom.random() < 0.3:                # Sometimes the month is wrong
+            thisBirthdate += datetime.timedelta(days=31)*(int(errorRandom.random()*5.0) - 2)
+        if errorRandom.random() < 0.3:                # Sometimes the day is wrong
+            thisBirthdate += datetime.timedelta(days=1)*(int(errorRandom.random()*5.0) - 2)
+        if thisBirthdate < getReferenceDate():
             patients[thisMe]['birthdate'] = thisBirthdate.isoformat()
     else:
-        if thisCloneInfo == '':
-            thisCloneInfo = 'bd'
-        else:
-            thisCloneInfo += ',bd'
-        patients[thisMe]['birthdate'] = master[thisLinkMe]['birthdate']
-    patients[thisMe]['sex'] = master[thisLinkMe]['sex']
-    if thisCloneInfo == '':
-        thisCloneInfo = 'sex'
-    else:
-        thisCloneInfo += ',sex'
+        thisCloned.append('birthdate')
+        patients[thisMe]['birthdate'] = master.get(thisLinkMe, 'birthdate')
+    patients[thisMe]['sex'] = master.get(thisLinkMe, 'sex')
+    thisCloned += ['sex', 'mobile', 'homePhone', 'businessPhone', 'email', 'medicareNo', 'IHI', 'dvaNo', 'dvaType']
     if 'mobile' in PMIfields:
-        patients[thisMe]['mobile'] = master[thisLinkMe]['mobile']
+        patients[thisMe]['mobile'] = master.get(thisLinkMe, 'mobile')
     if 'homePhone' in PMIfields:
-        patients[thisMe]['homePhone'] = master[thisLinkMe]['homePhone']
+        patients[thisMe]['homePhone'] = master.get(thisLinkMe, 'homePhone')
     if 'businessPhone' in PMIfields:
-        patients[thisMe]['businessPhone'] = master[thisLinkMe]['businessPhone']
+        patients[thisMe]['businessPhone'] = master.get(thisLinkMe, 'businessPhone')
     if 'email' in PMIfields:
-        patients[thisMe]['email'] = master[thisLinkMe]['email']
+        patients[thisMe]['email'] = master.get(thisLinkMe, 'email')
     if 'medicareNo' in PMIfields:
-        patients[thisMe]['medicareNo'] = master[thisLinkMe]['medicareNo']
+        patients[thisMe]['medicareNo'] = master.get(thisLinkMe, 'medicareNo')
     if 'IHI' in PMIfields:
-        patients[thisMe]['IHI'] = master[thisLinkMe]['IHI']
+        patients[thisMe]['IHI'] = master.get(thisLinkMe, 'IHI')
     if 'dvaNo' in PMIfields:
-        patients[thisMe]['dvaNo'] = master[thisLinkMe]['dvaNo']
+        patients[thisMe]['dvaNo'] = master.get(thisLinkMe, 'dvaNo')
     if 'dvaType' in PMIfields:
-        patients[thisMe]['dvaType'] = master[thisLinkMe]['dvaType']
+        patients[thisMe]['dvaType'] = master.get(thisLinkMe, 'dvaType')
     if 'height' in PMIfields:
-        height = float(master[thisLinkMe]['height'])
-        patients[thisMe]['height'] = f'{random.normalvariate(height, height/50.0):.0f}'
+        height = float(master.get(thisLinkMe, 'height'))
+        patients[thisMe]['height'] = f'{errorRandom.normalvariate(height, height/50.0):.0f}'
     if 'weight' in PMIfields:
-        weight = float(master[thisLinkMe]['weight'])
-        patients[thisMe]['weight'] = f'{random.normalvariate(weight, weight/20.0):.0f}'
+        weight = float(master.get(thisLinkMe, 'weight'))
+        patients[thisMe]['weight'] = f'{errorRandom.normalvariate(weight, weight/20.0):.0f}'
     if 'waist' in PMIfields:
-        waist = float(master[thisLinkMe]['waist'])
-        patients[thisMe]['waist'] = f'{random.normalvariate(waist, waist/25.0):.0f}'
+        waist = float(master.get(thisLinkMe, 'waist'))
+        patients[thisMe]['waist'] = f'{errorRandom.normalvariate(waist, waist/25.0):.0f}'
     if 'hips' in PMIfields:
-        hips = float(master[thisLinkMe]['hips'])
-        patients[thisMe]['hips'] = f'{random.normalvariate(hips, waist/25.0):.0f}'
+        hips = float(master.get(thisLinkMe, 'hips'))
+        patients[thisMe]['hips'] = f'{errorRandom.normalvariate(hips, waist/25.0):.0f}'
     if 'married' in PMIfields:
-        patients[thisMe]['married'] = master[thisLinkMe]['married']
+        patients[thisMe]['married'] = master.get(thisLinkMe, 'married')
     if 'race' in PMIfields:
-        patients[thisMe]['race'] = master[thisLinkMe]['race']
+        patients[thisMe]['race'] = master.get(thisLinkMe, 'race')
     if 'deathDate' in PMIfields:
-        patients[thisMe]['deathDate'] = master[thisLinkMe]['deathDate']
-    return 'name,' + thisCloneInfo
+        patients[thisMe]['deathDate'] = master.get(thisLinkMe, 'deathDate')
+    thisCloned += ['married', 'race', 'deathDate']
+    return [field for field in thisCloned if field in PMIfields]
 
 
 def clone(thisMe, other):
     '''
-Clone other onto thisMe
+Clone other onto thisMe and return the list of the PMI fields that were copied from other
     '''
 # namely: givenName,familyName,birthdate,sex,streetNo,streetName,streetType,suburb,state,postcode,longitude,latitude,country,mobile,homePhone,businessPhone,email,medicareNo,IHI,dvaNo,dvaType,height,weight,waist,hips,married,race,deathDate
 
-    thisCloneInfo = ''
+    thisCloned = ['givenName', 'familyName']
     patients[thisMe]['givenName'] = patients[other]['givenName']
     patients[thisMe]['familyName'] = patients[other]['familyName']
-    if random.random() < 0.8:                # Often the address is correct
-        if thisCloneInfo == '':
-            thisCloneInfo = 'addr'
-        else:
-            thisCloneInfo += ',addr'
+    if errorRandom.random() < 0.8:                # Often the address is correct
+        thisCloned += ['streetNo', 'streetName', 'streetType', 'shortStreetType', 'suburb', 'state', 'postcode', 'longitude', 'latitude', 'country']
         if 'streetNo' in PMIfields:
             patients[thisMe]['streetNo'] = patients[other]['streetNo']
         if 'streetName' in PMIfields:
@@ -232,11 +247,8 @@ Clone other onto thisMe
             patients[thisMe]['latitude'] = patients[other]['latitude']
         if 'country' in PMIfields:
             patients[thisMe]['country'] = patients[other]['country']
-    if random.random() < 0.2:                # Sometimes the phone numbers are wrong
-        if thisCloneInfo == '':
-            thisCloneInfo = 'ph'
-        else:
-            thisCloneInfo += ',ph'
+    if errorRandom.random() < 0.2:                # Sometimes the phone numbers are wrong
+        thisCloned += ['mobile', 'homePhone', 'businessPhone', 'email']
         if 'mobile' in PMIfields:
             patients[thisMe]['mobile'] = patients[other]['mobile']
         if 'homePhone' in PMIfields:
@@ -245,34 +257,24 @@ Clone other onto thisMe
             patients[thisMe]['businessPhone'] = patients[other]['businessPhone']
         if 'email' in PMIfields:
             patients[thisMe]['email'] = patients[other]['email']
-    if thisCloneInfo == '':
-        thisCloneInfo = 'bd'
-    else:
-        thisCloneInfo += ',bd'
-    if random.random() < 0.2:                # Sometimes the birthdate is wrong
+    if errorRandom.random() < 0.2:                # Sometimes the birthdate is wrong
         (thisYear, thisMonth, thisDay) = patients[other]['birthdate'].split('-')
         thisYear = int(thisYear)
         thisMonth = int(thisMonth)
         thisDay = int(thisDay)
         thisBirthdate = datetime.date(thisYear, thisMonth, thisDay)
-        if random.random() < 0.4:                # Sometimes the year is wrong
-            thisBirthdate += datetime.timedelta(days=365)*(int(random.random()*5.0) - 2)
-        if random.random() < 0.3:                # Sometimes the month is wrong
-            thisBirthdate += datetime.timedelta(days=31)*(int(random.random()*5.0) - 2)
-        if random.random() < 0.3:                # Sometimes the day is wrong
-            thisBirthdate += datetime.timedelta(days=1)*(int(random.random()*5.0) - 2)
+        if errorRandom.random() < 0.4:                # Sometimes the year is wrong
+            thisBirthdate += datetime.timedelta(days=365)*(int(errorRandom.random()*5.0) - 2)
+        if errorRandom.random() < 0.3:                # Sometimes the month is wrong
+            thisBirthdate += datetime.timedelta(days=31)*(int(errorRandom.random()*5.0) - 2)
+        if errorRandom.random() < 0.3:                # Sometimes the day is wrong
+            thisBirthdate += datetime.timedelta(days=1)*(int(errorRandom.random()*5.0) - 2)
         patients[thisMe]['birthdate'] = thisBirthdate.isoformat()
     else:
+        thisCloned.append('birthdate')
         patients[thisMe]['birthdate'] = patients[other]['birthdate']
-    if thisCloneInfo == '':
-        thisCloneInfo = 'sex'
-    else:
-        thisCloneInfo += ',sex'
     patients[thisMe]['sex'] = patients[other]['sex']
-    if thisCloneInfo == '':
-        thisCloneInfo = 'mc,etc'
-    else:
-        thisCloneInfo += ',mc,etc'
+    thisCloned += ['sex', 'medicareNo', 'IHI', 'dvaNo', 'dvaType']
     if 'medicareNo' in PMIfields:
         patients[thisMe]['medicareNo'] = patients[other]['medicareNo']
     if 'IHI' in PMIfields:
@@ -283,34 +285,56 @@ Clone other onto thisMe
         patients[thisMe]['dvaType'] = patients[other]['dvaType']
     if 'height' in PMIfields:
         height = float(patients[other]['height'])
-        patients[thisMe]['height'] = f'{random.normalvariate(height, height/50.0):.0f}'
+        patients[thisMe]['height'] = f'{errorRandom.normalvariate(height, height/50.0):.0f}'
     if 'weight' in PMIfields:
         weight = float(patients[other]['weight'])
-        patients[thisMe]['weight'] = f'{random.normalvariate(weight, weight/20.0):.0f}'
+        patients[thisMe]['weight'] = f'{errorRandom.normalvariate(weight, weight/20.0):.0f}'
     if 'waist' in PMIfields:
         waist = float(patients[other]['waist'])
-        patients[thisMe]['waist'] = f'{random.normalvariate(waist, waist/25.0):.0f}'
+        patients[thisMe]['waist'] = f'{errorRandom.normalvariate(waist, waist/25.0):.0f}'
     if 'hips' in PMIfields:
         hips = float(patients[other]['hips'])
-        patients[thisMe]['hips'] = f'{random.normalvariate(hips, hips/25.0):.0f}'
+        patients[thisMe]['hips'] = f'{errorRandom.normalvariate(hips, hips/25.0):.0f}'
     if 'married' in PMIfields:
         patients[thisMe]['married'] = patients[other]['married']
     if 'race' in PMIfields:
         patients[thisMe]['race'] = patients[other]['race']
     if 'deathDate' in PMIfields:
         patients[thisMe]['deathDate'] = patients[other]['deathDate']
-    return 'name,' + thisCloneInfo
+    thisCloned += ['married', 'race', 'deathDate']
+    return [field for field in thisCloned if field in PMIfields]
 
 
-def csvString(thisRow):
+def perturbedFields(thisMe, source, thisPerturbed):
     '''
-    Convert this row to a CSV compliant string
+Return thisPerturbed plus the other PMI fields of thisMe that differ from those in source (the record thisMe was cloned from, as a dictionary)
     '''
+    thisPerturbed = list(thisPerturbed)
+    for field in PMIfields:
+        if field in ['PID', 'UR', 'Alias', 'Merged', 'Deleted', 'AltUR', 'AltIHI']:        # Identifiers, flags and links are not cloned
+            continue
+        if (field in source) and (field not in thisPerturbed) and (patients[thisMe][field] != source[field]):
+            thisPerturbed.append(field)
+    return thisPerturbed
 
-    si = io.StringIO()
-    cw = csv.writer(si)
-    cw.writerow(thisRow)
-    return si.getvalue().rstrip('\r\n')
+
+def masterEntity(thisLinkMe):
+    '''
+Return the true entity of the master PMI record in row thisLinkMe (from the master PMI linkage file, if there was one)
+    '''
+    thisPID = masterPID(thisLinkMe)
+    if thisPID in masterEntities:
+        return masterEntities[thisPID]
+    return entityName(PMIinputfile, thisPID)
+
+
+def masterPID(thisLinkMe):
+    '''
+Return the PID of the master PMI record in row thisLinkMe (or the row number, if the master PMI file has no PID column)
+    '''
+    if 'PID' in master:
+        return master.get(thisLinkMe, 'PID')
+    return str(thisLinkMe)
 
 
 
@@ -336,6 +360,8 @@ The main code
                         help='The name of the output directory [mkAltPMI.cfg will be read from this directory](default="output")')
     parser.add_argument('-S', '--secondaryPMIfile', dest='secondaryPMIoutputfile', default='secondary.csv',
                         help='The name of the secondary PMI csv file to be created(default="secondary.csv"')
+    parser.add_argument('-T', '--truthFile', dest='truthFile',
+                        help='The name of a csv file, of the linked, aliased, merged, deleted, cloned and perturbed records, to be created(default=none)')
     parser.add_argument('-r', '--makeRandom', dest='makeRandom', action='store_true', help='Make random Australian address')
     parser.add_argument('-b', '--both', dest='both', action='store_true', help='PMI records can be both merged and an alias')
     parser.add_argument('-a', '--alias2alias', dest='alias2alias', action='store_true', help='Allow aliases to aliased or merged patient')
@@ -343,6 +369,11 @@ The main code
     parser.add_argument('-i', '--IHI', dest='IHI', action='store_true', help='Add alt Australian IHI number')
     parser.add_argument('-x', '--extendNames', dest='extendNames', action='store_true', help='Extend names with sequential letters')
     parser.add_argument('-e', '--errors', dest='errors', action='store_true', help='Create PMI with errors')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                        help='The number of worker processes used to create the random patients(default=1)')
+    parser.add_argument('-R', '--seed', dest='seed', type=int, help='The seed for the random number generators(default=unseeded)')
+    parser.add_argument('-d', '--referenceDate', dest='referenceDate', type=datetime.date.fromisoformat,
+                        help='The date (YYYY-MM-DD) that birthdates and ages are relative to(default=today)')
     parser.add_argument('-v', '--verbose', dest='loggingLevel', type=int, choices=range(0,5),
                         help='The level of logging\n\t0=CRITICAL,1=ERROR,2=WARNING,3=INFO,4=DEBUG')
     parser.add_argument('-L', '--logDir', dest='logDir', default='logs', help='The name of a directory for the logging file(default="logs")')
@@ -382,12 +413,20 @@ The main code
     PMIinputfile = args.masterPMIinputfile
     outputDir = args.outputDir
     PMIoutputfile = args.secondaryPMIoutputfile
+    truthFile = args.truthFile
     makeRandom = args.makeRandom
     both = args.both
     alias2alias = args.alias2alias
     merge2merge = args.merge2merge
     IHI = args.IHI
     extendNames = args.extendNames
+    workers = args.workers
+    seed = args.seed
+    if seed is not None:        # Make this run reproducible, with random number streams of this script's own
+        seed = f'{seed}/mkAltPMI'
+        seedRandom(seed)
+    if args.referenceDate is not None:        # Make birthdates and ages relative to this date, rather than today
+        setReferenceDate(args.referenceDate)
     errors = args.errors
 
     # Check that the dataDir exists
@@ -498,22 +537,15 @@ The main code
     noOfPMIrecords = int(((endUR - startUR)/skipUR)*1.5)
 
     UsedIDs = {}
-    mkRandPatients(dataDir, addressFile, noOfPMIrecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, False)        # Create enough random patient
+    patientStream = iterRandPatients(dataDir, addressFile, noOfPMIrecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, False, workers=workers, seed=seed)        # Enough random patients, created as required
 
-    # Now read in the master PMI file
-    master = {}
-    masterIDX = []
+    # Now read in the master PMI file, one row at a time, into a compact column store
+    master = None
     masterHas = {}
     PMIfields = []
     PMIfields.append('PID')
     hasIHI = False
-    masterUR = []
-    masterAlias = []
-    masterMerged = []
-    masterDeleted = []
-    minUR = 0
-    maxUR = 0
-    masterSkippedUR = []
+    masterSkippedUR = IndexedPool()
     with open(os.path.join(inputDir, PMIinputfile), 'rt', newline='', encoding='utf-8') as csvfile:
         csvreader = csv.reader(csvfile, dialect=csv.excel)
         header = True
@@ -548,47 +580,39 @@ The main code
                 if IHI and not hasIHI:
                     logging.fatal('master PMI file (%s) does not contain a column named "IHI"', PMIinputfile)
                     sys.exit(EX_CONFIG)
+                masterBuilder = PMIStoreBuilder(row)
                 header = False
                 continue
-            if 'Alias' in PMIfields:
-                if row[masterHas['Alias']] != '':
-                    masterAlias.append(row[masterHas['UR']])
-            if 'Merged' in PMIfields:
-                if row[masterHas['Merged']] != '':
-                    masterMerged.append(row[masterHas['UR']])
-            if 'Deleted' in PMIfields:
-                if row[masterHas['Deleted']] == 'D':
-                    masterDeleted.append(row[masterHas['UR']])
-            masterMe = row[masterHas['givenName']] + '~' + row[masterHas['familyName']]
-            master[masterMe] = {}
-            masterIDX.append(masterMe)
-            for col, i in masterHas.items():
-                master[masterMe][col] = row[i]
-                try:
-                    thisUR = int(row[masterHas['UR']])
-                    if (minUR == 0) or (minUR > int(row[masterHas['UR']])):
-                        minUR = int(row[masterHas['UR']])
-                    if (maxUR == 0) or (maxUR < int(row[masterHas['UR']])):
-                        maxUR = int(row[masterHas['UR']])
-                except Exception as e:
-                    thisUR = None
-
+            masterBuilder.add(row)
+        if header:
+            logging.fatal('master PMI file (%s) is empty', PMIinputfile)
+            sys.exit(EX_CONFIG)
+        master = masterBuilder.finish()
+        masterBuilder = None
+        masterIDX = RangePool(len(master))          # The master rows that have not yet been linked
+        masterAlias = master.flagRows('Alias')      # The master rows that are aliases, merged or deleted
+        masterMerged = master.flagRows('Merged')
+        masterDeleted = master.flagRows('Deleted')
         if errors:
-            for ur in range(minUR, maxUR):
-                if len(masterSkippedUR) > (endUR - startUR)*2*badAltURerrors/100.0:
-                    break
-                if (ur not in masterUR) and (ur not in masterAlias) and (ur not in masterMerged) and (ur not in masterDeleted):
-                    masterSkippedUR.append(ur)
+            # Sample the skipped master UR numbers from the unused UR numbers in the range of master UR numbers
+            minUR, maxUR, masterURgaps = master.URgaps()
+            if minUR is not None:
+                masterSkippedUR = IndexedPool(sampleAbsent(int((endUR - startUR)*2*badAltURerrors/100.0) + 1, minUR, maxUR, masterURgaps, errorRandom))
+
+    # Read the true entities of the master PMI records, if the master PMI file has a linkage file
+    masterEntities = readLinkage(os.path.join(inputDir, linkageFile(PMIinputfile)))
 
-    # Now create the secondary PMI
+    # Now create the secondary PMI (and the linkage and truth files)
+    linkage = TruthFile(os.path.join(outputDir, linkageFile(PMIoutputfile)), linkageFields)
+    truth = None
+    if truthFile:
+        truth = TruthFile(os.path.join(outputDir, truthFile), ['PID', 'UR', 'actions', 'source', 'sourcePID', 'sourceUR', 'cloned', 'perturbed'])
     with open(os.path.join(outputDir, PMIoutputfile), 'wt', newline='', encoding='utf-8') as csvfile:
         csvwriter = csv.writer(csvfile, dialect=csv.excel)
         csvwriter.writerow(PMIfields)
-        info = [''] + PMIfields
-        logging.info(csvString(info))
-        masterMe = []            # not alias/not merged/not deleted patients
-        masterDelMe = []        # deleted, but not alias/not merged patients
-        skippedUR = []
+        masterMe = IndexedPool()            # not alias/not merged/not deleted patients
+        masterDelMe = IndexedPool()        # deleted, but not alias/not merged patients
+        skippedUR = IndexedPool()
         rCount = 0
         aCount = 0
         mCount = 0
@@ -612,9 +636,10 @@ The main code
         mergedAltCount = 0
         deletedAltCount = 0
         linkedCount = 0
-        clones = []
+        clones = IndexedPool()
         while URno < endUR:
-            me = patientKeys[patient]
+            me, patients[me] = next(patientStream)        # Only the patients in the PMI are kept (for aliases, merges and duplicates)
+            patientKeys.append(me)
             patients[me]['PID'] = PID        # Create a new patient records
             patients[me]['UR'] = URno
             patients[me]['Alias'] = ''
@@ -622,148 +647,125 @@ The main code
             patients[me]['Deleted'] = ''
             patients[me]['AltUR'] = ''
             if IHI:
-                if random.random()*100 < percentIHI:                    # Check alt IHI required
+                if errorRandom.random()*100 < percentIHI:                    # Check alt IHI required
                     patients[me]['IHI'] = f"{800360990000000 + IHIno:d}{mkLuhn(f'{800360990000000 + IHIno:d}'):d}"
                     if skipIHI == 0:
                         IHIno += 1
                     elif skipIHI < 3:
                         IHIno += skipIHI
                     else:
-                        IHIno += random.randrange(skipIHI - 1, skipIHI + 1)
+                        IHIno += errorRandom.randrange(skipIHI - 1, skipIHI + 1)
                     IHIno %= 10000000
                 else:
                     patients[me]['IHI'] = None
                 patients[me]['AltIHI'] = patients[me]['IHI']
-            if random.random()*100 < deceased:                    # Check if time for a deceased person
+            if errorRandom.random()*100 < deceased:                    # Check if time for a deceased person
                 (year, month, day) = patients[me]['birthdate'].split('-')
                 year = int(year)
                 month = int(month)
                 day = int(day)
                 birthdate = datetime.date(year, month, day)
-                today = datetime.date.today()
+                today = getReferenceDate()
                 age = today - birthdate
-                deathDay = int(random.random()*age.days)
+                deathDay = int(errorRandom.random()*age.days)
                 deathDate = birthdate + datetime.timedelta(deathDay)
                 patients[me]['deathDate'] = deathDate.isoformat()
             else:
                 patients[me]['deathDate'] = ''
-            infoText = ''
-            linkInfo = ''
-            cloneInfo = ''
+            actions = []
+            perturbed = []
+            linked = []
+            cloned = []
             dupMe = None
             linkMe = None
             rCount += 1
             if patient < 10:            # Make sure we have a small pool of not alias/not merged/not deleted records
-                masterMe.append(me)            # Keep track of not alias/not merged/not deleted patients
-                masterDelMe.append(me)            # Keep track of deleted, but not alias/not merged patients
-            elif random.random()*100 < hasAltUR:                    # Check if time for a linked record
-                linkMe =  random.choice(masterIDX)
-                del masterIDX[masterIDX.index(linkMe)]
-                linkInfo = masterClone(me, linkMe)
-                patients[me]['AltUR'] = master[linkMe]['UR']
+                masterMe.add(me)            # Keep track of not alias/not merged/not deleted patients
+                masterDelMe.add(me)            # Keep track of deleted, but not alias/not merged patients
+            elif errorRandom.random()*100 < hasAltUR:                    # Check if time for a linked record
+                linkMe = masterIDX.pop(errorRandom)
+                linked = masterClone(me, linkMe)
+                patients[me]['AltUR'] = master.get(linkMe, 'UR')
+                actions.append('linked')
                 linkedCount += 1
                 if errors:
                     if IHI:
-                        if patients[me]['IHI'] and (random.random()*100 < badAltIHIerrors):        # Check bad alt IHI required
-                            if infoText == '':
-                                infoText = 'IHI'
-                            else:
-                                infoText += ',IHI'
-                            altIHI = f"{patients[me]['IHI'][0:7]}{random.randrange(1000000000):d}"
+                        if patients[me]['IHI'] and (errorRandom.random()*100 < badAltIHIerrors):        # Check bad alt IHI required
+                            perturbed.append('AltIHI')
+                            altIHI = f"{patients[me]['IHI'][0:7]}{errorRandom.randrange(1000000000):d}"
                             patients[me]['AltIHI'] = f'{altIHI}{mkLuhn(altIHI):d}'
                         else:
                             patients[me]['AltIHI'] = patients[me]['IHI']
-                    if random.random()*100 < badAltURerrors:                # Check if time for a bad AltUR record
-                        if infoText == '':
-                            infoText = 'AltUR'
-                        else:
-                            infoText += ',AltUR'
+                    if errorRandom.random()*100 < badAltURerrors:                # Check if time for a bad AltUR record
+                        actions.append('badAltUR')
+                        perturbed.append('AltUR')
                         if len(masterSkippedUR) > 0:
-                            patients[me]['AltUR'] = random.choice(masterSkippedUR)
-                            del masterSkippedUR[masterSkippedUR.index(patients[me]['AltUR'])]
+                            patients[me]['AltUR'] = masterSkippedUR.pop(errorRandom)
                         else:
                             patients[me]['AltUR'] = f"{patients[me]['AltUR']}X"
                         badAltCount += 1
-                    elif random.random()*100 < aliasAltURerrors:                # Check if time for an AltUR of an alias record
+                    elif errorRandom.random()*100 < aliasAltURerrors:                # Check if time for an AltUR of an alias record
                         if len(masterAlias) > 0:
-                            if infoText == '':
-                                infoText = 'aliasAltUR'
-                            else:
-                                infoText += ',aliasAltUR'
-                            patients[me]['AltUR'] = random.choice(masterAlias)
+                            actions.append('aliasAltUR')
+                            perturbed.append('AltUR')
+                            patients[me]['AltUR'] = master.get(errorRandom.choice(masterAlias), 'UR')
                         else:
-                            if infoText == '':
-                                infoText = 'AltUR'
-                            else:
-                                infoText += ',AltUR'
+                            actions.append('badAltUR')
+                            perturbed.append('AltUR')
                             patients[me]['AltUR'] = f"{patients[me]['AltUR']}X"
                         aliasAltCount += 1
-                    elif random.random()*100 < mergedAltURerrors:                # Check if time for an AltUR of a merged record
+                    elif errorRandom.random()*100 < mergedAltURerrors:                # Check if time for an AltUR of a merged record
                         if len(masterMerged) > 0:
-                            if infoText == '':
-                                infoText = 'mergedAltUR'
-                            else:
-                                infoText += ',mergedAltUR'
-                            patients[me]['AltUR'] = random.choice(masterMerged)
+                            actions.append('mergedAltUR')
+                            perturbed.append('AltUR')
+                            patients[me]['AltUR'] = master.get(errorRandom.choice(masterMerged), 'UR')
                         else:
-                            if infoText == '':
-                                infoText = 'AltUR'
-                            else:
-                                infoText += ',AltUR'
+                            actions.append('badAltUR')
+                            perturbed.append('AltUR')
                             patients[me]['AltUR'] = f"{patients[me]['AltUR']}X"
                         mergedAltCount += 1
-                    elif random.random()*100 < deletedAltURerrors:                # Check if time for an AltUR of a deleted record
+                    elif errorRandom.random()*100 < deletedAltURerrors:                # Check if time for an AltUR of a deleted record
                         if len(masterDeleted) > 0:
-                            if infoText == '':
-                                infoText = 'DelAltUR'
-                            else:
-                                infoText += ',DelAltUR'
-                            patients[me]['AltUR'] = random.choice(masterDeleted)
+                            actions.append('deletedAltUR')
+                            perturbed.append('AltUR')
+                            patients[me]['AltUR'] = master.get(errorRandom.choice(masterDeleted), 'UR')
                         else:
-                            if infoText == '':
-                                infoText = 'AltUR'
-                            else:
-                                infoText += ',AltUR'
+                            actions.append('badAltUR')
+                            perturbed.append('AltUR')
                             patients[me]['AltUR'] = f"{patients[me]['AltUR']}X"
                         deletedAltCount += 1
             else:
                 isAlias  = False
                 isMerge  = False
-                if random.random()*100 < aliases:                    # Check if time for an alias record
+                if errorRandom.random()*100 < aliases:                    # Check if time for an alias record
                     if alias2alias:
-                        dupMe =  patientKeys[random.randrange(0, patient)]
+                        dupMe =  patientKeys[errorRandom.randrange(0, patient)]
                     else:
-                        dupMe =  random.choice(masterDelMe)
+                        dupMe =  masterDelMe.choice(errorRandom)
                     patients[me]['Alias'] = patients[dupMe]['UR']
+                    actions.append('alias')
                     isAlias = True
                     aCount += 1
 
                     # Duplicate some patient data
-                    cloneInfo = clone(me, dupMe)
+                    cloned = clone(me, dupMe)
                     if errors and IHI:
-                        if patients[me]['IHI'] and (random.random()*100 < badAltIHIerrors):        # Check bad alt IHI required
-                            if infoText == '':
-                                infoText = 'AltIHI'
-                            else:
-                                infoText += ',AltIHI'
-                            altIHI = f"{patients[me]['IHI'][0:7]}{random.randrange(1000000000):d}"
+                        if patients[me]['IHI'] and (errorRandom.random()*100 < badAltIHIerrors):        # Check bad alt IHI required
+                            perturbed.append('AltIHI')
+                            altIHI = f"{patients[me]['IHI'][0:7]}{errorRandom.randrange(1000000000):d}"
                             patients[me]['AltIHI'] = f'{altIHI}{mkLuhn(altIHI):d}'
                         else:
                             patients[me]['AltIHI'] = patients[me]['IHI']
 
                     # Then change a name (family name for females, givenName for everything else)
                     if patients[me]['sex'] == 'F':
-                        if infoText == '':
-                            infoText = 'fn'
-                        else:
-                            infoText += ',fn'
                         patients[me]['givenName'] = patients[dupMe]['givenName']
                         familyName = selectFamilyName()
                         if patients[me]['married'] == 'M':                # Two options if married
                             prevName = re.search(r' \(| \[', patients[me]['familyName'])
                             if prevName:
                                 patients[me]['familyName'] = patients[me]['familyName'][0:prevName.start()]        # remove previous name
-                            if random.random() < 0.5:
+                            if errorRandom.random() < 0.5:
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} ({familyName})"    # add previous name
                             else:
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} (nee{familyName})"    # add previous name
@@ -772,74 +774,69 @@ The main code
                             if hyphen:
                                 patients[me]['familyName'] = patients[me]['familyName'][0:hyphen.start()]        # de-hyphenate
                             patients[me]['familyName'] += '-' + familyName                    # hyphenate
+                        if patients[me]['familyName'] != patients[dupMe]['familyName']:
+                            perturbed.append('familyName')
                     else:
-                        if infoText == '':
-                            infoText = 'gn'
-                        else:
-                            infoText += ',gn'
                         patients[me]['familyName'] = patients[dupMe]['familyName']
                         givenName = selectBoysname()
                         patients[me]['givenName'] = givenName            # simple substitution
+                        if patients[me]['givenName'] != patients[dupMe]['givenName']:
+                            perturbed.append('givenName')
                     if patients[dupMe]['Deleted'] == 'D':
-                        if errors and (random.random()*100 < undelAliases):        # Check if time for an undeleted alias of a deleted record
+                        if errors and (errorRandom.random()*100 < undelAliases):        # Check if time for an undeleted alias of a deleted record
+                            actions.append('undeleted')
                             undelAcount += 1
                         else:
                             patients[me]['Deleted'] = 'D'
-                    elif errors and (random.random()*100 < orphanAliases):            # Check if time for an orphaned alias record
-                        if infoText == '':
-                            infoText = 'UR'
-                        else:
-                            infoText += ',UR'
+                    elif errors and (errorRandom.random()*100 < orphanAliases):            # Check if time for an orphaned alias record
+                        actions.append('orphan')
+                        perturbed.append('UR')
                         if len(skippedUR) > 0:
-                            patients[me]['UR'] =  random.choice(skippedUR)
-                            del skippedUR[skippedUR.index(patients[me]['UR'])]
+                            patients[me]['UR'] = skippedUR.pop(errorRandom)
                         else:
                             patients[me]['UR'] = f"{patients[me]['UR']}X"
                         orphAcount += 1
-                if ((dupMe is None) or both) and (random.random()*100 < merged):    # Check if time for a merged record
+                if ((dupMe is None) or both) and (errorRandom.random()*100 < merged):    # Check if time for a merged record
                     if dupMe is None:
                         if merge2merge:
-                            dupMe =  patientKeys[random.randrange(0, patient)]
+                            dupMe =  patientKeys[errorRandom.randrange(0, patient)]
                         else:
-                            dupMe =  random.choice(masterDelMe)
+                            dupMe =  masterDelMe.choice(errorRandom)
                     patients[me]['Merged'] = patients[dupMe]['UR']
+                    actions.append('merged')
                     mCount += 1
                     isMerge = True
                     if isAlias:
                         bCount += 1
 
-                    # Duplicate some patient data
-                    cloneInfo += '/' + clone(me, dupMe)
+                    # Duplicate some patient data (a merged alias is cloned twice from the same record)
+                    cloned += [field for field in clone(me, dupMe) if field not in cloned]
                     if errors and IHI:
-                        if infoText == '':
-                            infoText = 'AltIHI'
-                        else:
-                            infoText += ',AltIHI'
-                        if patients[me]['IHI'] and (random.random()*100 < badAltIHIerrors):        # Check bad alt IHI required
-                            altIHI = f"{patients[me]['IHI'][0:7]}{random.randrange(1000000000):d}"
+                        if patients[me]['IHI'] and (errorRandom.random()*100 < badAltIHIerrors):        # Check bad alt IHI required
+                            perturbed.append('AltIHI')
+                            altIHI = f"{patients[me]['IHI'][0:7]}{errorRandom.randrange(1000000000):d}"
                             patients[me]['AltIHI'] = f'{altIHI}{mkLuhn(altIHI):d}'
                         else:
                             patients[me]['AltIHI'] = patients[me]['IHI']
 
                     if patients[dupMe]['Deleted'] == 'D':
-                        if errors and (random.random()*100 < undelMerges):    # Check if time for an undeleted merge of a deleted record
+                        if errors and (errorRandom.random()*100 < undelMerges):    # Check if time for an undeleted merge of a deleted record
+                            actions.append('undeleted')
                             undelMcount += 1
                         else:
                             patients[me]['Deleted'] = 'D'
-                    elif errors and (random.random()*100 < orphanMerges):        # Check if time for an orphaned merged record
-                        if infoText == '':
-                            infoText = 'UR'
-                        else:
-                            infoText += ',IHI'
+                    elif errors and (errorRandom.random()*100 < orphanMerges):        # Check if time for an orphaned merged record
+                        actions.append('orphan')
+                        perturbed.append('UR')
                         if len(skippedUR) > 0:
-                            patients[me]['UR'] = random.choice(skippedUR)
-                            del skippedUR[skippedUR.index(patients[me]['UR'])]
+                            patients[me]['UR'] = skippedUR.pop(errorRandom)
                         else:
                             patients[me]['UR'] = f"{patients[me]['UR']}X"
                         orphMcount += 1
                 isDel = False
-                if random.random()*100 < deleted:                    # Check if time for a deleted record
+                if errorRandom.random()*100 < deleted:                    # Check if time for a deleted record
                     patients[me]['Deleted'] = 'D'
+                    actions.append('deleted')
                     isDel = True
                     dCount += 1
                     if isAlias:
@@ -850,39 +847,30 @@ The main code
                     elif isMerge:
                         dMcount += 1
                     else:
-                        masterDelMe.append(me)        # Keep track of deleted, but not alias/not merged patients
+                        masterDelMe.add(me)        # Keep track of deleted, but not alias/not merged patients
                 elif errors and (dupMe is None):
-                    if random.random()*100 < dupUR:            # Check if time for a duplicate UR record
-                        dupMe =  random.choice(masterMe)
+                    if errorRandom.random()*100 < dupUR:            # Check if time for a duplicate UR record
+                        dupMe =  masterMe.choice(errorRandom)
                         patients[me]['UR'] = patients[dupMe]['UR']
+                        actions.append('dupUR')
                         dupCount += 1
-                        skippedUR.append(URno)
-                    elif random.random()*100 < potDup:
-                        dupMe =  masterMe[random.randrange(0, len(masterMe))]
+                        skippedUR.add(URno)
+                    elif errorRandom.random()*100 < potDup:
+                        dupMe =  masterMe.choice(errorRandom)
                         actDup = False
 
                         # Duplicate some patient data
-                        cloneInfo = clone(me, dupMe)
+                        cloned = clone(me, dupMe)
 
-                        if random.random() < 0.3:            # Sometimes the marital status is wrong
-                            if infoText == '':
-                                infoText = 'married'
-                            else:
-                                infoText += ',married'
+                        if errorRandom.random() < 0.3:            # Sometimes the marital status is wrong
+                            perturbed.append('married')
                             if patients[me]['married'] == 'M':
                                 patients[me]['married'] = 'S'
                             else:
                                 patients[me]['married'] = 'M'
                         if patients[me]['birthdate'] != patients[dupMe]['birthdate']:
-                            if infoText == '':
-                                infoText = 'bd'
-                            else:
-                                infoText += ',bd'
-                        elif random.random() < 0.25:            # Sometimes the givenName is wrong
-                            if infoText == '':
-                                infoText = 'gn'
-                            else:
-                                infoText += ',gn'
+                            perturbed.append('birthdate')
+                        elif errorRandom.random() < 0.25:            # Sometimes the givenName is wrong
                             givenName = patients[me]['givenName']
                             if patients[me]['sex'] == 'F':
                                 patients[me]['givenName'] = selectGirlsname()
@@ -890,20 +878,17 @@ The main code
                                 patients[me]['givenName'] = selectBoysname()
                             if givenName == patients[me]['givenName']:
                                 actDup = True
-                        elif random.random() < 0.333:            # Sometimes the family name is wrong
-                            if infoText == '':
-                                infoText = 'fn'
                             else:
-                                infoText += ',fn'
+                                perturbed.append('givenName')
+                        elif errorRandom.random() < 0.333:            # Sometimes the family name is wrong
                             familyName = patients[me]['familyName']
                             patients[me]['familyName'] = selectFamilyName()
                             if familyName == patients[me]['familyName']:
                                 actDup = True
-                        elif random.random() < 0.5:            # Sometimes the sex is wrong
-                            if infoText == '':
-                                infoText = 'sex'
                             else:
-                                infoText += ',sex'
+                                perturbed.append('familyName')
+                        elif errorRandom.random() < 0.5:            # Sometimes the sex is wrong
+                            perturbed.append('sex')
                             if patients[me]['sex'] == 'M':
                                 patients[me]['sex'] = 'F'
                             else:
@@ -914,39 +899,40 @@ The main code
                         thisKey += patients[me]['sex'] + '~' + patients[me]['birthdate']
                         if thisKey in clones:
                             actDupCount += 1
+                            actions.append('dup')
                         else:
-                            clones.append(thisKey)
+                            clones.add(thisKey)
                             if actDup:
                                 actDupCount += 1
+                                actions.append('dup')
                             else:
                                 potDupCount += 1
+                                actions.append('potDup')
                     else:
-                        masterMe.append(me)                    # Keep track of not alias/not merged/not deleted patients
+                        masterMe.add(me)                    # Keep track of not alias/not merged/not deleted patients
                 if errors and (dupMe is None) and (not isDel):
-                    if random.random()*100 < familyNameErrors:        # Check if time for a family name error
-                        if infoText == '':
-                            infoText = 'fn error'
-                        else:
-                            infoText += ',fn error'
+                    if errorRandom.random()*100 < familyNameErrors:        # Check if time for a family name error
+                        actions.append('familyNameError')
+                        oldFamilyName = patients[me]['familyName']
                         SEcount += 1
                         prevName = re.search(r' \(| \[', patients[me]['familyName'])
                         if prevName:
                             patients[me]['familyName'] = patients[me]['familyName'][0:prevName.start()]        # remove previous name
                         if (patients[me]['sex'] == 'F') and (patients[me]['married'] == 'M'):
                             familyName = selectFamilyName()
-                            if random.random() < 0.3:
+                            if errorRandom.random() < 0.3:
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} ({familyName})"    # previous name in round brackets
-                            elif random.random() < 0.6:
+                            elif errorRandom.random() < 0.6:
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} [{familyName}]"    # previous name in square brackets
                             else:
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} (nee {familyName})"    # previous name as (nee ...)
                         else:
                             suffix = re.search(' ', patients[me]['familyName'])
-                            if (not suffix) and (random.random() < 0.2):
+                            if (not suffix) and (errorRandom.random() < 0.2):
                                 patients[me]['familyName'] += ' III'
-                            elif (not suffix) and (random.random() < 0.5):
+                            elif (not suffix) and (errorRandom.random() < 0.5):
                                 patients[me]['familyName'] += ' JNR'
-                            elif random.random() < 0.95:
+                            elif errorRandom.random() < 0.95:
                                 if suffix:
                                     patients[me]['familyName'] = patients[me]['familyName'][0:suffix.start()]        # remove suffix name
                                 patients[me]['familyName'] += '-' + selectFamilyName()
@@ -954,17 +940,17 @@ The main code
                                 if suffix:
                                     patients[me]['familyName'] = patients[me]['familyName'][0:suffix.start()]        # remove suffix name
                                 patients[me]['familyName'] += '^' + selectFamilyName()
-                    if random.random()*100 < givenNameErrors:        # Check if time for a givenName error
-                        if infoText == '':
-                            infoText = 'gn error'
-                        else:
-                            infoText += ',gn error'
+                        if patients[me]['familyName'] != oldFamilyName:
+                            perturbed.append('familyName')
+                    if errorRandom.random()*100 < givenNameErrors:        # Check if time for a givenName error
+                        actions.append('givenNameError')
+                        oldGivenName = patients[me]['givenName']
                         FEcount += 1
                         prevNickname = re.search(r' \(| \*', patients[me]['familyName'])
                         if (not prevNickname) and (patients[me]['givenName'] in nicknames):
                             print(me, patients[me]['givenName'])
-                            nickname = random.choice(nicknames[patients[me]['givenName']])
-                            if random.random() < 0.5:
+                            nickname = errorRandom.choice(nicknames[patients[me]['givenName']])
+                            if errorRandom.random() < 0.5:
                                 patients[me]['givenName'] += ' *' + nickname
                             else:
                                 patients[me]['givenName'] += ' (' + nickname + ')'
@@ -974,7 +960,7 @@ The main code
                             month = int(month)
                             day = int(day)
                             birthdate = datetime.date(year, month, day)
-                            today = datetime.date.today()
+                            today = getReferenceDate()
                             age = today - birthdate
                             if age < datetime.timedelta(days=60):        # a baby
                                 patients[me]['givenName'] = 'TWIN 1'
@@ -988,32 +974,30 @@ The main code
                                     patients[me]['givenName'] += ' (' + selectBoysname() + ')'
                                 else:
                                     patients[me]['givenName'] += ' (' + selectGirlsname() + ')'
+                        if patients[me]['givenName'] != oldGivenName:
+                            perturbed.append('givenName')
             PMI = []
             for field in (PMIfields):
                 PMI.append(patients[me][field])
             csvwriter.writerow(PMI)
-            if infoText != '':
+            if linkMe is not None:                  # Linked records are the same person as their master PMI record
+                patients[me]['entity'] = masterEntity(linkMe)
+                perturbed = perturbedFields(me, {field: master.get(linkMe, field) for field in PMIfields if field in master}, perturbed)      # Fields that were not cloned, or were changed after cloning
+                linked = [field for field in linked if field not in perturbed]
+            elif (dupMe is not None) and ('dupUR' not in actions):        # Aliases, merges and duplicates are the same person as the record they were cloned from
+                patients[me]['entity'] = patients[dupMe]['entity']
+                perturbed = perturbedFields(me, patients[dupMe], perturbed)
+                cloned = [field for field in cloned if field not in perturbed]
+            else:
+                patients[me]['entity'] = entityName(PMIoutputfile, PID)
+            linkage.write([PID, patients[me]['UR'], patients[me]['entity'], actions if actions else 'original', perturbed])
+            if (truth is not None) and actions:
                 if linkMe is not None:
-                    if linkInfo != '':
-                        linkPMI = [f'linked ({cloneInfo})']
-                    else:
-                        linkPMI = ['linked']
-                    for field in (PMIfields):
-                        if field in masterHas:
-                            linkPMI.append(master[linkMe][field])
-                        else:
-                            linkPMI.append('')
-                    logging.info(csvString(linkPMI))
-                if dupMe is not None:
-                    if cloneInfo != '':
-                        dupPMI = [f'cloned ({cloneInfo})']
-                    else:
-                        dupPMI = ['cloned']
-                    for field in (PMIfields):
-                        dupPMI.append(patients[dupMe][field])
-                    logging.info(csvString(dupPMI))
-                info = [infoText] + PMI
-                logging.info(csvString(info))
+                    truth.write([PID, patients[me]['UR'], actions, 'master', masterPID(linkMe), master.get(linkMe, 'UR'), linked, perturbed])
+                elif dupMe is not None:
+                    truth.write([PID, patients[me]['UR'], actions, 'secondary', patients[dupMe]['PID'], patients[dupMe]['UR'], cloned, perturbed])
+                else:
+                    truth.write([PID, patients[me]['UR'], actions, '', '', '', '', perturbed])
             patient += 1
             PID += 1
             if skipUR == 0:
@@ -1021,11 +1005,15 @@ The main code
             elif skipUR < 3:
                 URno += skipUR
             else:
-                nextUR = URno + random.randrange(skipUR - 1, skipUR + 1)
+                nextUR = URno + errorRandom.randrange(skipUR - 1, skipUR + 1)
                 while URno < nextUR:
-                    skippedUR.append(URno)
+                    skippedUR.add(URno)
                     URno += 1
 
+    linkage.close()
+    if truth is not None:
+        truth.close()
+
     # Report the results
     print(f'{rCount}\tPMI Records created')
     print(f'{aCount}\t\talias records')
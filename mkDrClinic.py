@@ -8,6 +8,7 @@ SYNOPSIS
 $ python mkDrClinic.py [-D dataDir|--dataDir=dataDir] [-A addressFile|--addressFile=addressFile]
                        [-O outputDir|--outputDir=outputDir] [-o outputfile|--outputfile=outputfile]
                        [-P|--Patients] [-r|--makeRandom] [-b|-both] [-i|--HPI] [-x|--extendNames]
+                       [-w workers|--workers=workers] [-R seed|--seed=seed] [-d referenceDate|--referenceDate=referenceDate] [-k catchment|--catchment=catchment]
                        [-v loggingLevel|--loggingLevel=loggingLevel]
                        [-L logDir|--logDir=logDir] [-l logfile|--logfile=logfile]
 
@@ -37,6 +38,23 @@ Add Australian HPI-I, providerNo, presriberNo and HPI-O numbers
 -x|--extendName
 Extend names with sequential letters
 
+-w workers|--workers=workers
+The number of worker processes used to create the random patients (default=1)
+
+-R seed|--seed=seed
+Seed the random number generators, so that the same seed (and the same number of workers) creates the same output (default=unseeded)
+The random number streams are seeded from the seed and the name of the script, so the same seed can be used for each script in a pipeline
+(e.g. mkPMI.py then mkAltPMI.py) without the scripts creating the same patients. However, running a script twice with the same seed creates the same patients,
+so use a different seed for each file (e.g. each secondary PMI) that is to have different patients.
+
+-d referenceDate|--referenceDate=referenceDate
+The date (YYYY-MM-DD) that birthdates, ages and dates of death are relative to (default=today)
+Running a script again, with the same seed and reference date, creates exactly the same output on any day
+
+-k catchment|--catchment=catchment
+The radius (km) of each clinic's catchment. The doctors, specialists and patients of each clinic will have addresses within
+this distance of the clinic (default=addresses in the same SA3 as the clinic)
+
 -v loggingLevel|--verbose=loggingLevel
 Set the level of logging that you want.
 
@@ -53,9 +71,11 @@ import csv
 import argparse
 import logging
 import configparser
+import datetime
 import random
 import string
-from randPatients import patients, patientKeys, mkRandPatients, mkRandAddress, mkLuhn
+from randPatients import patients, iterRandPatients, seedRandom, setReferenceDate, mkRandAddress, mkLuhn
+from identifiers import IdentifierAllocator
 
 
 # This next section is plagurised from /usr/include/sysexits.h
@@ -111,6 +131,16 @@ def mkPrescriberNo(prescriberNo):
     return prescriberNo + cdigit[csum]
 
 
+def nextPatient(patientStream):
+    '''
+Get the next random patient from the stream, replacing the previous one in patients{}
+(each clinic, doctor and patient record is written out before the next one is created)
+    '''
+    me, patient = next(patientStream)
+    patients.clear()
+    patients[me] = patient
+    return me
+
 
 if __name__ == '__main__':
     '''
@@ -133,6 +163,12 @@ The main code
     parser.add_argument('-r', '--makeRandom', dest='makeRandom', action='store_true', help='Make random Australian addresses')
     parser.add_argument('-i', '--HPI', dest='HPI', action='store_true', help='Add Australian HPI-I, providerNo, prescriberNo and HPI-O numbers')
     parser.add_argument('-x', '--extendNames', dest='extendNames', action='store_true', help='Extend names with sequential letters')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                        help='The number of worker processes used to create the random patients(default=1)')
+    parser.add_argument('-R', '--seed', dest='seed', type=int, help='The seed for the random number generators(default=unseeded)')
+    parser.add_argument('-d', '--referenceDate', dest='referenceDate', type=datetime.date.fromisoformat,
+                        help='The date (YYYY-MM-DD) that birthdates and ages are relative to(default=today)')
+    parser.add_argument('-k', '--catchment', dest='catchment', type=float, help='The radius (km) of the catchment of each clinic(default=same SA3)')
     parser.add_argument('-v', '--verbose', dest='loggingLevel', type=int, choices=range(0,5), help='The level of logging\n\t0=CRITICAL,1=ERROR,2=WARNING,3=INFO,4=DEBUG')
     parser.add_argument('-L', '--logDir', dest='logDir', default='logs', help='The name of a directory for the logging file(default="logs")')
     parser.add_argument('-l', '--logfile', metavar='logfile', dest='logfile', help='The name of a logging file')
@@ -164,6 +200,18 @@ The main code
     Patients = args.Patients
     HPI = args.HPI
     extendNames = args.extendNames
+    workers = args.workers
+    catchment = args.catchment
+    if (catchment is not None) and (catchment <= 0):
+        logging.critical('Usage error - catchment (%s) must be greater than zero', catchment)
+        logging.shutdown()
+        sys.exit(EX_USAGE)
+    seed = args.seed
+    if seed is not None:        # Make this run reproducible, with random number streams of this script's own
+        seed = f'{seed}/mkDrClinic'
+        seedRandom(seed)
+    if args.referenceDate is not None:        # Make birthdates and ages relative to this date, rather than today
+        setReferenceDate(args.referenceDate)
 
     # Then read in the configuration from mkDrClinic.cfg
     config = configparser.ConfigParser(allow_no_value=True)
@@ -234,7 +282,6 @@ The main code
     if Patients:
         minPatients = int(minPatients)
         maxPatients = int(maxPatients)
-    personNo = 0
     noOfClinics = int(((endClinic - startClinic)/skipClinic)*2)            # Number of clinics
     noOfRecords = noOfClinics + noOfClinics * int(((maxDr)/2)*2)           # Plus number of doctors for each clinic
     noOfRecords += noOfClinics * int((maxSpec + 2)/2)                # Plus the number of specialists working in each clinic
@@ -242,14 +289,14 @@ The main code
         noOfRecords += noOfRecords * int(((maxPatients - minPatients)/2)*2)    # Plus number of patients per doctor, for each doctor, for each clinic
 
     UsedIDs = {}
-    mkRandPatients(dataDir, addressFile, noOfRecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, False)        # Create enough random patient
+    patientStream = iterRandPatients(dataDir, addressFile, noOfRecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, False, workers=workers, seed=seed)        # Enough random patients, created as required
 
     # Create the Clinic and Doctor records
     cCount = 0
     dCount = 0
     pCount = 0
-    usedProviderNo = set()
-    usedAhpraNo = set()
+    providerNoAllocator = IdentifierAllocator(100000, 1000000)
+    ahpraNoAllocator = IdentifierAllocator(9000000000, 10000000000)
     with open(os.path.join(outputDir, outputfile), 'wt', encoding='utf-8', newline='') as csvfile:
         csvwriter = csv.writer(csvfile, dialect=csv.excel)
         fileFields = ['ClinicId']
@@ -264,8 +311,7 @@ The main code
         fileFields += ['givenName', 'familyName'] + fields
         csvwriter.writerow(fileFields)
         while ClinicId < endClinic:
-            me = patientKeys[personNo]
-            personNo += 1
+            me = nextPatient(patientStream)
             patients[me]['ClinicId'] = ClinicId
             if HPI:
                 if random.random()*100 < percentHPIO:                    # Check HPI-O required
@@ -307,12 +353,12 @@ The main code
                     clinic.append(patients[me][field])
             csvwriter.writerow(clinic)
             clinicSA1 = patients[me]['sa1']
+            clinicLocation = (patients[me]['longitude'], patients[me]['latitude'])
 
             # Create a number of specialist who work in the clinic but don't have patients
             for spec in (range(random.randrange(2, maxSpec + 1))):
-                me = patientKeys[personNo]
-                personNo += 1
-                thisAddr = mkRandAddress(clinicSA1, True, makeRandom)
+                me = nextPatient(patientStream)
+                thisAddr = mkRandAddress(clinicSA1, True, makeRandom, clinicLocation, catchment)
                 patients[me]['streetNo'] = thisAddr['streetNo']
                 patients[me]['streetName'] = thisAddr['streetName']
                 patients[me]['streetType'] = thisAddr['streetType']
@@ -333,19 +379,11 @@ The main code
                         patients[me]['HPI-I'] = f"{800361990000000 + HPIIno:d}{mkLuhn(f'{800361990000000 + HPIIno:d}'):d}"
                     else:
                         patients[me]['HPI-I'] = None
-                while True:        # Loop if the providerNo is not distinct
-                    providerNo = random.randint(100000, 999999)
-                    if providerNo not in usedProviderNo:
-                        break
-                usedProviderNo.add(providerNo)
+                providerNo = providerNoAllocator.allocate()
                 providerNo = str(providerNo).zfill(6)
                 patients[me]['providerNo'] = mkProviderNo(providerNo)
                 patients[me]['prescriberNo'] = mkPrescriberNo(providerNo)
-                while True:        # Loop if the ahpraNo is not distinct
-                    ahpraNo = random.randint(9000000000, 9999999999)
-                    if ahpraNo not in usedAhpraNo:
-                        break
-                usedAhpraNo.add(ahpraNo)
+                ahpraNo = ahpraNoAllocator.allocate()
                 patients[me]['ahpraNo'] = 'MED' + str(ahpraNo)
                 dCount += 1
                 doctor = []
@@ -375,9 +413,8 @@ The main code
                     HPIIno %= 10000000
 
             for dr in (range(random.randrange(1, maxDr + 1))):
-                me = patientKeys[personNo]
-                personNo += 1
-                thisAddr = mkRandAddress(clinicSA1, True, makeRandom)
+                me = nextPatient(patientStream)
+                thisAddr = mkRandAddress(clinicSA1, True, makeRandom, clinicLocation, catchment)
                 patients[me]['streetNo'] = thisAddr['streetNo']
                 patients[me]['streetName'] = thisAddr['streetName']
                 patients[me]['streetType'] = thisAddr['streetType']
@@ -398,19 +435,11 @@ The main code
                         patients[me]['HPI-I'] = f"{800361990000000 + HPIIno}{mkLuhn(f'{800361990000000 + HPIIno:d}'):d}"
                     else:
                         patients[me]['HPI-I'] = None
-                while True:        # Loop if the providerNo is not distinct
-                    providerNo = random.randint(100000, 999999)
-                    if providerNo not in usedProviderNo:
-                        break
-                usedProviderNo.add(providerNo)
+                providerNo = providerNoAllocator.allocate()
                 providerNo = str(providerNo).zfill(6)
                 patients[me]['providerNo'] = mkProviderNo(providerNo)
                 patients[me]['prescriberNo'] = mkPrescriberNo(providerNo)
-                while True:        # Loop if the ahpraNo is not distinct
-                    ahpraNo = random.randint(9000000000, 9999999999)
-                    if ahpraNo not in usedAhpraNo:
-                        break
-                usedAhpraNo.add(ahpraNo)
+                ahpraNo = ahpraNoAllocator.allocate()
                 patients[me]['ahpraNo'] = 'MED' + str(ahpraNo)
                 dCount += 1
                 doctor = []
@@ -426,9 +455,8 @@ The main code
 
                 if Patients:
                     for patient in (range(random.randrange(minPatients, maxPatients + 1))):
-                        me = patientKeys[personNo]
-                        personNo += 1
-                        thisAddr = mkRandAddress(clinicSA1, True, makeRandom)
+                        me = nextPatient(patientStream)
+                        thisAddr = mkRandAddress(clinicSA1, True, makeRandom, clinicLocation, catchment)
                         patients[me]['streetNo'] = thisAddr['streetNo']
                         patients[me]['streetName'] = thisAddr['streetName']
                         patients[me]['streetType'] = thisAddr['streetType']
@@ -10,6 +10,7 @@ created by mkHealthPopulation.py
 SYNOPSIS
 $ python mkHL7v2.py [-I inputDir|--inputDir=inputDir] [-i inputfile|--inputfile=inputfile]
                     [-O outputDir|--outputDir=outputDir] [-o outputfile|--outputfile=outputfile]
+                    [-R seed|--seed=seed]
                     [-v loggingLevel|--loggingLevel=loggingLevel]
                     [-L logDir|--logDir=logDir] [-l logfile|--logfile=logfile]
 
@@ -27,6 +28,9 @@ The directory in which the output file will be created (default='output')
 -o outputfile|--outputfile=outputfile
 The output file to be created (default='clinicDoctors.csv')
 
+-R seed|--seed=seed
+Seed the random number generator, so that the same seed creates the same output (default=unseeded)
+
 -v loggingLevel|--verbose=loggingLevel
 Set the level of logging that you want.
 
@@ -87,6 +91,7 @@ The main code
                         help='The name of the output directory [mkHL7v2.cfg will be read from this directory] (default="output")')
     parser.add_argument('-o', '--outputfile', metavar='outputfile', dest='outputfile', default='ADT.hl7',
                         help='The name of file of HL7 messages to be created (default="ADT.hl7"')
+    parser.add_argument('-R', '--seed', dest='seed', type=int, help='The seed for the random number generator (default=unseeded)')
     parser.add_argument('-v', '--verbose', dest='loggingLevel', type=int, choices=range(0, 5),
                         help='The level of logging\n\t0=CRITICAL,1=ERROR,2=WARNING,3=INFO,4=DEBUG')
     parser.add_argument('-L', '--logDir', dest='logDir', default='logs',
@@ -120,6 +125,9 @@ The main code
     inputfile = args.inputfile
     outputDir = args.outputDir
     outputfile = args.outputfile
+    seed = args.seed
+    if seed is not None:        # Make this run reproducible
+        random.seed(seed)
 
     # Read in the spreadsheet of hospitals and patients
     try:
@@ -9,6 +9,7 @@ SYNOPSIS
 $ python mkHealthPopulation.py [-D dataDir|--dataDir=dataDir] [-A addressFile|--addressFile=addressFile]
                                [-O outputDir|--outputDir=outputDir] [-o outputfile|--outputfile=outputfile]
                                [-r|--makeRandom] [-P|--Patients] [-i|--IHI] [-x|--extendNames] [-a|--addUR]
+                               [-w workers|--workers=workers] [-R seed|--seed=seed] [-d referenceDate|--referenceDate=referenceDate] [-k catchment|--catchment=catchment]
                                [-v loggingLevel|--loggingLevel=loggingLevel]
                                [-L logDir|--logDir=logDir] [-l logfile|--logfile=logfile]
 
@@ -41,6 +42,23 @@ Extend names with sequential letters
 -a|--addUR
 Add a template for the UR number  in the PID and LIS2 segments
 
+-w workers|--workers=workers
+The number of worker processes used to create the random patients (default=1)
+
+-R seed|--seed=seed
+Seed the random number generators, so that the same seed (and the same number of workers) creates the same output (default=unseeded)
+The random number streams are seeded from the seed and the name of the script, so the same seed can be used for each script in a pipeline
+(e.g. mkPMI.py then mkAltPMI.py) without the scripts creating the same patients. However, running a script twice with the same seed creates the same patients,
+so use a different seed for each file (e.g. each secondary PMI) that is to have different patients.
+
+-d referenceDate|--referenceDate=referenceDate
+The date (YYYY-MM-DD) that birthdates, ages and dates of death are relative to (default=today)
+Running a script again, with the same seed and reference date, creates exactly the same output on any day
+
+-k catchment|--catchment=catchment
+The radius (km) of each associated hospital's catchment. The GP clinics and specialist services associated with a hospital
+will have addresses within this distance of the hospital (default=addresses in the same SA3 as the hospital)
+
 -v loggingLevel|--verbose=loggingLevel
 Set the level of logging that you want.
 
@@ -57,9 +75,13 @@ import csv
 import argparse
 import logging
 import configparser
+import datetime
 import random
 import json
+import io
+import zipfile
 from openpyxl import Workbook
+from openpyxl.writer.excel import ExcelWriter
 from fhir.resources.organization import Organization
 from fhir.resources.healthcareservice import HealthcareService
 from fhir.resources.location import Location
@@ -67,7 +89,8 @@ from fhir.resources.practitioner import Practitioner
 from fhir.resources.practitionerrole import PractitionerRole
 from fhir.resources.careteam import CareTeam
 from fhir.resources.patient import Patient
-from randPatients import patients, patientKeys, mkRandPatients, mkRandAddress, mkLuhn, SA3postcodes, SA2inSA4, SA1s
+from randPatients import patients, patientKeys, mkRandPatients, seedRandom, setReferenceDate, getReferenceDate, mkRandAddress, mkLuhn, randomSA1, referenceData
+from identifiers import IdentifierAllocator
 
 
 careTeams = {}        # The list of Practitioners in each Organization
@@ -710,7 +733,7 @@ def createCareTeam(teamRecord, teamIHI, HPIO):
         'participant': [
         ]
     }
-    for teamMember in careTeams[HPIO]:
+    for teamMember in sorted(careTeams[HPIO]):        # sorted, as the order of a set of strings changes from run to run
         careteam_dict['participant'].append({
             'member': {
                 'reference': 'Practitioner/' + teamMember
@@ -976,6 +999,21 @@ def createPatient(patientRecord, patientIHI, patientGPs):
     return patient_json
 
 
+def saveWorkbook(thisWorkbook, thisFile):
+    '''
+    Save a workbook, stamped with the reference date rather than the current time,
+    so that runs with the same seed and reference date create byte-identical workbooks
+    '''
+    stamp = datetime.datetime.combine(getReferenceDate(), datetime.time())
+    thisWorkbook.properties.created = stamp
+    thisWorkbook.properties.modified = stamp
+    unstamped = io.BytesIO()
+    ExcelWriter(thisWorkbook, zipfile.ZipFile(unstamped, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)).save()
+    with zipfile.ZipFile(unstamped, 'r') as source, zipfile.ZipFile(thisFile, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as workbook:
+        for member in source.infolist():        # openpyxl stamps every member of the archive with the current time
+            workbook.writestr(zipfile.ZipInfo(member.filename, stamp.timetuple()[:6]), source.read(member), zipfile.ZIP_DEFLATED)
+
+
 if __name__ == '__main__':
     '''
 The main code
@@ -1004,6 +1042,12 @@ The main code
                         action='store_true', help='Extend names with sequential letters')
     parser.add_argument('-a', '--addUR', dest='addUR',
                         action='store_true', help='Add a template for the UR number in PID and LIS2 segments')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                        help='The number of worker processes used to create the random patients(default=1)')
+    parser.add_argument('-R', '--seed', dest='seed', type=int, help='The seed for the random number generators(default=unseeded)')
+    parser.add_argument('-d', '--referenceDate', dest='referenceDate', type=datetime.date.fromisoformat,
+                        help='The date (YYYY-MM-DD) that birthdates and ages are relative to(default=today)')
+    parser.add_argument('-k', '--catchment', dest='catchment', type=float, help='The radius (km) of the catchment of each hospital(default=same SA3)')
     parser.add_argument('-v', '--verbose', dest='loggingLevel', type=int, choices=range(0, 5),
                         help='The level of logging\n\t0=CRITICAL,1=ERROR,2=WARNING,3=INFO,4=DEBUG')
     parser.add_argument('-L', '--logDir', dest='logDir', default='logs',
@@ -1038,6 +1082,18 @@ The main code
     Patients = args.Patients
     HPI = args.HPI
     extendNames = args.extendNames
+    workers = args.workers
+    catchment = args.catchment
+    if (catchment is not None) and (catchment <= 0):
+        logging.critical('Usage error - catchment (%s) must be greater than zero', catchment)
+        logging.shutdown()
+        sys.exit(EX_USAGE)
+    seed = args.seed
+    if seed is not None:        # Make this run reproducible, with random number streams of this script's own
+        seed = f'{seed}/mkHealthPopulation'
+        seedRandom(seed)
+    if args.referenceDate is not None:        # Make birthdates and ages relative to this date, rather than today
+        setReferenceDate(args.referenceDate)
     addUR = args.addUR
 
     # Then read in the configuration from mkHealthPopulation.cfg
@@ -1167,12 +1223,12 @@ The main code
     UsedIDs = {}
     # Make random patients with long street names
     logging.info('Creating %d demographic records', noOfRecords)
-    mkRandPatients(dataDir, addressFile, noOfRecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, addUR)        # Create enough random patient
+    mkRandPatients(dataDir, addressFile, noOfRecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, addUR, workers=workers, seed=seed)        # Create enough random patient
 
 
     # Create the Networks, hospitals, clinics, specialists, doctors (and patients if required)
-    usedProviderNo = {}
-    usedAhpraNo = set()
+    providerNoAllocator = IdentifierAllocator(100000, 1000000)
+    ahpraNoAllocator = IdentifierAllocator(9000000000, 10000000000)
     wb = Workbook()
     healthNetworks = wb.active
     healthNetworks.title = 'Health Networks'
@@ -1263,7 +1319,7 @@ The main code
             sys.exit(EX_CONFIG)
 
         # Network - select an SA4
-        networkSA2 = random.choice(list(SA1s))[0:9]
+        networkSA2 = randomSA1(random)[0:9]
         networkSA4 = networkSA2[:3]
         name = networkNames[thisNetwork]
         outputRow.append(name)
@@ -1277,7 +1333,7 @@ The main code
             if field == 'postcode':
                 # Make the postcode one that is within this SA3
                 sa3 = networkSA2[:5]
-                outputRow.append(random.choice(list(SA3postcodes[sa3])))
+                outputRow.append(random.choice(referenceData().SA3postcodes[sa3]))
             else:
                 outputRow.append(patients[patientKeys[record]][field])
         # And the network specific fields
@@ -1290,6 +1346,7 @@ The main code
         for hospital in ['associated', 'private']:
             noOfHospitals = random.randrange(hospitals[hospital]['minHospitals'], hospitals[hospital]['maxHospitals'])
             hospitals[hospital]['hospitalSA3'] = []
+            hospitals[hospital]['hospitalLocation'] = []
             # public hospital fields:network_HPI-O,hospital_HPI-O,hospitalName,streetNo,streetName,shortStreetType,suburb,state,postcode,longitude,latitude,meshblock,sa1,country,businessPhone
             # private hospital fields:hospital_HPI-O,hospitalName,authority,streetNo,streetName,shortStreetType,suburb,state,postcode,longitude,latitude,meshblock,sa1,country,businessPhone
             for thisHospital in range(noOfHospitals):
@@ -1335,17 +1392,14 @@ The main code
                         authority += initial[0].upper()
                     outputRow.append(authority)
                 # Create an address - check that the postcode is in our address file
-                hospitalSA3 = None
-                for thisSA3 in SA3postcodes:
-                    if hospitalPostcode in SA3postcodes[thisSA3]:
-                        hospitalSA3 = thisSA3
-                        break
+                hospitalSA3 = referenceData().postcodeSA3.get(hospitalPostcode)
                 if hospitalSA3 is None:
-                    logging.fatal('Hospital postcode (%s) not in address file', hsopitalPostcode)
+                    logging.fatal('Hospital postcode (%s) not in address file', hospitalPostcode)
                     logging.shutdown()
                     sys.exit(EX_CONFIG)
                 hospitals[hospital]['hospitalSA3'].append(hospitalSA3)
                 thisAddr = mkRandAddress(hospitalSA3, True, makeRandom)
+                hospitals[hospital]['hospitalLocation'].append((thisAddr['longitude'], thisAddr['latitude']))
                 for field in addressFields:
                     outputRow.append(thisAddr[field])
                 for field in hospitalFields:
@@ -1429,20 +1483,10 @@ The main code
                         specialist_HPII = IHI[:5] + '1' + IHI[6:-1]
                         specialist_HPII = f'{specialist_HPII}{mkLuhn(specialist_HPII):d}'
                         outputRow.append(specialist_HPII)
-                        while True:        # Loop if the providerNo is not distinct
-                            providerNo = f'{random.randint(100000, 999999):06d}'
-                            if providerNo not in usedProviderNo:
-                                break
-                            logging.debug('Searching for a free provider number for a hospital doctor')
-                        usedProviderNo[providerNo] = True
+                        providerNo = f'{providerNoAllocator.allocate():06d}'
                         outputRow.append(mkProviderNo(providerNo))
                         outputRow.append(mkPrescriberNo(providerNo))
-                        while True:        # Loop if the ahpraNo is not distinct
-                            ahpraNo = random.randint(9000000000, 9999999999)
-                            if ahpraNo not in usedAhpraNo:
-                                break
-                            logging.debug('Searching for a free AHPRA number for a hospital doctor')
-                        usedAhpraNo.add(ahpraNo)
+                        ahpraNo = ahpraNoAllocator.allocate()
                         outputRow.append('MED' + str(ahpraNo))
                         outputRow.append('Dr.')
                         patients[patientKeys[thisRecord]]['businessPhone'] = hospitalPhone
@@ -1492,20 +1536,10 @@ The main code
                         nurse_HPII = IHI[:5] + '1' + IHI[6:-1]
                         nurse_HPII = f'{nurse_HPII}{mkLuhn(nurse_HPII):d}'
                         outputRow.append(nurse_HPII)
-                        while True:        # Loop if the providerNo is not distinct
-                            providerNo = f'{random.randint(100000, 999999):06d}'
-                            if providerNo not in usedProviderNo:
-                                break
-                            logging.debug('Searching for a free provider number for a hospital nurse')
-                        usedProviderNo[providerNo] = True
+                        providerNo = f'{providerNoAllocator.allocate():06d}'
                         outputRow.append(mkProviderNo(providerNo))
                         outputRow.append(mkPrescriberNo(providerNo))
-                        while True:        # Loop if the ahpraNo is not distinct
-                            ahpraNo = random.randint(9000000000, 9999999999)
-                            if ahpraNo not in usedAhpraNo:
-                                break
-                            logging.debug('Searching for a free AHPRA number for a hospital nurse')
-                        usedAhpraNo.add(ahpraNo)
+                        ahpraNo = ahpraNoAllocator.allocate()
                         outputRow.append('MED' + str(ahpraNo))
                         outputRow.append('Nrs.')
                         patients[patientKeys[thisRecord]]['businessPhone'] = hospitalPhone
@@ -1543,10 +1577,12 @@ The main code
             clinic_HPIO = f'{clinic_HPIO}{mkLuhn(clinic_HPIO):d}'
             outputRow.append(clinic_HPIO)
             uniqueName = False
-            hospitalSA3 = random.choice(list(hospitals['associated']['hospitalSA3']))
+            associatedHospital = random.randrange(len(hospitals['associated']['hospitalSA3']))
+            hospitalSA3 = hospitals['associated']['hospitalSA3'][associatedHospital]
+            hospitalLocation = hospitals['associated']['hospitalLocation'][associatedHospital]
             while not uniqueName:
                 # Create a local address close to this hospital
-                clinicAddr = mkRandAddress(hospitalSA3, True, makeRandom)
+                clinicAddr = mkRandAddress(hospitalSA3, True, makeRandom, hospitalLocation, catchment)
                 # Create a clinic from street or suburb plus Medical/Medical Clinic/Medical Centre
                 if random.random() < 0.7:            # street or suburb
                     clinicName = clinicAddr['streetName'] + ' ' + clinicAddr['streetType']
@@ -1595,7 +1631,7 @@ The main code
                 specialist_HPIO = f'{specialist_HPIO}{mkLuhn(specialist_HPIO):d}'
                 outputRow.append(specialist_HPIO)
                 # Create a local address close to this hospital
-                thisAddr = mkRandAddress(hospitalSA3, True, makeRandom)
+                thisAddr = mkRandAddress(hospitalSA3, True, makeRandom, hospitalLocation, catchment)
                 # Assign a business name being "suburb specialty services"
                 # Pick a specialty
                 specialty = random.choice(list(SpecialistRoles))
@@ -1648,20 +1684,10 @@ The main code
                     specialist_HPII = IHI[:5] + '1' + IHI[6:-1]
                     specialist_HPII = f'{specialist_HPII}{mkLuhn(specialist_HPII):d}'
                     outputRow.append(specialist_HPII)
-                    while True:        # Loop if the providerNo is not distinct
-                        providerNo = f'{random.randint(100000, 999999):06d}'
-                        if providerNo not in usedProviderNo:
-                            break
-                        logging.debug('Searching for a free provider number for a specialist')
-                    usedProviderNo[providerNo] = True
+                    providerNo = f'{providerNoAllocator.allocate():06d}'
                     outputRow.append(mkProviderNo(providerNo))
                     outputRow.append(mkPrescriberNo(providerNo))
-                    while True:        # Loop if the ahpraNo is not distinct
-                        ahpraNo = random.randint(9000000000, 9999999999)
-                        if ahpraNo not in usedAhpraNo:
-                            break
-                        logging.debug('Searching for a free AHPRA number for a specialist')
-                    usedAhpraNo.add(ahpraNo)
+                    ahpraNo = ahpraNoAllocator.allocate()
                     outputRow.append('MED' + str(ahpraNo))
                     if patients[patientKeys[thisRecord]]['sex'] == 'F':
                         title = 'Ms.'
@@ -1717,20 +1743,10 @@ The main code
                 GP_HPII = IHI[:5] + '1' + IHI[6:-1]
                 GP_HPII = f'{GP_HPII}{mkLuhn(GP_HPII):d}'
                 outputRow.append(GP_HPII)
-                while True:        # Loop if the providerNo is not distinct
-                    providerNo = f'{random.randint(100000, 999999):06d}'
-                    if providerNo not in usedProviderNo:
-                        break
-                    logging.debug('Searching for a free provider number for a GP')
-                usedProviderNo[providerNo] = True
+                providerNo = f'{providerNoAllocator.allocate():06d}'
                 outputRow.append(mkProviderNo(providerNo))
                 outputRow.append(mkPrescriberNo(providerNo))
-                while True:        # Loop if the ahpraNo is not distinct
-                    ahpraNo = random.randint(9000000000, 9999999999)
-                    if ahpraNo not in usedAhpraNo:
-                        break
-                    logging.debug('Searching for a free AHPRA number for a GP')
-                usedAhpraNo.add(ahpraNo)
+                ahpraNo = ahpraNoAllocator.allocate()
                 outputRow.append('MED' + str(ahpraNo))
                 outputRow.append('Dr.')
                 patients[patientKeys[thisRecord]]['businessPhone'] = clinicPhone
@@ -1809,9 +1825,9 @@ The main code
             FHIR_Patient.append([IHI, createPatient(thisRecord, IHI, GPs)])
 
     # Then template for department care teams
-    for deptHPIO in deptHPIOs:
+    for deptHPIO in sorted(deptHPIOs):        # sorted, as the order of a set of strings changes from run to run
         FHIR_CareTeam.append(['ReplaceWithIHI', deptHPIO, createCareTeam(None, 'ReplaceWithIHI', deptHPIO)])
 
-    wb.save(os.path.join(outputDir, outputfile))
+    saveWorkbook(wb, os.path.join(outputDir, outputfile))
     logging.shutdown()
     sys.exit(EX_OK)
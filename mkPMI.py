@@ -7,8 +7,9 @@ A script to create a CSV file of randomly created patient records
 
 SYNOPSIS
 $ python mkPMI.py [-D dataDir|--dataDir=dataDir] [-A addressFile|--addressFile=addressFile]
-                  [-O outputDir|--outputDir=outputDir] [-M PMIoutputfile|--PMIfile=PMIoutputfile]
+                  [-O outputDir|--outputDir=outputDir] [-M PMIoutputfile|--PMIfile=PMIoutputfile] [-T truthFile|--truthFile=truthFile]
                   [-r|--makeRandom] [-b|-both] [-a|alias2alias] [-m|-merge2merge] [-i|--IHI] [-x|--extendNames] [-e|--errors]
+                  [-w workers|--workers=workers] [-R seed|--seed=seed] [-d referenceDate|--referenceDate=referenceDate]
                   [-v loggingLevel|--loggingLevel=loggingLevel]
                   [-L logDir|--logDir=logDir] [-l logfile|--logfile=logfile]
 
@@ -25,6 +26,11 @@ The directory in which the output file will be created (default='output')
 
 -M PMIoutputfile|--PMIfile=PMIoutputfile
 The PMI output file to be created (default='master.csv')
+A linkage file, of the true entity (person) of every PMI record, is created alongside it (e.g. master_truth.csv)
+
+-T truthFile|--truthFile=truthFile
+A CSV file, to be created in the output directory, recording which PMI records were aliased, merged, deleted, cloned or given errors,
+the PMI record they were cloned from and which fields were perturbed (default=no truth file)
 
 -r|--makeRandom
 Make random Australian addresses
@@ -47,6 +53,19 @@ Extend names with sequential letters
 -e|--errors
 Create errors, such as duplicate UR records, merged and aliases that point to non-existent records or point to deleted records.
 
+-w workers|--workers=workers
+The number of worker processes used to create the random patients (default=1)
+
+-R seed|--seed=seed
+Seed the random number generators, so that the same seed (and the same number of workers) creates the same output (default=unseeded)
+The random number streams are seeded from the seed and the name of the script, so the same seed can be used for each script in a pipeline
+(e.g. mkPMI.py then mkAltPMI.py) without the scripts creating the same patients. However, running a script twice with the same seed creates the same patients,
+so use a different seed for each file (e.g. each secondary PMI) that is to have different patients.
+
+-d referenceDate|--referenceDate=referenceDate
+The date (YYYY-MM-DD) that birthdates, ages and dates of death are relative to (default=today)
+Running a script again, with the same seed and reference date, creates exactly the same output on any day
+
 -v loggingLevel|--verbose=loggingLevel
 Set the level of logging that you want.
 
@@ -59,16 +78,16 @@ The name of a logging file where you want all messages captured.
 
 import sys
 import csv
-import io
 import os
 import argparse
 import logging
 import configparser
-import random
 import datetime
 import re
 from names import nicknames
-from randPatients import patients, patientKeys, mkRandPatients, selectFamilyName, selectBoysname, selectGirlsname, mkLuhn
+from indexedPool import IndexedPool
+from truthFile import TruthFile, linkageFields, linkageFile, entityName
+from randPatients import patients, patientKeys, iterRandPatients, seedRandom, setReferenceDate, getReferenceDate, errorRandom, selectFamilyName, selectBoysname, selectGirlsname, mkLuhn
 
 
 # This next section is plagurised from /usr/include/sysexits.h
@@ -94,40 +113,34 @@ EX_CONFIG = 78       # configuration error
 
 def clone(thisMe, other) :
     '''
-    Clone other onto thisMe
+    Clone other onto thisMe and return the list of the PMI fields that were copied from other
     '''
 # namely: familyName,givenName,birthdate,sex,streetNo,streetName,streetType,suburb,state,postcode,longitude,latitude,country,mobile,homePhone,businessPhone,email,medicareNo,IHI,dvaNo,dvaType,height,weight,waist,hips,married,race,deathDate
 
-    thisCloneInfo = ''
+    thisCloned = ['familyName', 'givenName']
     patients[thisMe]['familyName'] = patients[other]['familyName']
     patients[thisMe]['givenName'] = patients[other]['givenName']
-    if random.random() < 0.2 :                # Sometimes the birthdate is wrong
+    if errorRandom.random() < 0.2 :                # Sometimes the birthdate is wrong
         (thisYear, thisMonth, thisDay) = patients[other]['birthdate'].split('-')
         thisYear = int(thisYear)
         thisMonth = int(thisMonth)
         thisDay = int(thisDay)
         thisBirthdate = datetime.date(thisYear, thisMonth, thisDay)
-        if random.random() < 0.4 :                # Sometimes the thisYear is wrong
-            thisBirthdate += datetime.timedelta(thisDays=365)*(int(random.random()*5.0) - 2)
-        if random.random() < 0.3 :                # Sometimes the thisMonth is wrong
-            thisBirthdate += datetime.timedelta(thisDays=31)*(int(random.random()*5.0) - 2)
-        if random.random() < 0.3 :                # Sometimes the thisDay is wrong
-            thisBirthdate += datetime.timedelta(thisDays=1)*(int(random.random()*5.0) - 2)
-        if thisBirthdate < datetime.date.tothisDay() :
+        if errorRandom.random() < 0.4 :                # Sometimes the thisYear is wrong
+            thisBirthdate += datetime.timedelta(days=365)*(int(errorRandom.random()*5.0) - 2)
+        if errorRandom.random() < 0.3 :                # Sometimes the thisMonth is wrong
+            thisBirthdate += datetime.timedelta(days=31)*(int(errorRandom.random()*5.0) - 2)
+        if errorRandom.random() < 0.3 :                # Sometimes the thisDay is wrong
+            thisBirthdate += datetime.timedelta(days=1)*(int(errorRandom.random()*5.0) - 2)
+        if thisBirthdate < getReferenceDate() :
             patients[thisMe]['birthdate'] = thisBirthdate.isoformat()
     else :
-        thisCloneInfo = 'bd'
+        thisCloned.append('birthdate')
         patients[thisMe]['birthdate'] = patients[other]['birthdate']
     patients[thisMe]['sex'] = patients[other]['sex']
-    if thisCloneInfo == '' :
-        thisCloneInfo = 'sex'
-    else :
-        thisCloneInfo += ',sex'
-    if random.random() < 0.8 :                # Often the address is correct
-        if thisCloneInfo == '' :
-            thisCloneInfo = 'addr'
-        else :
-            thisCloneInfo += ',addr'
+    thisCloned.append('sex')
+    if errorRandom.random() < 0.8 :                # Often the address is correct
+        thisCloned += ['streetNo', 'streetName', 'streetType', 'shortStreetType', 'suburb', 'state', 'postcode', 'longitude', 'latitude', 'country']
         patients[thisMe]['streetNo'] = patients[other]['streetNo']
         patients[thisMe]['streetName'] = patients[other]['streetName']
         patients[thisMe]['streetType'] = patients[other]['streetType']
@@ -138,11 +151,7 @@ def clone(thisMe, other) :
         patients[thisMe]['longitude'] = patients[other]['longitude']
         patients[thisMe]['latitude'] = patients[other]['latitude']
         patients[thisMe]['country'] = patients[other]['country']
-    if random.random() < 0.2 :                # Sometimes the phone numbers are wrong
-        if thisCloneInfo == '' :
-            thisCloneInfo = 'ph'
-        else :
-            thisCloneInfo += ',ph'
+    if errorRandom.random() < 0.2 :                # Sometimes the phone numbers are wrong
         patients[thisMe]['mobile'] = patients[other]['mobile']
         patients[thisMe]['homePhone'] = patients[other]['homePhone']
         patients[thisMe]['businessPhone'] = patients[other]['businessPhone']
@@ -151,42 +160,45 @@ def clone(thisMe, other) :
     patients[thisMe]['homePhone'] = patients[other]['homePhone']
     patients[thisMe]['businessPhone'] = patients[other]['businessPhone']
     patients[thisMe]['email'] = patients[other]['email']
+    thisCloned += ['mobile', 'homePhone', 'businessPhone', 'email']
     if IHI :
-        if thisCloneInfo == '' :
-            thisCloneInfo = 'IHI'
-        else :
-            thisCloneInfo += ',IHI'
+        thisCloned.append('IHI')
         patients[thisMe]['IHI'] = patients[other]['IHI']
     patients[thisMe]['medicareNo'] = patients[other]['medicareNo']
     patients[thisMe]['dvaNo'] = patients[other]['dvaNo']
     patients[thisMe]['dvaType'] = patients[other]['dvaType']
+    thisCloned += ['medicareNo', 'dvaNo', 'dvaType']
     height = float(patients[other]['height'])
-    patients[thisMe]['height'] = f'{random.normalvariate(height, height/50.0):.0f}'
+    patients[thisMe]['height'] = f'{errorRandom.normalvariate(height, height/50.0):.0f}'
     oldWeight = float(patients[other]['weight'])
-    weight = random.normalvariate(oldWeight, oldWeight/20.0)
+    weight = errorRandom.normalvariate(oldWeight, oldWeight/20.0)
     patients[thisMe]['weight'] = f'{weight:.1f}'
     waist = height * 0.49                    # a ratio for all ages, both genders for normal, health persons
     waist = waist * (weight/oldWeight)    # scaled by the percentage weight percentage
     if patients[thisMe]['sex'] == 'M' :
-        hips = waist / random.normalvariate(0.90, 0.10)
+        hips = waist / errorRandom.normalvariate(0.90, 0.10)
     else :
-        hips = waist / random.normalvariate(0.75, 0.10)
+        hips = waist / errorRandom.normalvariate(0.75, 0.10)
     patients[thisMe]['hips'] = hips
     patients[thisMe]['race'] = patients[other]['race']
     patients[thisMe]['married'] = patients[other]['married']
     patients[thisMe]['deathDate'] = patients[other]['deathDate']
-    return 'name,' + thisCloneInfo
+    thisCloned += ['race', 'married', 'deathDate']
+    return [field for field in thisCloned if field in PMIfields]
 
 
-def csvString(thisRow) :
+def perturbedFields(thisMe, other, thisPerturbed) :
     '''
-    Convert this row to a CSV compliant string
+    Return thisPerturbed plus the other PMI fields of thisMe that differ from those of other (the record thisMe was cloned from)
     '''
 
-    si = io.StringIO()
-    cw = csv.writer(si)
-    cw.writerow(thisRow)
-    return si.getvalue().rstrip('\r\n')
+    thisPerturbed = list(thisPerturbed)
+    for field in PMIfields :
+        if field in ['PID', 'UR', 'Alias', 'Merged', 'Deleted'] :        # Identifiers and flags are not cloned
+            continue
+        if (field not in thisPerturbed) and (patients[thisMe][field] != patients[other][field]) :
+            thisPerturbed.append(field)
+    return thisPerturbed
 
 
 
@@ -208,6 +220,8 @@ The main code
                         help='The name of the output directory [mkPMI.cfg will be read from this directory] (default="output")')
     parser.add_argument('-M', '--PMIoutputfile', dest='PMIoutputfile', default='master.csv',
                         help='The name of the PMI csv file to be created(default="master.csv")')
+    parser.add_argument('-T', '--truthFile', dest='truthFile',
+                        help='The name of a csv file, of the aliased, merged, deleted, cloned and perturbed records, to be created(default=none)')
     parser.add_argument('-r', '--makeRandom', dest='makeRandom', action='store_true', help='Make random Australian addresses')
     parser.add_argument('-b', '--both', dest='both', action='store_true', help='PMI records can be both merged and an alias')
     parser.add_argument('-a', '--alias2alias', dest='alias2alias', action='store_true', help='Allow aliases to aliased or merged patient')
@@ -215,6 +229,11 @@ The main code
     parser.add_argument('-i', '--IHI', dest='IHI', action='store_true', help='Add Australian IHI number')
     parser.add_argument('-x', '--extendNames', dest='extendNames', action='store_true', help='Extend names with sequential letters')
     parser.add_argument('-e', '--errors', dest='errors', action='store_true', help='Create PMI with errors')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                        help='The number of worker processes used to create the random patients(default=1)')
+    parser.add_argument('-R', '--seed', dest='seed', type=int, help='The seed for the random number generators(default=unseeded)')
+    parser.add_argument('-d', '--referenceDate', dest='referenceDate', type=datetime.date.fromisoformat,
+                        help='The date (YYYY-MM-DD) that birthdates and ages are relative to(default=today)')
     parser.add_argument('-v', '--verbose', dest='loggingLevel', type=int, choices=range(0,5),
                         help='The level of logging\n\t0=CRITICAL,1=ERROR,2=WARNING,3=INFO,4=DEBUG')
     parser.add_argument('-L', '--logDir', dest='logDir', default='logs', help='The name of a directory for the logging file(default="logs")')
@@ -252,12 +271,20 @@ The main code
     addressFile = args.addressFile
     outputDir = args.outputDir
     PMIoutputfile = args.PMIoutputfile
+    truthFile = args.truthFile
     makeRandom = args.makeRandom
     both = args.both
     alias2alias = args.alias2alias
     merge2merge = args.merge2merge
     IHI = args.IHI
     extendNames = args.extendNames
+    workers = args.workers
+    seed = args.seed
+    if seed is not None:        # Make this run reproducible, with random number streams of this script's own
+        seed = f'{seed}/mkPMI'
+        seedRandom(seed)
+    if args.referenceDate is not None:        # Make birthdates and ages relative to this date, rather than today
+        setReferenceDate(args.referenceDate)
     errors = args.errors
 
     # Check that the dataDir exists
@@ -353,9 +380,13 @@ The main code
     noOfPMIrecords = int(((endUR - startUR)/skipUR)*1.5)
 
     UsedIDs = {}
-    mkRandPatients(dataDir, addressFile, noOfPMIrecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, False)        # Create enough random patient
+    patientStream = iterRandPatients(dataDir, addressFile, noOfPMIrecords, extendNames, False, makeRandom, minAge, maxAge, False, UsedIDs, False, workers=workers, seed=seed)        # Enough random patients, created as required
 
-    # Create the PMI
+    # Create the PMI (and the linkage and truth files)
+    linkage = TruthFile(os.path.join(outputDir, linkageFile(PMIoutputfile)), linkageFields)
+    truth = None
+    if truthFile :
+        truth = TruthFile(os.path.join(outputDir, truthFile), ['PID', 'UR', 'actions', 'sourcePID', 'sourceUR', 'cloned', 'perturbed'])
     with open(os.path.join(outputDir, PMIoutputfile), 'wt', newline='', encoding='utf-8') as csvfile :
         csvwriter = csv.writer(csvfile, dialect=csv.excel)
         PMIfields = ['PID', 'UR', 'Alias', 'Merged', 'Deleted']
@@ -363,9 +394,9 @@ The main code
             PMIfields.append('IHI')
         PMIfields += fields
         csvwriter.writerow(PMIfields)
-        masterMe = []            # not alias/not merged/not deleted patients
-        masterDelMe = []        # deleted, but not alias/not merged patients
-        skippedUR = []
+        masterMe = IndexedPool()            # not alias/not merged/not deleted patients
+        masterDelMe = IndexedPool()        # deleted, but not alias/not merged patients
+        skippedUR = IndexedPool()
         rCount = 0
         aCount = 0
         mCount = 0
@@ -383,72 +414,73 @@ The main code
         undelAcount = 0
         GNEcount = 0
         FNEcount = 0
-        clones = []
+        clones = IndexedPool()
         while URno < endUR :
-            me = patientKeys[patient]
+            me, patients[me] = next(patientStream)        # Only the patients in the PMI are kept (for aliases, merges and duplicates)
+            patientKeys.append(me)
             patients[me]['PID'] = PID        # Create a new patient records
             patients[me]['UR'] = URno
             patients[me]['Alias'] = None
             patients[me]['Merged'] = None
             patients[me]['Deleted'] = None
             if IHI :
-                if random.random()*100 < percentIHI :                    # Check IHI required
+                if errorRandom.random()*100 < percentIHI :                    # Check IHI required
                     patients[me]['IHI'] = f"{800360990000000 + IHIno:d}{mkLuhn(f'{800360990000000 + IHIno:d}'):d}"
                     if skipIHI == 0 :
                         IHIno += 1
                     elif skipIHI < 3 :
                         IHIno += skipIHI
                     else :
-                        IHIno += random.randrange(skipIHI - 1, skipIHI + 1)
+                        IHIno += errorRandom.randrange(skipIHI - 1, skipIHI + 1)
                     IHIno %= 10000000
                 else :
                     patients[me]['IHI'] = None
-            if random.random()*100 < deceased :                    # Check if time for a deceased person
+            if errorRandom.random()*100 < deceased :                    # Check if time for a deceased person
                 (year, month, day) = patients[me]['birthdate'].split('-')
                 year = int(year)
                 month = int(month)
                 day = int(day)
                 birthdate = datetime.date(year, month, day)
-                today = datetime.date.today()
+                today = getReferenceDate()
                 age = today - birthdate
-                deathDay = int(random.random()*age.days)
+                deathDay = int(errorRandom.random()*age.days)
                 deathDate = birthdate + datetime.timedelta(deathDay)
                 patients[me]['deathDate'] = deathDate.isoformat()
             else :
                 patients[me]['deathDate'] = None
 
-            infoText = ''
-            cloneInfo = ''
+            actions = []
+            perturbed = []
+            cloned = []
+            dupMe = None
             rCount += 1
             if patient < 10 :            # Make sure we have a small pool of not alias/not merged/not deleted records
-                masterMe.append(me)            # Keep track of not alias/not merged/not deleted patients
-                masterDelMe.append(me)            # Keep track of not alias/not merged, but may be deleted, patients
+                masterMe.add(me)            # Keep track of not alias/not merged/not deleted patients
+                masterDelMe.add(me)            # Keep track of not alias/not merged, but may be deleted, patients
             else :
-                dupMe = None
                 isAlias  = False
                 isMerge  = False
-                if random.random()*100 < aliases :                    # Check if time for an alias record
+                if errorRandom.random()*100 < aliases :                    # Check if time for an alias record
                     if alias2alias :
-                        dupMe =  patientKeys[random.randrange(0, patient)]
+                        dupMe =  patientKeys[errorRandom.randrange(0, patient)]
                     else :
-                        dupMe =  random.choice(masterDelMe)
+                        dupMe =  masterDelMe.choice(errorRandom)
                     patients[me]['Alias'] = patients[dupMe]['UR']
-                    infoText = 'to Alias'
+                    actions.append('alias')
                     isAlias = True
                     aCount += 1
 
                     # Duplicate some patient data
-                    cloneInfo = clone(me, dupMe)
+                    cloned = clone(me, dupMe)
 
                     # Then change a name (family name for females, given name for everything else)
                     if patients[me]['sex'] == 'F' :
                         familyName = selectFamilyName()
-                        infoText += ' fn'
                         if patients[me]['married'] == 'M' :                # Two options if married
                             prevName = re.search(r' \(| \[', patients[me]['familyName'])
                             if prevName :
                                 patients[me]['familyName'] = patients[me]['familyName'][0:prevName.start()]        # remove previous name
-                            if random.random() < 0.5 :
+                            if errorRandom.random() < 0.5 :
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} ({familyName})"    # add previous name
                             else :
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} (nee {familyName})"    # add previous name
@@ -457,64 +489,61 @@ The main code
                             if hyphen :
                                 patients[me]['familyName'] = patients[me]['familyName'][0:hyphen.start()]        # de-hyphenate
                             patients[me]['familyName'] += '-' + familyName                    # hyphenate
+                        if patients[me]['familyName'] != patients[dupMe]['familyName'] :
+                            perturbed.append('familyName')
                     else :
-                        infoText += ' gn'
                         givenName = selectBoysname()
                         patients[me]['givenName'] = givenName            # simple substitution
+                        if patients[me]['givenName'] != patients[dupMe]['givenName'] :
+                            perturbed.append('givenName')
                     if patients[dupMe]['Deleted'] == 'D' :
-                        if errors and (random.random()*100 < undelAliases) :        # Check if time for an undeleted alias of a deleted record
-                            infoText += ',of Del'
+                        if errors and (errorRandom.random()*100 < undelAliases) :        # Check if time for an undeleted alias of a deleted record
+                            actions.append('undeleted')
                             undelAcount += 1
                         else :
                             patients[me]['Deleted'] = 'D'
-                    elif errors and (random.random()*100 < orphanAliases) :            # Check if time for an orphaned alias record
-                        infoText += ',badUR'
+                    elif errors and (errorRandom.random()*100 < orphanAliases) :            # Check if time for an orphaned alias record
+                        actions.append('orphan')
+                        perturbed.append('UR')
                         if len(skippedUR) > 0 :
-                            patients[me]['UR'] = random.choice(skippedUR)
-                            del skippedUR[skippedUR.index(patients[me]['UR'])]
+                            patients[me]['UR'] = skippedUR.pop(errorRandom)
                         else :
-                            patients[me]['UR'] += 'X'
+                            patients[me]['UR'] = f"{patients[me]['UR']}X"
                         orphAcount += 1
-                if ((dupMe is None) or both) and (random.random()*100 < merged) :    # Check if time for a merged record
+                if ((dupMe is None) or both) and (errorRandom.random()*100 < merged) :    # Check if time for a merged record
                     if dupMe is None :
                         if merge2merge :
-                            dupMe =  patientKeys[random.randrange(0, patient)]
+                            dupMe =  patientKeys[errorRandom.randrange(0, patient)]
                         else :
-                            dupMe =  random.choice(masterDelMe)
+                            dupMe =  masterDelMe.choice(errorRandom)
                         # Duplicate some patient data
-                        cloneInfo = clone(me, dupMe)
+                        cloned = clone(me, dupMe)
 
                     patients[me]['Merged'] = patients[dupMe]['UR']
-                    if infoText == '' :
-                        infoText = 'to Merged'
-                    else :
-                        infoText += ',to Merged'
+                    actions.append('merged')
                     mCount += 1
                     isMerge = True
                     if isAlias :
                         bCount += 1
 
                     if patients[dupMe]['Deleted'] == 'D' :
-                        if errors and (random.random()*100 < undelMerges) :    # Check if time for an undeleted merge of a deleted record
-                            infoText += ',of Del'
+                        if errors and (errorRandom.random()*100 < undelMerges) :    # Check if time for an undeleted merge of a deleted record
+                            actions.append('undeleted')
                             undelMcount += 1
                         else :
                             patients[me]['Deleted'] = 'D'
-                    elif errors and (random.random()*100 < orphanMerges) :        # Check if time for an orphaned merged record
-                        infoText += ',badUR'
+                    elif errors and (errorRandom.random()*100 < orphanMerges) :        # Check if time for an orphaned merged record
+                        actions.append('orphan')
+                        perturbed.append('UR')
                         if len(skippedUR) > 0 :
-                            patients[me]['UR'] =  random.choice(skippedUR)
-                            del skippedUR[skippedUR.index(patients[me]['UR'])]
+                            patients[me]['UR'] = skippedUR.pop(errorRandom)
                         else :
-                            patients[me]['UR'] += 'X'
+                            patients[me]['UR'] = f"{patients[me]['UR']}X"
                         orphMcount += 1
                 isDel = False
-                if random.random()*100 < deleted :                    # Check if time for a deleted record
+                if errorRandom.random()*100 < deleted :                    # Check if time for a deleted record
                     patients[me]['Deleted'] = 'D'
-                    if infoText == '' :
-                        infoText = 'to Deleted'
-                    else :
-                        infoText += ',to Deleted'
+                    actions.append('deleted')
                     mCount += 1
                     isDel = True
                     dCount += 1
@@ -526,43 +555,33 @@ The main code
                     elif isMerge :
                         dMcount += 1
                     else :
-                        masterDelMe.append(me)        # Keep track of deleted, but not alias/not merged patients
+                        masterDelMe.add(me)        # Keep track of deleted, but not alias/not merged patients
                 elif errors and (dupMe is None) :
-                    if random.random()*100 < dupUR :            # Check if time for a duplicate UR record
-                        dupMe =  random.choice(masterMe)
+                    if errorRandom.random()*100 < dupUR :            # Check if time for a duplicate UR record
+                        dupMe =  masterMe.choice(errorRandom)
                         patients[me]['UR'] = patients[dupMe]['UR']
-                        if infoText == '':
-                            infoText = 'to DupUR'
-                        else:
-                            infoText += ',to DupUR'
+                        actions.append('dupUR')
                         dupCount += 1
-                        skippedUR.append(URno)
-                    elif random.random()*100 < potDup :            # Check if time for a potential duplicate
-                        dupMe =  random.choice(masterMe)
-                        if infoText == '':
-                            infoText = 'to potDup'
-                        else:
-                            infoText += ',to DupUR'
+                        skippedUR.add(URno)
+                    elif errorRandom.random()*100 < potDup :            # Check if time for a potential duplicate
+                        dupMe =  masterMe.choice(errorRandom)
                         actDup = False
 
                         # Duplicate some patient data
-                        cloneInfo = clone(me, dupMe)
+                        cloned = clone(me, dupMe)
 
                         actDup = True
-                        if random.random() < 0.3 :            # Sometimes the marital status is wrong
-                            infoText += ' married'
+                        if errorRandom.random() < 0.3 :            # Sometimes the marital status is wrong
+                            perturbed.append('married')
                             if patients[me]['married'] == 'M' :
                                 patients[me]['married'] = 'S'
                             else :
                                 patients[me]['married'] = 'M'
                             actDup = False
                         if patients[me]['birthdate'] != patients[dupMe]['birthdate'] :
-                            if infoText == 'to potDup' :
-                                infoText += ' bd'
-                            else :
-                                infoText += ',bd'
+                            perturbed.append('birthdate')
                             actDup = False
-                        if random.random() < 0.25 :            # Sometimes the given name is wrong
+                        if errorRandom.random() < 0.25 :            # Sometimes the given name is wrong
                             givenName = patients[me]['givenName']
                             if patients[me]['sex'] == 'F' :
                                 patients[me]['givenName'] = selectGirlsname()
@@ -571,27 +590,18 @@ The main code
                             if patients[me]['givenName'] == givenName :
                                 actDup = True
                             else :
-                                if infoText == 'to potDup' :
-                                    infoText += ' gn'
-                                else :
-                                    infoText += ',gn'
+                                perturbed.append('givenName')
                             actDup = False
-                        if random.random() < 0.333 :            # Sometimes the family name is wrong
+                        if errorRandom.random() < 0.333 :            # Sometimes the family name is wrong
                             familyName = patients[me]['familyName']
                             patients[me]['familyName'] = selectFamilyName()
                             if patients[me]['familyName'] == familyName :
                                 actDup = True
                             else :
-                                if infoText == 'to potDup' :
-                                    infoText += ' fn'
-                                else :
-                                    infoText += ',fn'
+                                perturbed.append('familyName')
                             actDup = False
-                        if random.random() < 0.5 :            # Sometimes the sex is wrong
-                            if infoText == 'to potDup' :
-                                infoText += ' sex'
-                            else :
-                                infoText += ',sex'
+                        if errorRandom.random() < 0.5 :            # Sometimes the sex is wrong
+                            perturbed.append('sex')
                             if patients[me]['sex'] == 'M' :
                                 patients[me]['sex'] = 'F'
                             else :
@@ -601,36 +611,40 @@ The main code
                         thisKey += patients[me]['sex'] + '~' + patients[me]['birthdate']
                         if thisKey in clones :
                             actDupCount += 1
+                            actions.append('dup')
                         else :
-                            clones.append(thisKey)
+                            clones.add(thisKey)
                             if actDup :
                                 actDupCount += 1
+                                actions.append('dup')
                             else :
                                 potDupCount += 1
+                                actions.append('potDup')
                     else :
-                        masterMe.append(me)        # Keep track of not alias/not merged/not deleted patients
+                        masterMe.add(me)        # Keep track of not alias/not merged/not deleted patients
                 if errors and (dupMe is None) and (not isDel) :
-                    if random.random()*100 < familyNameErrors :        # Check if time for a family name error
-                        infoText = 'fn error'
+                    if errorRandom.random()*100 < familyNameErrors :        # Check if time for a family name error
+                        actions.append('familyNameError')
+                        oldFamilyName = patients[me]['familyName']
                         FNEcount += 1
                         prevName = re.search(r' \(| \[', patients[me]['familyName'])
                         if prevName :
                             patients[me]['familyName'] = patients[me]['familyName'][0:prevName.start()]        # remove previous name
                         if (patients[me]['sex'] == 'F') and (patients[me]['married'] == 'M') :
                             familyName = selectFamilyName()
-                            if random.random() < 0.3 :
+                            if errorRandom.random() < 0.3 :
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} ({familyName})"    # previous name in round brackets
-                            elif random.random() < 0.6 :
+                            elif errorRandom.random() < 0.6 :
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} [{familyName}]"    # previous name in square brackets
                             else :
                                 patients[me]['familyName'] = f"{patients[me]['familyName']} (nee {familyName})"    # previous name as (nee ...)
                         else :
                             suffix = re.search(' ', patients[me]['familyName'])
-                            if (not suffix) and (random.random() < 0.2) :
+                            if (not suffix) and (errorRandom.random() < 0.2) :
                                 patients[me]['familyName'] += ' III'
-                            elif (not suffix) and (random.random() < 0.5) :
+                            elif (not suffix) and (errorRandom.random() < 0.5) :
                                 patients[me]['familyName'] += ' JNR'
-                            elif random.random() < 0.95 :
+                            elif errorRandom.random() < 0.95 :
                                 if suffix :            # Remove suffix
                                     patients[me]['familyName'] = patients[me]['familyName'][0:suffix.start()]        # remove suffix name
                                 patients[me]['familyName'] += '-' + selectFamilyName()
@@ -638,16 +652,16 @@ The main code
                                 if suffix :            # Remove suffix
                                     patients[me]['familyName'] = patients[me]['familyName'][0:suffix.start()]        # remove suffix name
                                 patients[me]['familyName'] += '^' + selectFamilyName()
-                    if random.random()*100 < givenNameErrors :        # Check if time for a given name error
-                        if infoText == '' :
-                            infoText = 'gn error'
-                        else :
-                            infoText += ',gn error'
+                        if patients[me]['familyName'] != oldFamilyName :
+                            perturbed.append('familyName')
+                    if errorRandom.random()*100 < givenNameErrors :        # Check if time for a given name error
+                        actions.append('givenNameError')
+                        oldGivenName = patients[me]['givenName']
                         GNEcount += 1
                         prevNickname = re.search(r' \(| \*', patients[me]['familyName'])
                         if (not prevNickname) and (patients[me]['givenName'] in nicknames) :
-                            nickname = random.choice(nicknames[patients[me]['givenName']])
-                            if random.random() < 0.5 :
+                            nickname = errorRandom.choice(nicknames[patients[me]['givenName']])
+                            if errorRandom.random() < 0.5 :
                                 patients[me]['givenName'] += ' *' + nickname
                             else :
                                 patients[me]['givenName'] += ' (' + nickname + ')'
@@ -657,7 +671,7 @@ The main code
                             month = int(month)
                             day = int(day)
                             birthdate = datetime.date(year, month, day)
-                            today = datetime.date.today()
+                            today = getReferenceDate()
                             age = today - birthdate
                             if age < datetime.timedelta(days=60) :        # a baby
                                 patients[me]['givenName'] = 'TWIN 1'
@@ -671,21 +685,24 @@ The main code
                                     patients[me]['givenName'] += ' (' + selectBoysname() + ')'
                                 else :
                                     patients[me]['givenName'] += ' (' + selectGirlsname() + ')'
+                        if patients[me]['givenName'] != oldGivenName :
+                            perturbed.append('givenName')
             PMI = []
             for field in (PMIfields) :
                 PMI.append(patients[me][field])
             csvwriter.writerow(PMI)
-            if infoText != '' :
+            if (dupMe is not None) and ('dupUR' not in actions) :        # Aliases, merges and duplicates are the same person as the record they were cloned from
+                patients[me]['entity'] = patients[dupMe]['entity']
+                perturbed = perturbedFields(me, dupMe, perturbed)        # Fields that were not cloned, or were changed after cloning
+                cloned = [field for field in cloned if field not in perturbed]
+            else :
+                patients[me]['entity'] = entityName(PMIoutputfile, PID)
+            linkage.write([PID, patients[me]['UR'], patients[me]['entity'], actions if actions else 'original', perturbed])
+            if (truth is not None) and actions :
                 if dupMe is not None :
-                    if cloneInfo != '' :
-                        dupPMI = [f'cloned ({cloneInfo})']
-                    else :
-                        dupPMI = ['cloned']
-                    for field in (PMIfields) :
-                        dupPMI.append(patients[dupMe][field])
-                    logging.info(csvString(dupPMI))
-                info = [infoText] + PMI
-                logging.info(csvString(info))
+                    truth.write([PID, patients[me]['UR'], actions, patients[dupMe]['PID'], patients[dupMe]['UR'], cloned, perturbed])
+                else :
+                    truth.write([PID, patients[me]['UR'], actions, '', '', '', perturbed])
             patient += 1
             PID += 1
             if skipUR == 0 :
@@ -693,7 +710,11 @@ The main code
             elif skipUR < 3 :
                 URno += skipUR
             else :
-                URno += random.randrange(skipUR - 1, skipUR + 1)
+                URno += errorRandom.randrange(skipUR - 1, skipUR + 1)
+
+    linkage.close()
+    if truth is not None :
+        truth.close()
 
     # Report the results
     print(f'{rCount}\tPMI Records created')
@@ -0,0 +1,176 @@
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+A compact record for a random patient
+
+PatientRecord holds the demographic fields created by randPatients in __slots__, rather than a dict,
+and derives the HL7 PID segment, the LIS2 'P' segment and the LIST of fields when they are accessed,
+rather than storing a rendered copy of every field with every patient.
+Each rendering is built with a single template str.format() on first access and cached with the record;
+the cache is discarded whenever a field is changed, so a rendering always reflects the current field values.
+
+A PatientRecord is also a mutable mapping, so existing code that indexes patients[me][field] keeps working.
+Any other fields (e.g. 'UR', 'ClinicId', 'HPI-I') are held in a small dict, which is only created when needed.
+Assigning to 'PID', 'LIS2' or 'LIST' (e.g. mkPMI.py assigns a PID number to 'PID') overrides the derived value.
+
+SYNOPSIS
+    from patientRecord import PatientRecord
+
+    patient = PatientRecord(useShortStreetTypes, addUR)
+    patient['familyName'] = 'SMITH'
+    patient['UR'] = 123456
+    pid = patient['PID']
+'''
+
+from collections.abc import MutableMapping
+
+
+# The fields of a random patient, in the order of the LIST rendering
+patientFields = ('title', 'familyName', 'givenName', 'birthdate', 'sex', 'streetNo', 'streetName', 'streetType', 'shortStreetType',
+                 'suburb', 'state', 'postcode', 'longitude', 'latitude', 'meshblock', 'sa1', 'country', 'mobile', 'homePhone', 'businessPhone', 'email',
+                 'medicareNo', 'IHI', 'dvaNo', 'dvaType', 'crnNo', 'PEN', 'SEN', 'HC', 'height', 'weight', 'waist', 'hips', 'married', 'race')
+patientFieldSet = frozenset(patientFields)
+derivedFields = ('PID', 'LIS2', 'LIST')
+
+# The DVA card colour, as a PID-3 identifier type
+dvaTypeCodes = {'GOL':'^DVG', 'WHT':'^DVW', 'ORN':'^DVO'}
+
+# The segment templates, each rendered with a single str.format()
+PIDtemplate = ('PID|1||{0}'                                                 # PID-3 Identifiers
+               '||{1}^{2}^^^^^L'                                            # PID-5 Name
+               '||{3}'                                                      # PID-7 Date/Time of Birth
+               '|{4}'                                                       # PID-8 Administrative Sex
+               '||{5}'                                                      # PID-10 Race (Aboriginality/Indigenous Status)
+               '|{6}^^{7}^{8}^{9}^AUS^M'                                    # PID-11 Patient Address
+               '||^PRN^PH^^^^^^{10}~^PRN^CP^^^^^^{11}~^NET^Internet^{12}'   # PID-13 Phone number - Home, mobile, email
+               '|^WPN^PH^^^^^^{13}'                                         # PID-14 Phone number - Business
+               '||{14}'                                                     # PID-16 Marital Status
+               '||||||||||||||N')                                           # PID-30 Patient Death Indicator
+LIS2template = ('P|1|{0}||'                                                 # P-1, P-2, P-3, P-4
+                '{1}|{2}^{3}'                                               # P-5, P-6 Patient Name
+                '||{4}'                                                     # P-8 Birthdate
+                '|{5}|{6}'                                                  # P-9 Patient Sex, P-10 Patient Race-Ethnic Origin (Aboriginality/Indegenous Status)
+                '|{7}^{8}^{9}^{10}^AUS'                                     # P-11 Patient Address
+                '||{11}'                                                    # P-13 Patient Telephone Number
+                '||||{12}|{13}'                                             # P-17 Patient Height, P-18 Patient Weight
+                '||||||||||||{14}')                                         # P-30 Married Status
+renderers = {'PID':'mkPID', 'LIS2':'mkLIS2', 'LIST':'mkLIST'}      # The method that renders each derived field
+
+# The rendering options (useShortStreetTypes, addUR), shared by every record
+renderOptions = {(False, False):(False, False), (False, True):(False, True), (True, False):(True, False), (True, True):(True, True)}
+
+
+class PatientRecord(MutableMapping):
+    '''
+A random patient, with the fields in __slots__ and the PID, LIS2 and LIST renderings derived on access
+    '''
+
+    __slots__ = patientFields + ('options', 'extra', 'rendered')
+
+    def __init__(self, useShortStreetTypes=False, addUR=False):
+        self.options = renderOptions[(bool(useShortStreetTypes), bool(addUR))]
+        self.extra = None
+        self.rendered = None
+
+    def __getitem__(self, field):
+        if (self.extra is not None) and (field in self.extra):
+            return self.extra[field]
+        if field in patientFieldSet:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                raise KeyError(field) from None
+        renderer = renderers.get(field)
+        if renderer is None:
+            raise KeyError(field)
+        if self.rendered is None:
+            self.rendered = {}
+        elif field in self.rendered:
+            return self.rendered[field]
+        value = self.rendered[field] = getattr(self, renderer)()
+        return value
+
+    def __setitem__(self, field, value):
+        if field in patientFieldSet:
+            setattr(self, field, value)
+            self.rendered = None
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[field] = value
+
+    def __delitem__(self, field):
+        if (self.extra is not None) and (field in self.extra):
+            del self.extra[field]
+        elif field in patientFieldSet:
+            try:
+                delattr(self, field)
+            except AttributeError:
+                raise KeyError(field) from None
+            self.rendered = None
+        else:
+            raise KeyError(field)
+
+    def __iter__(self):
+        for field in patientFields:
+            if hasattr(self, field):
+                yield field
+        for field in derivedFields:
+            if (self.extra is None) or (field not in self.extra):
+                yield field
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for field in self)
+
+    def __repr__(self):
+        return f'PatientRecord({dict(self)!r})'
+
+    def streetAddress(self):
+        '''
+The street address - street number, street name and street type (or the abbreviated street type)
+        '''
+        if self.options[0]:
+            return ' '.join((self.streetNo, self.streetName, self.shortStreetType))
+        return ' '.join((self.streetNo, self.streetName, self.streetType))
+
+    def mkPID(self):
+        '''
+Render the HL7 PID segment
+        '''
+        identifiers = [self.medicareNo, '^^^AUSHIC^MC~', self.IHI, '^^^AUSHIC^NI']      # PID-3 Identifiers
+        if self.dvaNo is not None:
+            identifiers += ('~', self.dvaNo, '^^^AUSDVA', dvaTypeCodes.get(self.dvaType, ''))
+        if self.crnNo is not None:
+            identifiers += ('~', self.crnNo, '^^^AUSLINK^AN')
+            if self.PEN is not None:
+                identifiers += ('~', self.PEN, '^^^^PEN')
+            if self.SEN is not None:
+                identifiers += ('~', self.SEN, '^^^^SEN')
+            if self.HC is not None:
+                identifiers += ('~', self.HC, '^^^^HC')
+        if self.options[1]:
+            # Add a template for a hospital UR number as an extra repetition
+            identifiers.append('~<UR>^^^<AUTH>^MR')
+        return PIDtemplate.format(''.join(identifiers), self.familyName, self.givenName, self.birthdate.replace('-', ''), self.sex, self.race,
+                                  self.streetAddress(), self.suburb, self.state, self.postcode,
+                                  self.homePhone, self.mobile, self.email, self.businessPhone, self.married)
+
+    def mkLIS2(self):
+        '''
+Render the LIS2 (ASTM E1394) 'P' segment
+        '''
+        if self.options[1]:
+            UR = '<UR>'         # Add a template for a hospital UR number
+        else:
+            UR = ''
+        return LIS2template.format(UR, self.medicareNo, self.familyName, self.givenName, self.birthdate.replace('-', ''), self.sex, self.race,
+                                   self.streetAddress(), self.suburb, self.state, self.postcode,
+                                   self.homePhone, self.height, self.weight, self.married)
+
+    def mkLIST(self):
+        '''
+Render the list of all the fields
+        '''
+        return [getattr(self, field) for field in patientFields]
@@ -19,7 +19,7 @@ SYNOPSIS
     UsedIDs['dvaNo'] = set()
     UsedIDs['crnNo'] = set()
     mkFamilies = False
-    mkRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR)
+    mkRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, workers=1, seed=None)
 
 The randPatients() subroutine makes random patients, with a date of birth, address, gender, medicareNo, IHI, dvaNo, dvaType,
 phone number, email address, height, weight, waist and hips which can be used as test data.
@@ -34,6 +34,8 @@ The address is selected from 15M Australian addresses taken from the G-NAF CORE
 Street types and their abbreviations are taken from METEOR identifier: 429840
 (Streets, in G-NAF CORE, with other street types are discarded)
 ABS data is also used - MB_2021_AUST.csv for Mesh Block to SA1/2/3/4/State mapping.
+The addresses are held in a columnar address store (see columnStore.py), sorted by SA1,
+which is memory mapped from the file alongside the address file (e.g. GNAF_CORE.psv.store).
 
 However there is an option to create random addresses.
 Random addresses are created by randomly selecting an SA1 code from the G-NAF dataset.
@@ -46,7 +48,7 @@ Finally, a random, valid street type is chosen from the G-NAF dataset, but not o
 To make random addresses plausible, but improbable, the street number is a random number between 999900 and 999999.
 
 Every patient is assigned a random mobile, home phone number, business phone number and email address.
-Each patient is randomly assigned a birthdate between 'minAge' and 'maxAge' years prior to today plus a gender based upon the gender of the given name.
+Each patient is randomly assigned a birthdate between 'minAge' and 'maxAge' years prior to today (or the date set by setReferenceDate()) plus a gender based upon the gender of the given name.
 Then 2% of males are reassigned to gender 'U' - unknown. Each patient is also given a marital status; single if the patient is less than 18 years old.
 For the rest, 51% as assigned 'married', 32% 'single', 10% 'devorced' and 7% 'widowed'.
 The patient is also assigned height, weight, waist and hips measurments, based upon their age.
@@ -54,6 +56,30 @@ The patient is also assigned height, weight, waist and hips measurments, based u
 There is an options to assign an average of 4.5 patients to each address, with most patients having the same family name.
 
 mkRandPatients() stores all this data in the dictionary patients{}. The keys are stored in the list patientKeys[].
+Alternatively, iterRandPatients() (same arguments) yields the patients one at a time, as (key, patient record) tuples,
+and iterRandPatientBlocks(blockSize, ...) yields them in lists of blockSize tuples, without storing them in patients{}/patientKeys[].
+Callers that consume the patients sequentially then only hold the patients they keep, e.g.
+
+for me, patient in iterRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR):
+    csvwriter.writerow(patient['LIST'])
+
+These functions create the patients with the default PopulationGenerator (see defaultPopulation()), whose population is patients{}/patientKeys[]
+and whose random number streams are the module's streams (nameRandom, addressRandom, identifierRandom, measureRandom and errorRandom).
+A PopulationGenerator can also be created with a population, and random number streams, of its own, so that several independent populations can coexist,
+and be reused for as many populations as required. The reference data (names and addresses) is a ReferenceData, loaded when first required (see getReferenceData()),
+which a PopulationGenerator holds by reference. Reference data, once loaded, is never replaced, so it is shared, read only, by every PopulationGenerator that uses the same data,
+and a PopulationGenerator with a different data directory, address file or number of patients gets reference data of its own, without disturbing the others, e.g.
+
+generator = PopulationGenerator(inputDir, addressFile)
+for dataset in range(10):
+    generator.clear()
+    generator.mkPatients(numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed=dataset)
+    for me in generator.patientKeys:
+        csvwriter.writerow(generator.patients[me]['LIST'])
+
+The names and addresses used by the default PopulationGenerator can be accessed with referenceData() (e.g. referenceData().SA3postcodes),
+and selectFamilyName(), selectBoysname(), selectGirlsname(), randomSA1() and mkRandAddress() draw from them with the module's random number streams.
+
 randPatient() also creates test patient information in formats suitable for inclusion in databases, files, HL7 messages and ASTM/LIS2 messages.
 The data can be accessed as follows
 
@@ -71,7 +97,7 @@ UsedIDs['medicareNo'] = set()
 UsedIDs['IHI'] = set()
 UsedIDs['dvaNo'] = set()
 UsedIDs['crnNo'] = set()
-mkRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR)
+mkRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, workers=1, seed=None)
 
 import random
 
@@ -116,6 +142,9 @@ PID = patients[key]['PID']
 LIST = patients[key]['LIST']
 
 
+Each patient is a PatientRecord (see patientRecord.py), which holds the fields compactly and derives 'PID', 'LIS2' and 'LIST'
+from the current field values when they are accessed.
+
 For databases and files a list of patient data can be accessed as patients[key]['LIST']. The list is assembled in the following order
 title,familyName,givenName,birthdate,sex,streetNo,streetName,streetType,shortStreetType,suburb,state,postcode,longitude,latitude,meshblock,sa1,country,mobile,homePhone,businessPhone,email,medicareNo,IHI,dvaNo,dvaType,crnNo,SN,HC,height,weight,waist,hips,married,race
 
@@ -169,14 +198,28 @@ for me in (patientKeys):
 '''
 
 import sys
-import io
 import os
 import csv
-import zipfile
+import copy
+import zlib
+import multiprocessing
+import queue
+import bisect
+import array
+import pickle
+import hashlib
 import random
 import logging
 import datetime
 from streetTypes import streetTypeAbbrev
+from columnStore import AddressStore, AddressStoreBuilder, getMeshBlockTable, getNameTable
+from identifiers import IdentifierAllocator
+from patientRecord import PatientRecord
+from gnafReader import mapChunks, iterColumns
+try:
+    import numpy
+except ImportError:         # NumPy is optional; without it the demographics are drawn with the random module
+    numpy = None
 
 
 # This next section is plagurised from /usr/include/sysexits.h
@@ -206,318 +249,916 @@ heightPercentils = {'M':[[47.0, 54.0], [64.0, 72.0], [81.0, 94.0], [165.0, 190.0
 weightPercentils = {'M':[[2.5, 4.5], [6.8, 10.0], [9.5, 15.0], [45.0, 87.0], [62.0, 112.0], [59.0, 100.0]],
              'F':[[2.8, 4.2], [6.0,  9.5], [9.5, 15.0], [45.0, 87.0], [51.0, 104.0], [48.0, 95.0]]}
 
+# The height and weight percentiles, interpolated for every age in months from 0 to 960 (80yrs), plus one entry for over 80
+# key=sex, value=list of tuples (height lower, height upper, weight lower, weight upper) indexed by age in months
+percentileTable = {}
+
+# Categorical distributions, as cumulative weights (for random.choices)
+marriedStatus = ['M', 'S', 'D', 'W']
+marriedCumWeights = [51, 51 + 32, 51 + 32 + 10, 100]    # 51% married, 32% single, 10% divorced, 7% widowed
+raceCodes = ['3', '2', '1', '4']
+raceCumWeights = [0.12, 0.3, 3.0, 100.0]                # 0.12% '3', 0.18% '2', 2.7% '1', 97% '4'
+
+# The demographics drawn as uniform 32 bit random integers, which are scaled (x * n >> uniformBits) to a choice of n things,
+# or compared with a limit (a draw below the limit is a yes), as they are used
+uniformColumns = ['ageYears', 'unknownSex', 'homePhone', 'businessPhone', 'mobile', 'dva', 'crn', 'crnClass', 'crnLetter', 'divorcedTitle']
+uniformBits = 32
+uniformRange = 1 << uniformBits
+unknownSexLimit = int(0.02 * uniformRange)              # 2% of males have an unknown sex
+dvaLimit = int(0.05 * uniformRange)                     # 5% have a DVA number
+crnLimit = int(0.30 * uniformRange)                     # 30% have a CentreLink Customer Reference Number
+divorcedTitleLimit = int(0.51 * uniformRange)           # 51% of divorced women keep the title MRS
+demographicsBlockSize = 10000                           # The number of patients for which demographics are drawn in one batch
+shardBlockSize = 1000                                   # The number of patients a shard worker sends to the parent process at a time
+shardQueueBlocks = 2                                    # The number of blocks each shard worker can have waiting for the parent process
+
+# Independent random number streams, one for each subsystem, so that seeding (see seedRandom()) makes a run reproducible
+# and a change in how many random numbers one subsystem uses doesn't change the values drawn by the others
+nameRandom = random.Random()            # given names, family names and sex
+addressRandom = random.Random()         # addresses and families
+identifierRandom = random.Random()      # Medicare, IHI, DVA and CRN numbers
+measureRandom = random.Random()         # age, phone numbers, clinical measures, marital status and race
+errorRandom = random.Random()           # the errors and variations introduced by the calling script
+randomStreams = {'names':nameRandom, 'addresses':addressRandom, 'identifiers':identifierRandom, 'measures':measureRandom, 'errors':errorRandom}
+
 patients = {}
 patientKeys = []
-MB = {}                    # key=Mesh Block 2016 code, value=SA1 code
-SA1s = {}                # key=SA1, value=set of tuples (longitude, latitude, mesh block)
-SA1list = []            # A list of SA1s (for random selection)
-SA3s = {}                # key=SA3, value=list of SA1s for each SA3
-SA3postcodes = {}        # key=SA3, value=set of postcodes for each SA3
-SA2s = {}               # key=SA2, value=SA2 name
-SA4s = {}               # key=SA4, value=SA4 name
-SA2inSA4 = {}           # key=SA4, value=set(SA2)
-postcodes = {}            # key=postcode, value=set of the states each postcode occurs in
-postcodesList = []        # A list of postcodes (for random selection)
-suburbs = {}            # key=suburb, value=set of the states each suburb occurs in
-suburbsList = []        # A list of suburbs (for random selection)
-streetNames = {}        # key=Street Name, value=set of the postcode each streetname occurs in
-streetNamesList = []    # A list of Street Names (for random selection)
-streetNameTypes = {}    # key=Street Name, value=dict(key=Street Type, value=set(of the states where this Street Name combinatiion occurs
-addresses = {}            # key=SA1, value=set of tuples (StreetNumber, StreetName, StreetType, StreetSuffix, Suburb, State, Postcode, Country, mb, longitude, latitude)
-familyNames = []
-boysnames = []
-girlsnames = []
+MB = None                  # The MeshBlockTable (Mesh Block 2021 code to SA1 code), while the addresses are being read
+streetTypesList = list(streetTypeAbbrev)    # A list of Street Types (for random selection)
+streetTypeIndex = {streetType:i for i, streetType in enumerate(streetTypesList)}   # key=Street Type, value=position in streetTypesList
+referenceDataCache = {}     # key=(inputDir, addressFile, number of family names), value=the ReferenceData loaded from there (see getReferenceData())
+referenceDate = None        # The date that birthdates and ages are relative to (see setReferenceDate()), or None for today
 dvaStates = {'NSW':'N', 'VIC':'V', 'QLD':'Q', 'WA':'W', 'SA':'S', 'TAS':'T', 'ACT':'N', 'NT':'S'}
 dvaWars = [' ', 'A', 'GW', 'X', 'SM', 'SS', 'KM', 'PX', 'P', 'IV']
 dvaLinks = [' ', 'A', 'B', 'C', 'D', 'E']
 dvaTypes = ['GOL', 'WHT', 'ORN']
 # Map all the overseas territories into NSW and WA
 OTstates = {'2':'NSW', '6':'WA'}
+addressCacheVersion = 6    # Change when the structure of the address cache changes
 SA1states = {'1':'NSW', '2':'VIC', '3':'QLD', '4':'SA', '5':'WA', '6':'TAS', '7':'NT', '8':'ACT', '9':'WA'}
 
 
-def getAustralianAddresses(inputDir, addressFile, numPatients):
+def addressCacheFile(inputDir, addressFile):
+    '''
+Return the name of the compiled address cache for this addressFile
+    '''
+    return os.path.join(inputDir, addressFile + '.cache')
+
+
+def addressStoreFile(inputDir, addressFile):
+    '''
+Return the name of the memory mapped address store for this addressFile
+    '''
+    return os.path.join(inputDir, addressFile + '.store')
+
+
+def fileSignature(filename, withHash):
+    '''
+Return the size, modification time and (optionally) the SHA-256 hash of a file
+    '''
+    stat = os.stat(filename)
+    fileHash = None
+    if withHash:
+        sha = hashlib.sha256()
+        with open(filename, 'rb') as fp:
+            for block in iter(lambda: fp.read(1024 * 1024), b''):
+                sha.update(block)
+        fileHash = sha.hexdigest()
+    return (stat.st_size, stat.st_mtime_ns, fileHash)
+
+
+def addressCacheIsCurrent(cacheSignatures, sourceFiles):
+    '''
+Check that the signatures saved in an address cache still match the source files.
+A file whose size and modification time are unchanged is assumed to be unchanged.
+A file of the same size, but with a different modification time (e.g. it has been copied), is checked by hash.
     '''
-Read in Australian Address from the G-NAF CORE data in the addressFile
+    if sorted(cacheSignatures) != sorted(os.path.basename(sourceFile) for sourceFile in sourceFiles):
+        return False
+    for sourceFile in sourceFiles:
+        size, mtime, sourceHash = cacheSignatures[os.path.basename(sourceFile)]
+        if not os.path.isfile(sourceFile):
+            return False
+        thisSize, thisMtime, thisHash = fileSignature(sourceFile, False)
+        if thisSize != size:
+            return False
+        if thisMtime != mtime:
+            thisSize, thisMtime, thisHash = fileSignature(sourceFile, True)
+            if thisHash != sourceHash:
+                return False
+    return True
+
+
+def setMeshBlocks(meshBlocks):
+    '''
+Set up the Mesh Block to SA1 mapping in a worker process (a forked worker will already have it)
     '''
 
     # Declare any globals to which we are going to do assignment!
-    global postcodesList, streetNamesList, SA1list
-
-    # Read in Mesh Block data
-    # MB_CODE_2021,MB_CATEGORY_2021,CHANGE_FLAG_2021,CHANGE_LABEL_2021,SA1_CODE_2021,SA2_CODE_2021,SA2_NAME_2021,SA3_CODE_2021,SA3_NAME_2021,SA4_CODE_2021,SA4_NAME_2021,GCCSA_CODE_2021,GCCSA_NAME_2021,STATE_CODE_2021,STATE_NAME_2021,AUS_CODE_2021,AUS_NAME_2021,AREA_ALBERS_SQKM,ASGS_LOCI_URI_2021
-    logging.info('Reading Mesh Blocks')
-    with zipfile.ZipFile(os.path.join(inputDir, 'MB_2021_AUST.zip')) as zf:
-        with zf.open('MB_2021_AUST.csv', 'r') as mb:
-            mbReader = csv.DictReader(io.TextIOWrapper(mb, encoding='utf-8-sig'), dialect=csv.excel)
-            for row in mbReader:
-                MB[row['MB_CODE_2021']] = row['SA1_CODE_2021']
-                SA2code = row['SA2_CODE_2021']
-                SA2name = row['SA2_NAME_2021']
-                SA2s[SA2code] = SA2name
-                SA4code = row['SA4_CODE_2021']
-                SA4name = row['SA4_NAME_2021']
-                SA4s[SA4code] = SA4name
-                if SA4code not in SA2inSA4:
-                    SA2inSA4[SA4code] = set()
-                SA2inSA4[SA4code].add(SA2code)
-
-    # Read in the G-NAF CORE addresses
-    # ADDRESS_DETAIL_PID|DATE_CREATED|ADDRESS_LABEL|ADDRESS_SITE_NAME|BUILDING_NAME|FLAT_TYPE|FLAT_NUMBER|LEVEL_TYPE|LEVEL_NUMBER|NUMBER_FIRST|NUMBER_LAST|LOT_NUMBER|STREET_NAME|STREET_TYPE|STREET_SUFFIX|LOCALITY_NAME|STATE|POSTCODE|LEGAL_PARCEL_ID|MB_CODE|ALIAS_PRINCIPAL|PRINCIPAL_PID|PRIMARY_SECONDARY|PRIMARY_PID|GEOCODE_TYPE|LONGITUDE|LATITUDE
-    logging.info('Reading addresses')
-    count = 0
-    if addressFile is None:
-        addressFile = 'GNAF_CORE.psv'
-    with open(os.path.join(inputDir, addressFile), 'rt', encoding='utf-8-sig') as gnafCore:
-        gnafReader = csv.DictReader(gnafCore, delimiter='|')
-        for row in gnafReader:
-            if row['MB_CODE'] not in MB:
-                continue
-            if row['STREET_TYPE'] not in streetTypeAbbrev:
-                continue
-            StreetNumber = row['NUMBER_FIRST']
-            StreetName = row['STREET_NAME']
-            StreetType = row['STREET_TYPE']
-            StreetSuffix = row['STREET_SUFFIX']
-            Suburb = row['LOCALITY_NAME']
-            Postcode = row['POSTCODE']
-            # Merge 'Other Territories' back into the nearest state (based on the first digit of the postcode)
-            if row['STATE'] == 'OT':
-                State = OTstates[Postcode[0:1]]
-            else:
-                State = row['STATE']
-            Country = 'AUS'
-            mb = row['MB_CODE']
-            longitude = row['LONGITUDE']
-            latitude = row['LATITUDE']
-
-            # Collect the postcode and suburb stats
-            if Postcode not in postcodes:
-                postcodes[Postcode] = set()
-            postcodes[Postcode].add(State)
-            if Suburb not in suburbs:
-                suburbs[Suburb] = set()
-            suburbs[Suburb].add(State)
-
-            # Collect the SA1 and SA3 stats
-            sa1 = MB[mb]
-            if sa1 not in SA1s:
-                SA1s[sa1] = set()
-            SA1s[sa1].add((longitude, latitude, mb))
-            sa3 = sa1[:5]
-            if sa3 not in SA3s:
-                SA3s[sa3] = set()
-            SA3s[sa3].add(sa1)
-            if sa3 not in SA3postcodes:
-                SA3postcodes[sa3] = set()
-            SA3postcodes[sa3].add(Postcode)
-
-            # Collect the Street Name and Street Type stats
-            if StreetName not in streetNames:
-                streetNames[StreetName] = set()
-            streetNames[StreetName].add(Postcode)
-            if StreetName not in streetNameTypes:
-                streetNameTypes[StreetName] = {}
-            if StreetType not in streetNameTypes[StreetName]:
-                streetNameTypes[StreetName][StreetType] = set()
-            streetNameTypes[StreetName][StreetType].add(State)
-
-            # Assemble the address
-            if sa1 not in addresses:
-                addresses[sa1] = []
-            addresses[sa1].append((StreetNumber, StreetName, StreetType, StreetSuffix, Suburb, State, Postcode, Country, mb, longitude, latitude))
-            count += 1
-            if (count % 100000) == 0:
-                logging.info('%d addresses read in', count)
-    SA1list = list(SA1s)
-    postcodesList = list(postcodes)
-    streetNamesList = list(streetNames)
+    global MB
+
+    if MB is None:
+        MB = meshBlocks
     return
 
 
-def getFamilyNames(inputDir, numFamilyNames):
+def readAddressChunk(filename, heading, start, end):
     '''
-Read in as many real Australian family names as necessary, keeping a profile of popularity
+Read the G-NAF CORE addresses in the byte range start to end of filename
+and return them in an AddressStoreBuilder, plus the postcode, suburb, SA3 and street name indexes for just these addresses
     '''
 
-    # Declare any globals to which we are going to do assignment!
+    builder = AddressStoreBuilder()
+    indexes = {'postcodes':{}, 'suburbs':{}, 'SA3postcodes':{}, 'streetNames':{}, 'streetNameTypes':{}}
+    chunkPostcodes = indexes['postcodes']
+    chunkSuburbs = indexes['suburbs']
+    chunkSA3postcodes = indexes['SA3postcodes']
+    chunkStreetNames = indexes['streetNames']
+    chunkStreetNameTypes = indexes['streetNameTypes']
+    for StreetNumber, StreetName, StreetType, StreetSuffix, Suburb, State, Postcode, mb, longitude, latitude in iterColumns(filename, heading, start, end):
+        if StreetType not in streetTypeAbbrev:
+            continue
+        sa1 = MB.SA1(mb)
+        if sa1 is None:
+            continue
+        # Merge 'Other Territories' back into the nearest state (based on the first digit of the postcode)
+        if State == 'OT':
+            State = OTstates[Postcode[0:1]]
+
+        # Collect the postcode and suburb stats
+        if Postcode not in chunkPostcodes:
+            chunkPostcodes[Postcode] = set()
+        chunkPostcodes[Postcode].add(State)
+        if Suburb not in chunkSuburbs:
+            chunkSuburbs[Suburb] = set()
+        chunkSuburbs[Suburb].add(State)
+
+        # Collect the SA1 and SA3 stats
+        sa3 = sa1[:5]
+        if sa3 not in chunkSA3postcodes:
+            chunkSA3postcodes[sa3] = set()
+        chunkSA3postcodes[sa3].add(Postcode)
+
+        # Collect the Street Name and Street Type stats
+        if StreetName not in chunkStreetNames:
+            chunkStreetNames[StreetName] = set()
+        chunkStreetNames[StreetName].add(Postcode)
+        if StreetName not in chunkStreetNameTypes:
+            chunkStreetNameTypes[StreetName] = {}
+        if StreetType not in chunkStreetNameTypes[StreetName]:
+            chunkStreetNameTypes[StreetName][StreetType] = set()
+        chunkStreetNameTypes[StreetName][StreetType].add(State)
+
+        # Save the address
+        builder.add(sa1, StreetNumber, StreetName, StreetType, StreetSuffix, Suburb, State, Postcode, mb, longitude, latitude)
+    return builder, indexes
+
+
+def selectAbsent(count, gaps, rng):
+    '''
+Return a random position in range(count) that is not one of the present positions.
+The present positions are described by their gaps (position less rank, for the positions in ascending order),
+so the k'th absent position is k plus the number of present positions whose gap is no more than k.
+If every position is present, then return any random position.
+    '''
+    absent = count - len(gaps)
+    if absent <= 0:
+        return rng.randrange(count)
+    k = rng.randrange(absent)
+    return k + bisect.bisect_right(gaps, k)
 
-    profile = {}        # key: popularity, value: list of similar names
-    # Surname,Count
-    dialect = csv.excel
-    with open(os.path.join(inputDir, 'AustralianSurnames.csv'), 'rt', newline='', encoding='utf-8') as csvfile:
-        csvreader = csv.reader(csvfile, dialect)
-        i = 0
-        header = True
-        total = 0
-        for row in csvreader:
-            if header:
-                header = False
-                continue
-            name = row[0]
-            count = int(row[1])
-            count10 = int(count/200)       # Bucket into groups of similarly popular names
-            total += count                  # Total popularity (sample population)
-            if count10 in profile:
-                profile[count10]['sum'] += count
-                profile[count10]['names'].append(name)
-            else:
-                profile[count10] = {}
-                profile[count10]['sum'] = count
-                profile[count10]['names'] = [name]
-            i += 1
-            if i == numFamilyNames:
-                break
 
-    if i < numFamilyNames:
-        print(f'Insufficient family names ({i}) in AustralianFamilyNames.csv for request ({numFamilyNames:d})')
-        logging.shutdown()
-        sys.exit(EX_CONFIG)
+def mkNameTable(profile, nameTable, cumWeights):
+    '''
+Build a names table (familyNames, boysnames or girlsnames) from a profile of popularity (NameTable.buckets()),
+being a list of [pareto fraction, names] for each bucket, in descending order of bucket popularity, followed by a [0.0] sentinel
+    '''
 
+    total = 0
     revProfile = {}             # key: count of bucket popularity, value: bucket key
-    for count, values in profile.items():
-        revProfile[values['sum']] = count
+    for count, (thisSum, names) in profile.items():
+        revProfile[thisSum] = count
+        total += thisSum        # Total popularity (sample population)
 
+    nameTable.clear()
     ttotal = total
     for thisSum in reversed(sorted(revProfile.keys())):                     # total bucket popularity in decending order
-        familyNames.append([])
-        familyNames[-1].append(float(ttotal) / total)                       # pareto fraction popularity (this bucket and all following as fraction of total)
-        familyNames[-1].append(profile[revProfile[thisSum]]['names'])       # The names for this pareto fraction
+        nameTable.append([])
+        nameTable[-1].append(float(ttotal) / total)                         # pareto fraction popularity (this bucket and all following as fraction of total)
+        nameTable[-1].append(profile[revProfile[thisSum]][1])              # The names for this pareto fraction
         ttotal -= thisSum
-    familyNames.append([])
-    familyNames[-1].append(0.0)
+    nameTable.append([])
+    nameTable[-1].append(0.0)
+    mkCumWeights(nameTable, cumWeights)
     return
 
 
-def getBoysnames(inputDir):
+def familyNameShard(familyName, workers):
     '''
-Read in as many real boys names as necessary, keeping a profile of popularity
+Return the shard to which this family name belongs, when the patients are created in workers shards
     '''
+    return zlib.crc32(familyName.encode('utf-8')) % workers
 
-    # Declare any globals to which we are going to do assignment!
-
-    profile = {}
-    dialect = csv.excel
-    with open(os.path.join(inputDir, 'boysnames.csv'), 'rt', newline='', encoding='utf-8') as csvfile:
-        csvreader = csv.reader(csvfile, dialect)
-        total = 0
-        header = True
-        for row in csvreader:
-            if header:
-                header = False
-                continue
-            name = row[0]
-            count = int(row[1])
-            count10 = int(count/2000)
-            total += count
-            if count10 in profile:
-                profile[count10]['sum'] += count
-                profile[count10]['names'].append(name)
-            else:
-                profile[count10] = {}
-                profile[count10]['sum'] = count
-                profile[count10]['names'] = [name]
 
-    revProfile = {}
-    for count, values in profile.items():
-        revProfile[values['sum']] = count
+def mkCumWeights(nameTable, cumWeights):
+    '''
+Compute the cumulative popularity of each bucket in a names table (familyNames, boysnames or girlsnames).
+The names table holds the pareto fraction of each bucket (this bucket and all following as a fraction of the total),
+so the popularity of bucket i is nameTable[i][0] - nameTable[i + 1][0].
+The final, sentinel entry in the names table gets a zero width bucket, so it is never selected.
+    '''
 
-    ttotal = total
-    for thisSum in reversed(sorted(revProfile.keys())):
-        boysnames.append([])
-        boysnames[-1].append(float(ttotal) / total)
-        boysnames[-1].append([])
-        boysnames[-1][1] = profile[revProfile[thisSum]]['names']
-        ttotal -= thisSum
-    boysnames.append([])
-    boysnames[-1].append(0.0)
+    cumWeights.clear()
+    for i in range(len(nameTable) - 1):
+        cumWeights.append(1.0 - nameTable[i + 1][0])
+    cumWeights.append(cumWeights[-1])
     return
 
 
-def getGirlsnames(inputDir):
+class ReferenceData:
     '''
-Read in as many real girls names as necessary, keeping a profile of popularity
+The reference data (family names, boys names, girls names and geocoded addresses) from which random patients are made.
+Each structure is an attribute of the ReferenceData, rather than a module global, so reference data loaded from different places can coexist.
+Reference data, once loaded, is only read, so it can be shared by any number of PopulationGenerators (see getReferenceData()),
+and structures loaded from the same place can be shared, by reference, between ReferenceData objects (see shareGivenNames() and shareAddresses()).
+Every random selection is drawn from a random number stream passed by the caller, so the ReferenceData holds no random state.
     '''
 
-    # Declare any globals to which we are going to do assignment!
-
-    profile = {}
-    dialect = csv.excel
-    with open(os.path.join(inputDir, 'girlsnames.csv'), 'rt', newline='', encoding='utf-8') as csvfile:
-        csvreader = csv.reader(csvfile, dialect)
-        total = 0
-        header = True
-        for row in csvreader:
-            if header:
-                header = False
+    givenNameAttributes = ('boysnames', 'boysnamesCumWeights', 'girlsnames', 'girlsnamesCumWeights', 'givenNamesSource')
+    addressAttributes = ('SA1s', 'SA1list', 'SA3ranges', 'SA3postcodes', 'postcodeSA3', 'SA2s', 'SA4s', 'SA2inSA4',
+                         'postcodes', 'postcodesList', 'suburbs', 'suburbsList', 'streetNames', 'streetNamesList', 'streetNameTypes',
+                         'postcodesNotInState', 'suburbsNotInStates', 'postcodeStreetGaps', 'addressStore', 'addressSource')
+
+    def __init__(self):
+        self.SA1s = {}                # key=SA1, value=tuple(first, last + 1) - the rows in the addressStore for this SA1
+        self.SA1list = []            # A sorted list of SA1s (for random selection), so the SA1s in each SA3 are adjacent
+        self.SA3ranges = {}            # key=SA3, value=tuple(first, last + 1) - the positions in SA1list of the SA1s in each SA3
+        self.SA3postcodes = {}        # key=SA3, value=sorted tuple of the postcodes in each SA3
+        self.postcodeSA3 = {}        # key=postcode, value=the first SA3 (in SA3postcodes) in which the postcode occurs
+        self.SA2s = {}               # key=SA2, value=SA2 name
+        self.SA4s = {}               # key=SA4, value=SA4 name
+        self.SA2inSA4 = {}           # key=SA4, value=sorted tuple of the SA2s in each SA4
+        self.postcodes = {}            # key=postcode, value=set of the states each postcode occurs in
+        self.postcodesList = []        # A list of postcodes (for random selection)
+        self.suburbs = {}            # key=suburb, value=set of the states each suburb occurs in
+        self.suburbsList = []        # A list of suburbs (for random selection)
+        self.streetNames = {}        # key=Street Name, value=set of the postcode each streetname occurs in
+        self.streetNamesList = []    # A list of Street Names (for random selection)
+        self.streetNameTypes = {}    # key=Street Name, value=dict(key=Street Type, value=set(of the states where this Street Name combinatiion occurs
+        self.postcodesNotInState = {}    # key=state, value=tuple of the postcodes that don't occur in that state
+        self.suburbsNotInStates = {}     # key=frozenset of states, value=tuple of the suburbs that occur in none of those states
+        self.postcodeStreetGaps = {}     # key=postcode, value=array of the gaps (position in streetNamesList less rank) of the Street Names in that postcode
+        self.addressStore = None        # The columnar store of addresses (AddressStore), sorted by SA1
+        self.familyNames = []
+        self.boysnames = []
+        self.girlsnames = []
+        self.familyNamesCumWeights = []    # Cumulative popularity of each bucket of familyNames (for bisect/random.choices)
+        self.boysnamesCumWeights = []
+        self.girlsnamesCumWeights = []
+        self.familyNamesSource = None       # Where (and how many) the family names were loaded from - (inputDir, number of family names)
+        self.givenNamesSource = None        # Where the given names were loaded from - inputDir
+        self.addressSource = None           # Where the addresses were loaded from - (inputDir, addressFile)
+
+    def shareGivenNames(self, other):
+        '''
+Share, by reference, the boys names and girls names of another ReferenceData
+        '''
+        for name in self.givenNameAttributes:
+            setattr(self, name, getattr(other, name))
+
+    def shareAddresses(self, other):
+        '''
+Share, by reference, the addresses (and their indexes) of another ReferenceData
+        '''
+        for name in self.addressAttributes:
+            setattr(self, name, getattr(other, name))
+
+
+    def useAddressStore(self, store):
+        '''
+Make this the address store and index the SA1s in it
+        '''
+
+        self.addressStore = store
+        self.SA1s.clear()
+        for sa1 in store.SA1table:
+            self.SA1s[sa1] = store.SA1range(sa1)
+        self.SA1list = list(self.SA1s)
+        self.SA3ranges.clear()
+        for i, sa1 in enumerate(self.SA1list):
+            sa3 = sa1[:5]
+            if sa3 in self.SA3ranges:
+                self.SA3ranges[sa3] = (self.SA3ranges[sa3][0], i + 1)
+            else:
+                self.SA3ranges[sa3] = (i, i + 1)
+
+    def loadAddressCache(self, cacheFile, storeFile, sourceFiles):
+        '''
+Load the address data from the compiled address cache, and memory map the address store, if the cache is current
+        '''
+
+        if not (os.path.isfile(cacheFile) and os.path.isfile(storeFile)):
+            return False
+        try:
+            with open(cacheFile, 'rb') as cf:
+                cache = pickle.load(cf)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError) as detail:
+            logging.warning('Cannot read address cache (%s) - %s', cacheFile, detail)
+            return False
+        if (not isinstance(cache, dict)) or (cache.get('version') != addressCacheVersion):
+            logging.info('Address cache (%s) is from a different version', cacheFile)
+            return False
+        if not addressCacheIsCurrent(cache['sources'], sourceFiles):
+            logging.info('Address cache (%s) is out of date', cacheFile)
+            return False
+        if cache.get('storeSize') != os.path.getsize(storeFile):
+            logging.info('Address store (%s) does not match the address cache', storeFile)
+            return False
+        try:
+            store = AddressStore.load(storeFile)
+        except (OSError, ValueError, KeyError) as detail:
+            logging.warning('Cannot read address store (%s) - %s', storeFile, detail)
+            return False
+        logging.info('Reading address cache (%s)', cacheFile)
+        # Update in place - other modules may have imported these structures
+        for name, structure in self.addressStructures().items():
+            structure.clear()
+            structure.update(cache['data'][name])
+        self.useAddressStore(store)
+        self.indexPostcodeSA3s()
+        self.postcodesList = list(self.postcodes)
+        self.suburbsList = list(self.suburbs)
+        self.streetNamesList = list(self.streetNames)
+        self.clearComplements()
+        return True
+
+    def saveAddressCache(self, cacheFile, storeFile, sourceFiles):
+        '''
+Save the address store and the address data to the compiled address cache.
+Once saved, the address store is memory mapped from the file, rather than held in memory.
+        '''
+
+        logging.info('Writing address store (%s)', storeFile)
+        try:
+            self.addressStore.save(storeFile)
+            self.useAddressStore(AddressStore.load(storeFile))
+        except (OSError, ValueError) as detail:
+            logging.warning('Cannot write address store (%s) - %s', storeFile, detail)
+            return False
+        cache = {}
+        cache['version'] = addressCacheVersion
+        cache['sources'] = {}
+        for sourceFile in sourceFiles:
+            cache['sources'][os.path.basename(sourceFile)] = fileSignature(sourceFile, True)
+        cache['storeSize'] = os.path.getsize(storeFile)
+        cache['data'] = self.addressStructures()
+        logging.info('Writing address cache (%s)', cacheFile)
+        tmpFile = cacheFile + '.tmp'
+        try:
+            with open(tmpFile, 'wb') as cf:
+                pickle.dump(cache, cf, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpFile, cacheFile)
+        except OSError as detail:
+            logging.warning('Cannot write address cache (%s) - %s', cacheFile, detail)
+            if os.path.isfile(tmpFile):
+                os.remove(tmpFile)
+            return False
+        return True
+
+    def addressStructures(self):
+        '''
+The address data structures that are saved in the compiled address cache
+        '''
+        return {'SA3postcodes':self.SA3postcodes, 'SA2s':self.SA2s, 'SA4s':self.SA4s, 'SA2inSA4':self.SA2inSA4,
+                'postcodes':self.postcodes, 'suburbs':self.suburbs, 'streetNames':self.streetNames, 'streetNameTypes':self.streetNameTypes}
+
+    def loadAddresses(self, inputDir, addressFile, numPatients, rebuildCache=False, workers=1):
+        '''
+Read in Australian Address from the compiled address cache, if it is current,
+otherwise from the G-NAF CORE data in the addressFile (using workers processes), and then compile the address cache
+        '''
+
+        if addressFile is None:
+            addressFile = 'GNAF_CORE.psv'
+        cacheFile = addressCacheFile(inputDir, addressFile)
+        storeFile = addressStoreFile(inputDir, addressFile)
+        sourceFiles = [os.path.join(inputDir, 'MB_2021_AUST.zip'), os.path.join(inputDir, addressFile)]
+        self.addressSource = None
+        if (not rebuildCache) and self.loadAddressCache(cacheFile, storeFile, sourceFiles):
+            self.addressSource = (inputDir, addressFile)
+            return
+        self.readAddresses(inputDir, addressFile, numPatients, workers)
+        self.saveAddressCache(cacheFile, storeFile, sourceFiles)
+        self.addressSource = (inputDir, addressFile)
+        return
+
+    def readAddresses(self, inputDir, addressFile, numPatients, workers=1):
+        '''
+Read in Australian Address from the G-NAF CORE data in the addressFile, using workers processes
+        '''
+
+        # Declare any globals to which we are going to do assignment!
+        global MB
+
+        for structure in self.addressStructures().values():
+            structure.clear()
+
+        # Get the Mesh Block to SA1 mapping, and the SA2 and SA4 names, from the compiled mesh block table
+        MB = getMeshBlockTable(inputDir)
+        self.SA2s.update(MB.SA2s())
+        self.SA4s.update(MB.SA4s())
+        self.SA2inSA4.update(MB.SA2inSA4())
+
+        # Read in the G-NAF CORE addresses, in chunks, in parallel if there is more than one worker, and merge them in file order
+        # ADDRESS_DETAIL_PID|DATE_CREATED|ADDRESS_LABEL|ADDRESS_SITE_NAME|BUILDING_NAME|FLAT_TYPE|FLAT_NUMBER|LEVEL_TYPE|LEVEL_NUMBER|NUMBER_FIRST|NUMBER_LAST|LOT_NUMBER|STREET_NAME|STREET_TYPE|STREET_SUFFIX|LOCALITY_NAME|STATE|POSTCODE|LEGAL_PARCEL_ID|MB_CODE|ALIAS_PRINCIPAL|PRINCIPAL_PID|PRIMARY_SECONDARY|PRIMARY_PID|GEOCODE_TYPE|LONGITUDE|LATITUDE
+        logging.info('Reading addresses')
+        builder = None
+        for chunkBuilder, chunkIndexes in mapChunks(os.path.join(inputDir, addressFile), readAddressChunk, (), workers, setMeshBlocks, (MB,)):
+            if builder is None:
+                builder = chunkBuilder
+            else:
+                builder.merge(chunkBuilder)
+            self.mergeAddressIndexes(chunkIndexes)
+            logging.info('%d addresses read in', len(builder.SA1col))
+        if builder is None:         # No addresses
+            builder = AddressStoreBuilder()
+        logging.info('Sorting addresses')
+        self.useAddressStore(builder.finish())
+        self.freezeAddressSets()
+        self.indexPostcodeSA3s()
+        self.postcodesList = list(self.postcodes)
+        self.suburbsList = list(self.suburbs)
+        self.streetNamesList = list(self.streetNames)
+        self.clearComplements()
+        return
+
+    def mergeAddressIndexes(self, indexes):
+        '''
+Merge the postcode, suburb, SA3 and street name indexes of a chunk of addresses (see readAddressChunk()) into the indexes
+        '''
+
+        structures = self.addressStructures()
+        for name in ('postcodes', 'suburbs', 'SA3postcodes', 'streetNames'):
+            structure = structures[name]
+            for key, values in indexes[name].items():
+                if key in structure:
+                    structure[key] |= values
+                else:
+                    structure[key] = values
+        for StreetName, streetTypes in indexes['streetNameTypes'].items():
+            if StreetName not in self.streetNameTypes:
+                self.streetNameTypes[StreetName] = streetTypes
                 continue
-            name = row[0]
-            count = int(row[1])
-            count10 = int(count/2000)
-            total += count
-            if count10 in profile:
-                profile[count10]['sum'] += count
-                profile[count10]['names'].append(name)
+            for StreetType, states in streetTypes.items():
+                if StreetType in self.streetNameTypes[StreetName]:
+                    self.streetNameTypes[StreetName][StreetType] |= states
+                else:
+                    self.streetNameTypes[StreetName][StreetType] = states
+        return
+
+    def freezeAddressSets(self):
+        '''
+Convert the sets of postcodes and SA2s into sorted tuples.
+The iteration order of a set of strings changes from run to run (string hashing is randomised),
+so random selection from a set would not be reproducible, even with a seeded random number generator.
+        '''
+
+        for structure in (self.SA3postcodes, self.SA2inSA4):
+            for key, values in structure.items():
+                structure[key] = tuple(sorted(values))
+        return
+
+    def indexPostcodeSA3s(self):
+        '''
+Index the SA3 of each postcode, so that finding an SA3 for a postcode doesn't require a search of SA3postcodes
+        '''
+        self.postcodeSA3.clear()
+        for sa3, sa3Postcodes in self.SA3postcodes.items():
+            for postcode in sa3Postcodes:
+                if postcode not in self.postcodeSA3:
+                    self.postcodeSA3[postcode] = sa3
+        return
+
+    def clearComplements(self):
+        '''
+Discard the complement indexes (see indexComplements()), as the address data has changed
+        '''
+        self.postcodesNotInState.clear()
+        self.suburbsNotInStates.clear()
+        self.postcodeStreetGaps.clear()
+        return
+
+    def indexComplements(self):
+        '''
+Index the complements of the address data - the postcodes that don't occur in each state and the Street Names that don't occur in each postcode,
+so that a deliberately wrong address (makeRandom) can be drawn directly, rather than by rejecting candidates until one is wrong enough.
+The Street Names in a postcode are held as the gaps (position in streetNamesList less rank) of their positions in streetNamesList,
+which is all that selectAbsent() needs to select a Street Name that is not in the postcode.
+These indexes are only needed to make random addresses, so they are built on first use.
+        '''
+
+        self.clearComplements()
+        states = set()
+        for postcodeStates in self.postcodes.values():
+            states |= postcodeStates
+        for state in sorted(states):
+            self.postcodesNotInState[state] = tuple(postcode for postcode in self.postcodesList if state not in self.postcodes[postcode])
+        positions = {}
+        for position, streetName in enumerate(self.streetNamesList):
+            for postcode in self.streetNames[streetName]:
+                if postcode not in positions:
+                    positions[postcode] = []
+                positions[postcode].append(position)
+        for postcode, postcodePositions in positions.items():
+            self.postcodeStreetGaps[postcode] = array.array('I', (position - rank for rank, position in enumerate(postcodePositions)))
+        return
+
+    def suburbsNotIn(self, states):
+        '''
+Return a tuple of the suburbs that occur in none of these states
+        '''
+        key = frozenset(states)
+        if key not in self.suburbsNotInStates:
+            self.suburbsNotInStates[key] = tuple(suburb for suburb in self.suburbsList if self.suburbs[suburb].isdisjoint(key))
+        return self.suburbsNotInStates[key]
+
+    def randomSA1(self, rng):
+        '''
+Return a randomly selected SA1 (one that contains addresses)
+        '''
+        return rng.choice(self.SA1list)
+
+    def loadFamilyNames(self, inputDir, numFamilyNames):
+        '''
+Read in as many real Australian family names as necessary, keeping a profile of popularity
+        '''
+
+        table = getNameTable(inputDir, 'AustralianSurnames.csv')
+        if len(table) < numFamilyNames:
+            print(f'Insufficient family names ({len(table)}) in AustralianFamilyNames.csv for request ({numFamilyNames:d})')
+            logging.shutdown()
+            sys.exit(EX_CONFIG)
+        limit = None                # Only a whole number of family names limits the names used
+        if (numFamilyNames >= 1) and (numFamilyNames == int(numFamilyNames)):
+            limit = int(numFamilyNames)
+        mkNameTable(table.buckets(200, limit), self.familyNames, self.familyNamesCumWeights)     # Bucket into groups of similarly popular names
+        self.familyNamesSource = (inputDir, numFamilyNames)
+        return
+
+    def loadBoysnames(self, inputDir):
+        '''
+Read in as many real boys names as necessary, keeping a profile of popularity
+        '''
+
+        mkNameTable(getNameTable(inputDir, 'boysnames.csv').buckets(2000), self.boysnames, self.boysnamesCumWeights)
+        return
+
+    def loadGirlsnames(self, inputDir):
+        '''
+Read in as many real girls names as necessary, keeping a profile of popularity
+        '''
+
+        mkNameTable(getNameTable(inputDir, 'girlsnames.csv').buckets(2000), self.girlsnames, self.girlsnamesCumWeights)
+        return
+
+    def selectFamilyName(self, rng):
+        '''
+Randomly select a family name
+        '''
+
+        i = bisect.bisect(self.familyNamesCumWeights, rng.random())
+        familyName = rng.choice(self.familyNames[i][1])
+        return familyName
+
+    def selectFamilyNames(self, count, rng):
+        '''
+Randomly select count family names
+        '''
+
+        buckets = rng.choices(self.familyNames, cum_weights=self.familyNamesCumWeights, k=count)
+        return [rng.choice(bucket[1]) for bucket in buckets]
+
+    def familyNamesShard(self, shard, workers):
+        '''
+Return a copy of this reference data whose family names are just the family names that belong to this shard (see familyNameShard()).
+The popularity of each bucket of family names is scaled by the fraction of its names that are kept, so the family names keep their profile of popularity.
+Everything else is shared, by reference, with this reference data.
+        '''
+
+        buckets = []
+        for i in range(len(self.familyNames) - 1):
+            names = [familyName for familyName in self.familyNames[i][1] if familyNameShard(familyName, workers) == shard]
+            if names:
+                bucketWeight = (self.familyNames[i][0] - self.familyNames[i + 1][0]) * len(names) / len(self.familyNames[i][1])
+                buckets.append((bucketWeight, names))
+        if not buckets:
+            logging.fatal('No family names for shard %d of %d', shard, workers)
+            logging.shutdown()
+            sys.exit(EX_CONFIG)
+        shardReference = copy.copy(self)
+        shardReference.familyNames = []
+        shardReference.familyNamesCumWeights = []
+        total = sum(bucketWeight for bucketWeight, names in buckets)
+        ttotal = total
+        for bucketWeight, names in buckets:
+            shardReference.familyNames.append([ttotal / total, names])      # pareto fraction popularity (this bucket and all following as fraction of total)
+            ttotal -= bucketWeight
+        shardReference.familyNames.append([0.0])
+        mkCumWeights(shardReference.familyNames, shardReference.familyNamesCumWeights)
+        return shardReference
+
+    def selectBoysname(self, rng):
+        '''
+Randomly select a boysname
+        '''
+
+        i = bisect.bisect(self.boysnamesCumWeights, rng.random())
+        boysname = rng.choice(self.boysnames[i][1])
+        return boysname
+
+    def selectBoysnames(self, count, rng):
+        '''
+Randomly select count boysnames
+        '''
+
+        buckets = rng.choices(self.boysnames, cum_weights=self.boysnamesCumWeights, k=count)
+        return [rng.choice(bucket[1]) for bucket in buckets]
+
+    def selectGirlsname(self, rng):
+        '''
+Randomly select a girlsname
+        '''
+
+        i = bisect.bisect(self.girlsnamesCumWeights, rng.random())
+        girlsname = rng.choice(self.girlsnames[i][1])
+        return girlsname
+
+    def selectGirlsnames(self, count, rng):
+        '''
+Randomly select count girlsnames
+        '''
+
+        buckets = rng.choices(self.girlsnames, cum_weights=self.girlsnamesCumWeights, k=count)
+        return [rng.choice(bucket[1]) for bucket in buckets]
+
+    def addressesWithin(self, longitude, latitude, radius):
+        '''
+Return the rows, in the address store, of the addresses within radius (km) of longitude, latitude
+        '''
+        return self.addressStore.grid.within(float(longitude), float(latitude), radius)
+
+    def nearestAddresses(self, longitude, latitude, k=1):
+        '''
+Return the rows, in the address store, of the k addresses nearest to longitude, latitude, nearest first
+        '''
+        return self.addressStore.grid.nearest(float(longitude), float(latitude), k)
+
+    def addressNear(self, near, radius, rng):
+        '''
+Return the row, in the address store, of a random address within radius (km) of near (longitude, latitude),
+or the nearest address if there are none within radius
+        '''
+        longitude, latitude = float(near[0]), float(near[1])
+        row = self.addressStore.grid.randomWithin(longitude, latitude, radius, rng)
+        if row is None:
+            row = self.addressStore.grid.nearest(longitude, latitude, 1)[0]
+        return row
+
+    def mkRandAddress(self, oldSA1, nearby, makeRandom, rng, near=None, radius=None):
+        '''
+        Select an address randomly and/or make up an invalid address
+        If near (longitude, latitude) and radius (km) are specified, then the address (or, for a made up address, the geolocation)
+        is one within radius of near, rather than one in the same SA3 as oldSA1
+        '''
+
+        thisAddr = {}
+        nearRow = None
+        if (near is not None) and (radius is not None):
+            nearRow = self.addressNear(near, radius, rng)
+
+        # Choose a random address. Either an address from the Geocoded National Address Files (G-NAF)
+        # Or a completely made up address made up of a random street name, suburb, postcode etc.
+        if not makeRandom:
+            #streetNo,streetName,streetType,suburb,state,postcode,country,meshblock,longitude,latitude,sa1
+            if nearRow is not None:
+                # Choose a 'nearby' address - one within radius
+                row = nearRow
+                sa1 = self.addressStore.SA1of(row)
+            else:
+                if (oldSA1 is None) or (not nearby):
+                    # Choose a random address
+                    sa1 = rng.choice(self.SA1list)
+                else:
+                    # Choose a 'nearby' address - one in the same SA3
+                    sa1 = self.SA1list[rng.randrange(*self.SA3ranges[oldSA1[:5]])]
+                row = rng.randrange(*self.SA1s[sa1])
+            StreetType = self.addressStore.get(row, 'streetType')
+            StreetSuffix = self.addressStore.get(row, 'streetSuffix')
+            thisAddr['streetNo'] = self.addressStore.get(row, 'streetNo')
+            thisAddr['streetName'] = self.addressStore.get(row, 'streetName')
+            if StreetSuffix == '':
+                thisAddr['streetType'] = StreetType
+                thisAddr['shortStreetType'] = streetTypeAbbrev[StreetType]
             else:
-                profile[count10] = {}
-                profile[count10]['sum'] = count
-                profile[count10]['names'] = [name]
+                thisAddr['streetType'] = StreetType + ' ' + StreetSuffix
+                thisAddr['shortStreetType'] = streetTypeAbbrev[StreetType] + ' ' + StreetSuffix
+            thisAddr['suburb'] = self.addressStore.get(row, 'suburb')
+            thisAddr['state'] = self.addressStore.get(row, 'state')
+            thisAddr['postcode'] = self.addressStore.get(row, 'postcode')
+            thisAddr['country'] = 'AUS'
+            thisAddr['longitude'] = self.addressStore.get(row, 'longitude')
+            thisAddr['latitude'] = self.addressStore.get(row, 'latitude')
+            thisAddr['meshblock'] = self.addressStore.get(row, 'mb')
+            thisAddr['sa1'] = sa1
+        else:
+            # Each part of the address is drawn from the complement of the matching address data, so it is as wrong as the address data allows
+            if not self.postcodesNotInState:
+                self.indexComplements()
+
+            # Choose an SA1 region, state and postcode
+            if nearRow is not None:
+                # Choose the SA1 region of a geolocation within radius
+                sa1 = self.addressStore.SA1of(nearRow)
+                state = SA1states[sa1[:1]]
+                # Choose a postcode from this SA3 region which may cross a state boarder
+                postcode = rng.choice(self.SA3postcodes[sa1[:5]])
+            elif (oldSA1 is None) or (not nearby):
+                # Choose a random SA1 region
+                sa1 = rng.choice(self.SA1list)
+                state = SA1states[sa1[:1]]
+                # Choose a postcode from a different state (any postcode, if every postcode is in this state)
+                otherPostcodes = self.postcodesNotInState.get(state)
+                if not otherPostcodes:
+                    otherPostcodes = self.postcodesList
+                postcode = rng.choice(otherPostcodes)
+            else:
+                # Choose an SA1 region from the same SA3 region
+                sa1 = self.SA1list[rng.randrange(*self.SA3ranges[oldSA1[:5]])]
+                state = SA1states[sa1[:1]]
+                # Choose a postcode from this SA3 region which may cross a state boarder
+                postcode = rng.choice(self.SA3postcodes[oldSA1[:5]])
+            thisAddr['sa1'] = sa1
+            thisAddr['postcode'] = postcode
+            thisAddr['state'] = state
+
+            # Choose a random geolocation from within this SA1 (or the geolocation within radius)
+            if nearRow is not None:
+                row = nearRow
+            else:
+                row = rng.randrange(*self.SA1s[sa1])
+            thisAddr['longitude'] = self.addressStore.get(row, 'longitude')
+            thisAddr['latitude'] = self.addressStore.get(row, 'latitude')
+            thisAddr['meshblock'] = self.addressStore.get(row, 'mb')
+            thisAddr['country'] = 'AUS'
 
-    revProfile = {}
-    for count, values in profile.items():
-        revProfile[values['sum']] = count
+            # Choose a suburb from a different state (and not in the same state(s) as the postcode)
+            otherSuburbs = self.suburbsNotIn(self.postcodes[postcode] | {state})
+            if not otherSuburbs:
+                otherSuburbs = self.suburbsNotIn({state}) or self.suburbsList
+            suburb = rng.choice(otherSuburbs)
+            thisAddr['suburb'] = suburb.upper()
 
-    ttotal = total
-    for thisSum in reversed(sorted(revProfile.keys())):
-        girlsnames.append([])
-        girlsnames[-1].append(float(ttotal) / total)
-        girlsnames[-1].append([])
-        girlsnames[-1][1] = profile[revProfile[thisSum]]['names']
-        ttotal -= thisSum
-    girlsnames.append([])
-    girlsnames[-1].append(0.0)
-    return
+            # Choose as street name that is not in this postcode
+            streetName = self.streetNamesList[selectAbsent(len(self.streetNamesList), self.postcodeStreetGaps.get(postcode, ()), rng)]
+            thisAddr['streetName'] = streetName.upper()
 
+            # Choose a street type that is never paired with this street name in this state
+            pairedTypes = sorted(streetTypeIndex[streetType] for streetType, states in self.streetNameTypes[streetName].items() if state in states)
+            streetType = streetTypesList[selectAbsent(len(streetTypesList), [position - rank for rank, position in enumerate(pairedTypes)], rng)]
+            thisAddr['streetType'] = streetType.upper()
+            thisAddr['shortStreetType'] = streetTypeAbbrev[streetType]
 
-def selectFamilyName():
+            # Assign an random, presumably bogus, house number
+            thisAddr['streetNo'] = '999' + f'{rng.randrange(100):02d}'
+
+        return thisAddr
+
+
+def getReferenceData(inputDir, addressFile, numPatients, workers=1):
     '''
-Randomly select a family name
+Return the reference data (a ReferenceData) required to create numPatients random patients from the data in inputDir and addressFile
+(reading the addresses with workers processes, if the address cache has to be compiled).
+Reference data is never reloaded. Reference data already loaded, from the same place, is returned, or shared by reference, rather than read in again,
+so a request for different reference data never replaces the reference data held by another PopulationGenerator.
     '''
 
-    choice = random.random()
-    # logging.debug('Family name choice (%f)', choice)
-    i = 0
-    while familyNames[i + 1][0] > choice:
-        # logging.debug('Skipping pareto (%f), names (%s)', familyNames[i][0], familyNames[i][1])
-        i += 1
-    familyName = random.choice(familyNames[i][1])
-    return familyName
+    if addressFile is None:
+        addressFile = 'GNAF_CORE.psv'
 
+    # Computer how many family names are likely to be required
+    # In theory you only need n family names and n given names to create n*n patients, and we have 1K girl names
+    # However 4 times a many makes the random selection go faster
+    numFamilyNames = numPatients / 500
+    key = (inputDir, addressFile, numFamilyNames)
+    if key in referenceDataCache:
+        return referenceDataCache[key]
+    reference = ReferenceData()
+    reference.loadFamilyNames(inputDir, numFamilyNames)
+
+    # Then all the boys names, all the girls names and the geocoded address data - shared if they are already loaded
+    for loaded in referenceDataCache.values():
+        if (reference.givenNamesSource is None) and (loaded.givenNamesSource == inputDir):
+            reference.shareGivenNames(loaded)
+        if (reference.addressSource is None) and (loaded.addressSource == (inputDir, addressFile)):
+            reference.shareAddresses(loaded)
+    if reference.givenNamesSource is None:
+        reference.loadBoysnames(inputDir)
+        reference.loadGirlsnames(inputDir)
+        reference.givenNamesSource = inputDir
+    if reference.addressSource is None:
+        reference.loadAddresses(inputDir, addressFile, numPatients, workers=workers)
+    referenceDataCache[key] = reference
+    return reference
+
+
+def mkPercentileTable(sex):
+    '''
+Interpolate the lower and upper height and weight percentiles, for this sex, for every age in months
+    '''
 
-def selectBoysname():
+    table = []
+    for ageMonths in range(961):
+        if ageMonths <= 6:
+            idx = 0
+            base = 0
+            mths = 6
+        elif ageMonths <= 24:
+            idx = 1
+            base = 6
+            mths = 24 - 6
+        elif ageMonths <= 216:
+            idx = 2
+            base = 24
+            mths = 216 - 24
+        elif ageMonths <= 600:
+            idx = 3
+            base = 216
+            mths = 600 - 216
+        else:
+            idx = 4
+            base = 600
+            mths = 960 - 600
+        hMin = ((heightPercentils[sex][idx + 1][0] - heightPercentils[sex][idx][0]) / mths) * (ageMonths - base) + heightPercentils[sex][idx][0]
+        hMax = ((heightPercentils[sex][idx + 1][1] - heightPercentils[sex][idx][1]) / mths) * (ageMonths - base) + heightPercentils[sex][idx][1]
+        wMin = ((weightPercentils[sex][idx + 1][0] - weightPercentils[sex][idx][0]) / mths) * (ageMonths - base) + weightPercentils[sex][idx][0]
+        wMax = ((weightPercentils[sex][idx + 1][1] - weightPercentils[sex][idx][1]) / mths) * (ageMonths - base) + weightPercentils[sex][idx][1]
+        table.append((hMin, hMax, wMin, wMax))
+    # Straight extension for patients over 80
+    table.append((heightPercentils[sex][5][0], heightPercentils[sex][5][1], weightPercentils[sex][5][0], weightPercentils[sex][5][1]))
+    return table
+
+
+for thisSex in heightPercentils:
+    percentileTable[thisSex] = mkPercentileTable(thisSex)
+
+
+def drawUniforms(count, rng):
     '''
-Randomly select a boysname
+Draw count uniform 32 bit random integers, with one call to the random number stream rng
     '''
 
-    choice = random.random()
-    i = 0
-    while boysnames[i + 1][0] > choice:
-        i += 1
-    boysname = random.choice(boysnames[i][1])
-    return boysname
+    uniforms = array.array('I')
+    uniforms.frombytes(rng.getrandbits(uniformBits * count).to_bytes(4 * count, 'little'))
+    if sys.byteorder == 'big':
+        uniforms.byteswap()
+    return uniforms
 
 
-def selectGirlsname():
+def drawDemographics(count, rng):
     '''
-Randomly select a girlsname
+Draw the random demographic values for a block of count patients, a whole column at a time.
+The uniformColumns are uniform 32 bit random integers, all drawn at once, which are scaled or compared with a limit as they are used.
+Normal variates are drawn as N(0, 1) and scaled to each patient's percentiles as they are used.
+If NumPy is installed, every column is drawn as a NumPy array, from a NumPy generator seeded from rng (the measures random number stream),
+so a seeded run is reproducible, but creates different patients than it does without NumPy.
     '''
 
-    choice = random.random()
-    i = 0
-    while girlsnames[i + 1][0] > choice:
-        i += 1
-    girlsname = random.choice(girlsnames[i][1])
-    return girlsname
+    block = {}
+    if numpy is not None:
+        generator = numpy.random.default_rng(rng.getrandbits(128))
+        uniforms = generator.integers(0, uniformRange, size=(len(uniformColumns), count), dtype=numpy.uint32)
+        for k, column in enumerate(uniformColumns):
+            block[column] = uniforms[k].tolist()
+        normals = generator.standard_normal((3, count))
+        block['height'] = normals[0].tolist()
+        block['weight'] = normals[1].tolist()
+        block['hips'] = normals[2].tolist()
+        married = numpy.searchsorted(marriedCumWeights, generator.random(count) * marriedCumWeights[-1], side='right')    # as for random.choices()
+        block['married'] = numpy.array(marriedStatus)[married].tolist()
+        race = numpy.searchsorted(raceCumWeights, generator.random(count) * raceCumWeights[-1], side='right')
+        block['race'] = numpy.array(raceCodes)[race].tolist()
+        return block
+
+    uniforms = drawUniforms(len(uniformColumns) * count, rng)
+    for k, column in enumerate(uniformColumns):
+        block[column] = uniforms[k * count:(k + 1) * count]
+    gauss = rng.gauss
+    block['height'] = [gauss(0.0, 1.0) for j in range(count)]
+    block['weight'] = [gauss(0.0, 1.0) for j in range(count)]
+    block['hips'] = [gauss(0.0, 1.0) for j in range(count)]
+    block['married'] = rng.choices(marriedStatus, cum_weights=marriedCumWeights, k=count)
+    block['race'] = rng.choices(raceCodes, cum_weights=raceCumWeights, k=count)
+    return block
 
 
 def mkLuhn(card):
@@ -536,7 +1177,8 @@ def mkLuhn(card):
 
 weight = [1, 3, 7, 9, 1, 3, 7, 9]
 
-def mkMedicareNo(medicardNo):
+
+def mkMedicareNo(medicardNo, rng):
     '''
     Compute the Medicare card checksum
     '''
@@ -546,11 +1188,54 @@ def mkMedicareNo(medicardNo):
         csum += int(medicardNo[i:i+1]) * thisWeight
     csum %= 10
 
-    return f'{medicardNo}{csum}{random.randint(1,7)}{random.randint(1,5)}'
+    return f'{medicardNo}{csum}{rng.randint(1,7)}{rng.randint(1,5)}'
+
+
+def setReferenceDate(date):
+    '''
+Set the date that birthdates and ages are relative to (None for today), so that a seeded run can be repeated, exactly, on another day
+    '''
+
+    global referenceDate
+    referenceDate = date
+    return
+
+
+def getReferenceDate():
+    '''
+Return the date that birthdates and ages are relative to (see setReferenceDate())
+    '''
+
+    if referenceDate is None:
+        return datetime.date.today()
+    return referenceDate
+
+
+def newRandomStreams():
+    '''
+Return a new, unseeded, set of random number streams (see seedRandom()), one for each subsystem, as for randomStreams
+    '''
+
+    return {name:random.Random() for name in randomStreams}
 
 
+def seedRandom(seed, streams=None):
+    '''
+Seed the random module, and each of the module's random number streams (randomStreams), from seed,
+or, if streams is not None (and isn't randomStreams), seed just the random number streams in streams (see newRandomStreams()).
+Each stream is seeded from seed plus the name of the stream, so the streams are independent of each other.
+    '''
+
+    if streams is None:
+        streams = randomStreams
+    if streams is randomStreams:
+        random.seed(seed)
+    for name, stream in streams.items():
+        stream.seed(f'{seed}/{name}')
+    return
 
-def mkRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR):
+
+def mkRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, workers=1, seed=None):
 
     '''
 Make random Australian test patients. Randomly select a given name (51% female, 49% male) and randomly select a family name.
@@ -577,29 +1262,365 @@ However the calculated height/weight is biased towards the middle using the y =
 Finally, marital status is assigned. All patients less than 18 years old are assigned 'S' for single.
 Of the remaining patients, 51% as assigned 'M' for married, 32% assigned 'S' for single,
 10% are assigned 'D' for divorced and the remaining 7% are assigned 'W' for widowed.
+
+If workers is greater than 1, then the patients are created in 'workers' shards, each by its own process, and merged a block from each shard in turn.
+Each shard streams its patients to the parent process through a bounded queue, so memory doesn't grow with numPatients.
+Each shard is given a disjoint slice of the Medicare, IHI, DVA and CRN number ranges,
+and only the family names that belong to that shard (see familyNameShard()), so the name keys (givenName~familyName) of the shards never collide.
+Each shard draws from just its own family names, rather than drawing from all the family names and rejecting the names of other shards,
+so a shard never spins on names it can't use, and a shard that runs out of names exits, as for a single process.
+Each shard is seeded from seed, the shard number and the number of workers, so a given seed and number of workers is reproducible.
+
+If seed is not None, then the random number streams are seeded (see seedRandom()) and the same seed gives the same patients.
+Names, addresses, identifiers and measures are drawn from separate streams (nameRandom, addressRandom, identifierRandom and measureRandom)
+and the calling script should draw its errors and variations from errorRandom, so that they don't disturb the patients.
 '''
 
+    defaultPopulation(inputDir, addressFile, workers).mkPatients(numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed)
+    return
+
+
+class PopulationGenerator:
+    '''
+A generator of random patients, for one population (patients, being a dictionary of patient records, and patientKeys, a list of their keys).
+A name key (givenName~familyName) already in the population is never reused.
+The reference data (names and addresses) is a ReferenceData, held by reference. Unless one is given, it is loaded when first required (see getReferenceData()),
+and shared, read only, with every other PopulationGenerator using the same data, so a PopulationGenerator can be reused for many populations (see clear()),
+and several populations can coexist, without reloading G-NAF.
+Each PopulationGenerator has its own random number streams (see newRandomStreams()), unless it is given streams to share,
+so a seeded population is reproducible even when its creation is interleaved with the creation of another population.
+    '''
+
+    def __init__(self, inputDir='data', addressFile='GNAF_CORE.psv', workers=1, patients=None, patientKeys=None, reference=None, streams=None):
+        self.inputDir = inputDir
+        self.addressFile = addressFile
+        self.workers = workers
+        self.patients = patients if patients is not None else {}
+        self.patientKeys = patientKeys if patientKeys is not None else []
+        self.reference = reference
+        self.fixedReference = reference is not None
+        self.streams = streams if streams is not None else newRandomStreams()
+
+    def clear(self):
+        '''
+Discard the patients in this population, so that the next population starts afresh
+        '''
+        self.patients.clear()
+        self.patientKeys.clear()
+
+    def seed(self, seed):
+        '''
+Seed this generator's random number streams from seed (see seedRandom())
+        '''
+        seedRandom(seed, self.streams)
+
+    def load(self, numPatients):
+        '''
+Get the reference data required to create numPatients random patients (see getReferenceData()), unless this generator was given its reference data
+        '''
+        if not self.fixedReference:
+            self.reference = getReferenceData(self.inputDir, self.addressFile, min(numPatients, 8000000), self.workers)
+
+    def mkPatients(self, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed=None):
+        '''
+Make random Australian test patients (see mkRandPatients()) and add them to this population
+        '''
+        for me, patient in self.iterPatients(numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed):
+            self.patients[me] = patient
+            self.patientKeys.append(me)
+
+    def iterPatients(self, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed=None):
+        '''
+Make random Australian test patients, as for mkPatients(), but yield them one at a time, as tuples of (key, patient record),
+rather than adding them to this population
+        '''
+        if numPatients > 8000000:
+            numPatients = 8000000
+        self.load(numPatients)
+
+        if self.workers > 1:
+            yield from iterShardedPatients(self.reference, self.inputDir, self.addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, self.workers, seed, self.patients)
+            return
+        if seed is not None:
+            self.seed(seed)
+        yield from genPatients(self.reference, self.streams, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, 0, 1, self.patients)
+
+    def iterPatientBlocks(self, blockSize, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed=None):
+        '''
+Make random Australian test patients, as for iterPatients(), but yield them in lists of up to blockSize (key, patient record) tuples
+        '''
+        block = []
+        for me, patient in self.iterPatients(numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed):
+            block.append((me, patient))
+            if len(block) == blockSize:
+                yield block
+                block = []
+        if block:
+            yield block
+
+    def selectFamilyName(self):
+        '''
+Randomly select a family name from this generator's reference data
+        '''
+        return self.reference.selectFamilyName(self.streams['names'])
+
+    def selectBoysname(self):
+        '''
+Randomly select a boysname from this generator's reference data
+        '''
+        return self.reference.selectBoysname(self.streams['names'])
+
+    def selectGirlsname(self):
+        '''
+Randomly select a girlsname from this generator's reference data
+        '''
+        return self.reference.selectGirlsname(self.streams['names'])
+
+    def randomSA1(self):
+        '''
+Return a randomly selected SA1 from this generator's reference data
+        '''
+        return self.reference.randomSA1(self.streams['addresses'])
+
+    def mkRandAddress(self, oldSA1, nearby, makeRandom, near=None, radius=None):
+        '''
+Select an address randomly and/or make up an invalid address (see ReferenceData.mkRandAddress()) from this generator's reference data
+        '''
+        return self.reference.mkRandAddress(oldSA1, nearby, makeRandom, self.streams['addresses'], near, radius)
+
+
+# The default PopulationGenerator - its population is patients{}/patientKeys[] and its random number streams are the module's streams
+defaultGenerator = PopulationGenerator(patients=patients, patientKeys=patientKeys, streams=randomStreams)
+
+
+def defaultPopulation(inputDir, addressFile, workers=1):
+    '''
+Return the default PopulationGenerator (whose population is patients{}/patientKeys[]), set to use the data in inputDir and addressFile, with workers processes
+    '''
+
+    defaultGenerator.inputDir = inputDir
+    defaultGenerator.addressFile = addressFile
+    defaultGenerator.workers = workers
+    return defaultGenerator
+
+
+def iterRandPatients(inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, workers=1, seed=None):
+    '''
+Make random Australian test patients, as for mkRandPatients(), but yield them one at a time, as tuples of (key, patient record),
+rather than storing them in patients{} and patientKeys[].
+Only the set of name keys is kept, so that names remain distinct; the records themselves are held by the caller, if at all.
+Name keys already in patients{} are never reused.
+    '''
+
+    yield from defaultPopulation(inputDir, addressFile, workers).iterPatients(numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed)
+    return
+
+
+def iterRandPatientBlocks(blockSize, inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, workers=1, seed=None):
+    '''
+Make random Australian test patients, as for iterRandPatients(), but yield them in lists of up to blockSize (key, patient record) tuples
+    '''
+
+    yield from defaultPopulation(inputDir, addressFile, workers).iterPatientBlocks(blockSize, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, seed)
+    return
+
+
+def referenceData():
+    '''
+Return the reference data (a ReferenceData) used by the default PopulationGenerator, or None if no patients have been made
+    '''
+    return defaultGenerator.reference
+
+
+def selectFamilyName():
+    '''
+Randomly select a family name, from the reference data of the default PopulationGenerator, with nameRandom
+    '''
+    return defaultGenerator.selectFamilyName()
+
+
+def selectBoysname():
+    '''
+Randomly select a boysname, from the reference data of the default PopulationGenerator, with nameRandom
+    '''
+    return defaultGenerator.selectBoysname()
+
+
+def selectGirlsname():
+    '''
+Randomly select a girlsname, from the reference data of the default PopulationGenerator, with nameRandom
+    '''
+    return defaultGenerator.selectGirlsname()
+
+
+def randomSA1(rng=None):
+    '''
+Return a randomly selected SA1 (one that contains addresses), from the reference data of the default PopulationGenerator, with rng (addressRandom if None)
+    '''
+    if rng is None:
+        rng = addressRandom
+    return defaultGenerator.reference.randomSA1(rng)
+
+
+def mkRandAddress(oldSA1, nearby, makeRandom, near=None, radius=None):
+    '''
+Select an address randomly and/or make up an invalid address (see ReferenceData.mkRandAddress()),
+from the reference data of the default PopulationGenerator, with addressRandom
+    '''
+    return defaultGenerator.mkRandAddress(oldSA1, nearby, makeRandom, near, radius)
+
+
+def getAustralianAddresses(inputDir, addressFile, numPatients, rebuildCache=False, workers=1):
+    '''
+Read in Australian Address from the compiled address cache, if it is current,
+otherwise from the G-NAF CORE data in the addressFile (using workers processes), and then compile the address cache.
+Return the addresses in a new ReferenceData (see ReferenceData.loadAddresses()).
+    '''
+
+    reference = ReferenceData()
+    reference.loadAddresses(inputDir, addressFile, numPatients, rebuildCache, workers)
+    return reference
+
+
+def shardRange(lo, hi, shard, workers):
+    '''
+Return this shard's disjoint slice (first, last + 1) of the range lo to hi - 1
+    '''
+    size = hi - lo
+    return (lo + size * shard // workers, lo + size * (shard + 1) // workers)
+
+
+def iterShardedPatients(reference, inputDir, addressFile, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, workers, seed, existing=None):
+    '''
+Create the random patients in shards, using a worker process for each shard, and yield them a block from each shard in turn
+(block 0 of shard 0, block 0 of shard 1, ... block 1 of shard 0, ...).
+Each worker passes its blocks of shardBlockSize patients through a queue that holds at most shardQueueBlocks blocks,
+and waits while its queue is full, so only a few blocks of each shard are in memory at once, however many patients are created.
+Each shard is sent just the name keys in existing (the population) whose family name belongs to that shard.
+A forked worker shares the reference data (a ReferenceData) with this process; a spawned worker reads it in for itself (see getReferenceData()).
+    '''
+
+    if seed is None:
+        seed = random.randrange(2**32)
+    shardExisting = [set() for shard in range(workers)]
+    if existing:
+        for me in existing:
+            shardExisting[familyNameShard(me.split('~')[-1], workers)].add(me)
+    if multiprocessing.get_start_method() != 'fork':
+        reference = None
+    logging.info('Creating %d demographic records in %d shards', numPatients, workers)
+    shardQueues = []
+    shardWorkers = []
+    for shard in range(workers):
+        shardPatients = numPatients // workers
+        if shard < numPatients % workers:
+            shardPatients += 1
+        shardArgs = (reference, inputDir, addressFile, numPatients, shardPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, shard, workers, seed, getReferenceDate(), shardExisting[shard])
+        shardQueues.append(multiprocessing.Queue(shardQueueBlocks))
+        shardWorkers.append(multiprocessing.Process(target=patientShardWorker, args=(shardArgs, shardQueues[shard]), daemon=True))
+        shardWorkers[shard].start()
+    count = 0
+    try:
+        active = list(range(workers))
+        while active:
+            stillActive = []
+            for shard in active:
+                block = getShardBlock(shardQueues[shard], shardWorkers[shard], shard)
+                if block is None:        # This shard is finished
+                    continue
+                stillActive.append(shard)
+                for me, patient in block:
+                    if UsedIDs is not None:
+                        if 'medicareNo' in UsedIDs:
+                            UsedIDs['medicareNo'].add(patient['medicareNo'])
+                        if 'IHI' in UsedIDs:
+                            UsedIDs['IHI'].add(patient['IHI'])
+                        if ('dvaNo' in UsedIDs) and (patient['dvaNo'] is not None):
+                            UsedIDs['dvaNo'].add(patient['dvaNo'])
+                        if ('CRNno' in UsedIDs) and (patient['crnNo'] is not None):
+                            UsedIDs['CRNno'].add(int(patient['crnNo'][:-1]))
+                    count += 1
+                    yield me, patient
+            active = stillActive
+    finally:        # Stop any workers that are still running (e.g. the caller didn't need all the patients)
+        for worker in shardWorkers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+    logging.info('%d demographic records merged', count)
+    return
+
+
+def getShardBlock(shardQueue, worker, shard):
+    '''
+Return the next block of patients from this shard's queue, or None if the shard is finished
+    '''
+
+    while True:
+        try:
+            return shardQueue.get(timeout=1)
+        except queue.Empty:
+            if (not worker.is_alive()) and shardQueue.empty():
+                logging.fatal('Shard %d of the demographic records failed (exit code %s)', shard, worker.exitcode)
+                logging.shutdown()
+                sys.exit(EX_SOFTWARE)
+
+
+def patientShardWorker(args, shardQueue):
+    '''
+Create one shard of random patients in a worker process, putting them on shardQueue in lists of up to shardBlockSize (key, patient record) tuples,
+followed by None when the shard is finished
+    '''
+
+    (reference, inputDir, addressFile, totalPatients, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, shard, workers, seed, shardDate, existing) = args
+    if reference is None:      # A spawned (rather than forked) worker has to read the names and addresses for itself
+        reference = getReferenceData(inputDir, addressFile, totalPatients)
+    streams = newRandomStreams()
+    seedRandom(f'{seed}/{shard}/{workers}', streams)
+    setReferenceDate(shardDate)
+    block = []
+    for me, patient in genPatients(reference, streams, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, shard, workers, existing):
+        block.append((me, patient))
+        if len(block) == shardBlockSize:
+            shardQueue.put(block)
+            block = []
+    if block:
+        shardQueue.put(block)
+    shardQueue.put(None)
+
+
+def genPatients(reference, streams, numPatients, extendNames, useShortStreetTypes, makeRandom, minAge, maxAge, mkFamilies, UsedIDs, addUR, shard, workers, existing=None):
+    '''
+Create numPatients random patients, yielding them as (key, patient record) tuples,
+from the names and addresses in reference (a ReferenceData) and drawing from the random number streams in streams (see newRandomStreams()),
+using only this shard's slice of the identifier ranges and the family names that belong to this shard (see ReferenceData.familyNamesShard()),
+and never a name key in existing (a population of patients, or a set of name keys)
+    '''
+
+    if existing is None:
+        existing = patients
+    if workers > 1:
+        reference = reference.familyNamesShard(shard, workers)
+    nameStream = streams['names']
+    addressStream = streams['addresses']
+    identifierStream = streams['identifiers']
+    measureStream = streams['measures']
+
     letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
     mobileSuffix = ['156', '157', '158', '159', '110']
 
-    # Computer how many family names are likely to be required
-    # In theory you only need n family names and n given names to create n*n patients, and we have 1K girl names
-    # However 4 times a many makes the random selection go faster
-    if numPatients > 8000000:
-        numPatients = 8000000
-    numFamilyNames = numPatients / 500
-    getFamilyNames(inputDir, numFamilyNames)
-
-    # Then all the boys names, all the girls names and the geocoded address data
-    getBoysnames(inputDir)
-    getGirlsnames(inputDir)
-    getAustralianAddresses(inputDir, addressFile, numPatients)
+    # Set up the identifier allocators, each over this shard's slice of the identifier range
+    # The allocators never repeat an identifier, so identifiers only need to be checked against any the caller has already used
+    medicareAllocator = IdentifierAllocator(*shardRange(0, 10000000, shard, workers), identifierStream)
+    IHIallocator = IdentifierAllocator(*shardRange(0, 10000000, shard, workers), identifierStream)
+    dvaAllocators = {}      # key=(DVA state code, war code), value=IdentifierAllocator for the number within that file
+    CRNallocator = IdentifierAllocator(*shardRange(900000000, 1000000000, shard, workers), identifierStream)
 
     # Set up any used identifiers - NOTE: Safety Net and Healthcare Care numbers are just CentreLink Customer Reference numbers
-    usedMedicareNo = set()
-    usedIHIno = set()
-    usedDVAno = set()
-    usedCRNno = set()
+    usedMedicareNo = None
+    usedIHIno = None
+    usedDVAno = None
+    usedCRNno = None
     if UsedIDs is not None:
         if 'medicareNo' in UsedIDs:
             usedMedicareNo = UsedIDs['medicareNo']
@@ -611,30 +1632,35 @@ Of the remaining patients, 51% as assigned 'M' for married, 32% assigned 'S' for
             usedCRNno = UsedIDs['CRNno']
 
     logging.info('Creating %d demographic records', numPatients)
+    usedNames = set()       # The name keys already yielded
     familySize = 0
     sameFamilyName = False
     needAddress = True
+    today = getReferenceDate()
     for i in range(numPatients):
+        j = i % demographicsBlockSize
+        if j == 0:
+            block = drawDemographics(min(demographicsBlockSize, numPatients - i), measureStream)
         firstPass = True
         passes = 0
         while True:    # Loop if the random patient name is not distinct
             # logging.debug('mkFamilies: (%s), firstPass (%s)', mkFamilies, firstPass)
-            if random.random() > 0.51:
-                givenName = selectGirlsname()
+            if nameStream.random() > 0.51:
+                givenName = reference.selectGirlsname(nameStream)
                 sex = 'F'
             else:
-                givenName = selectBoysname()
+                givenName = reference.selectBoysname(nameStream)
                 sex = 'M'
             if mkFamilies:
                 if firstPass:
                     if familySize < 1:
-                        familySize = 1 + int(random.betavariate(2, 5)*6)
-                        familyName = selectFamilyName()
+                        familySize = 1 + int(addressStream.betavariate(2, 5)*6)
+                        familyName = reference.selectFamilyName(nameStream)
                         # logging.debug('New family, family name (%s)', familyName)
                         sameFamilyName = False
                         needAddress = True
-                    elif random.random() < 0.1:
-                        familyName = selectFamilyName()
+                    elif addressStream.random() < 0.1:
+                        familyName = reference.selectFamilyName(nameStream)
                         # logging.debug('Same family, new family name (%s)', familyName)
                         sameFamilyName = False
                         needAddress = False
@@ -643,9 +1669,9 @@ Of the remaining patients, 51% as assigned 'M' for married, 32% assigned 'S' for
                         needAddress = False
                 firstPass = False
             else:
-                familyName = selectFamilyName()
+                familyName = reference.selectFamilyName(nameStream)
             me = givenName + '~' + familyName
-            if me not in patients:
+            if (me not in usedNames) and (me not in existing):
                 break
             # logging.debug('duplicate name key:%s', me)
             passes += 1
@@ -655,112 +1681,122 @@ Of the remaining patients, 51% as assigned 'M' for married, 32% assigned 'S' for
                     logging.shutdown()
                     sys.exit(EX_CONFIG)
                 if mkFamilies:
-                    familyName = selectFamilyName()
+                    familyName = reference.selectFamilyName(nameStream)
         if mkFamilies:
             familySize -= 1
         longGivenName = givenName
         longFamilyName = familyName
         if extendNames:
-            letter = random.randrange(25)
+            letter = nameStream.randrange(25)
             longGivenName = givenName + letters[letter:letter+2]
             if not mkFamilies or not sameFamilyName:
-                letter = random.randrange(25)
+                letter = nameStream.randrange(25)
                 longFamilyName = familyName + letters[letter:letter+2]
-        patients[me] = {}
-        patients[me]['givenName'] = longGivenName.upper()
-        patients[me]['familyName'] = longFamilyName.upper()
-        today = datetime.date.today()
+        usedNames.add(me)
+        patient = PatientRecord(useShortStreetTypes, addUR)
+        patient['givenName'] = longGivenName.upper()
+        patient['familyName'] = longFamilyName.upper()
         if maxAge > minAge:
-            ageDays = random.randrange(minAge, maxAge) * 365
+            ageDays = (minAge + ((block['ageYears'][j] * (maxAge - minAge)) >> uniformBits)) * 365
             age = datetime.timedelta(days=ageDays)
             birthdate = today - age
         else:
             ageDays = 0
             birthdate = today
-        patients[me]['birthdate'] = birthdate.isoformat()
-        if (sex == 'M') and (random.random() > 0.98):
-            patients[me]['sex'] = 'U'
+        patient['birthdate'] = birthdate.isoformat()
+        if (sex == 'M') and (block['unknownSex'][j] < unknownSexLimit):
+            patient['sex'] = 'U'
         else:
-            patients[me]['sex'] = sex
+            patient['sex'] = sex
 
         # Create a random address - it does not need to be 'nearby'
         needPhone = False
         if not mkFamilies or needAddress:
-            thisAddr = mkRandAddress(None, False, makeRandom)
+            thisAddr = reference.mkRandAddress(None, False, makeRandom, addressStream)
             needPhone = True
-        patients[me]['streetNo'] = thisAddr['streetNo']
-        patients[me]['streetName'] = thisAddr['streetName']
-        patients[me]['streetType'] = thisAddr['streetType']
-        patients[me]['shortStreetType'] = thisAddr['shortStreetType']
-        patients[me]['suburb'] = thisAddr['suburb']
-        patients[me]['state'] = thisAddr['state']
-        patients[me]['postcode'] = thisAddr['postcode']
-        patients[me]['country'] = 'AUS'
-        patients[me]['longitude'] = thisAddr['longitude']
-        patients[me]['latitude'] = thisAddr['latitude']
-        patients[me]['meshblock'] = thisAddr['meshblock']
-        patients[me]['sa1'] = thisAddr['sa1']
+        patient['streetNo'] = thisAddr['streetNo']
+        patient['streetName'] = thisAddr['streetName']
+        patient['streetType'] = thisAddr['streetType']
+        patient['shortStreetType'] = thisAddr['shortStreetType']
+        patient['suburb'] = thisAddr['suburb']
+        patient['state'] = thisAddr['state']
+        patient['postcode'] = thisAddr['postcode']
+        patient['country'] = 'AUS'
+        patient['longitude'] = thisAddr['longitude']
+        patient['latitude'] = thisAddr['latitude']
+        patient['meshblock'] = thisAddr['meshblock']
+        patient['sa1'] = thisAddr['sa1']
         if needPhone:
-            if patients[me]['postcode'][0:1] == '7':
-                patients[me]['homePhone'] = '035550' + f'{random.randrange(10000):04d}'
-                patients[me]['businessPhone'] = '037010' + f'{random.randrange(10000):04d}'
-            elif patients[me]['postcode'][0:1] == '2':
-                patients[me]['homePhone'] = '025550' + f'{random.randrange(10000):04d}'
-                patients[me]['businessPhone'] = '027010' + f'{random.randrange(10000):04d}'
-            elif patients[me]['postcode'][0:1] == '6':
-                patients[me]['homePhone'] = '085550' + f'{random.randrange(10000):04d}'
-                patients[me]['businessPhone'] = '087010' + f'{random.randrange(10000):04d}'
+            homeSuffix = (block['homePhone'][j] * 10000) >> uniformBits
+            businessSuffix = (block['businessPhone'][j] * 10000) >> uniformBits
+            if patient['postcode'][0:1] == '7':
+                patient['homePhone'] = '035550' + f'{homeSuffix:04d}'
+                patient['businessPhone'] = '037010' + f'{businessSuffix:04d}'
+            elif patient['postcode'][0:1] == '2':
+                patient['homePhone'] = '025550' + f'{homeSuffix:04d}'
+                patient['businessPhone'] = '027010' + f'{businessSuffix:04d}'
+            elif patient['postcode'][0:1] == '6':
+                patient['homePhone'] = '085550' + f'{homeSuffix:04d}'
+                patient['businessPhone'] = '087010' + f'{businessSuffix:04d}'
             else:
-                patients[me]['homePhone'] = '075550' + f'{random.randrange(10000):04d}'
-                patients[me]['businessPhone'] = '077010' + f'{random.randrange(10000):04d}'
-            homePhone = patients[me]['homePhone']
-            businessPhone = patients[me]['businessPhone']
+                patient['homePhone'] = '075550' + f'{homeSuffix:04d}'
+                patient['businessPhone'] = '077010' + f'{businessSuffix:04d}'
+            homePhone = patient['homePhone']
+            businessPhone = patient['businessPhone']
         else:
-            patients[me]['homePhone'] = homePhone
-            patients[me]['businessPhone'] = businessPhone
-        patients[me]['mobile'] = '0491570' + random.choice(mobileSuffix)
-        patients[me]['email'] = longGivenName.lower() + '.' + longFamilyName.lower() + '@his4ehr.com'
+            patient['homePhone'] = homePhone
+            patient['businessPhone'] = businessPhone
+        patient['mobile'] = '0491570' + mobileSuffix[(block['mobile'][j] * len(mobileSuffix)) >> uniformBits]
+        patient['email'] = longGivenName.lower() + '.' + longFamilyName.lower() + '@his4ehr.com'
 
-        while True:        # Loop if the medicareNo is not distinct
-            medicareNo = patients[me]['postcode'][0:1]
+        while True:        # Skip any medicareNo the caller has already used
+            medicareNo = patient['postcode'][0:1]
             if medicareNo in ['0', '7']:
                 medicareNo = '5'
-            medicareNo += f'{random.randint(0, 9999999):07d}'
-            medicareNo = mkMedicareNo(medicareNo)
-            if medicareNo not in usedMedicareNo:
+            medicareNo += f'{medicareAllocator.allocate():07d}'
+            medicareNo = mkMedicareNo(medicareNo, identifierStream)
+            if (usedMedicareNo is None) or (medicareNo not in usedMedicareNo):
                 break
-        usedMedicareNo.add(medicareNo)
-        patients[me]['medicareNo'] = medicareNo
-        while True:        # Loop if the IHIno is not distinct
-            IHIno = 800360990000000 + random.randint(0, 9999999)
+        if usedMedicareNo is not None:
+            usedMedicareNo.add(medicareNo)
+        patient['medicareNo'] = medicareNo
+        while True:        # Skip any IHIno the caller has already used
+            IHIno = 800360990000000 + IHIallocator.allocate()
             IHIno = f'{IHIno:d}{mkLuhn(str(IHIno)):d}'
-            if IHIno not in usedIHIno:
+            if (usedIHIno is None) or (IHIno not in usedIHIno):
                 break
-        usedIHIno.add(IHIno)
-        patients[me]['IHI'] = IHIno
-        percent = random.random() * 100
-        if percent < 5.0:
-            while True:        # Loop if the DVA no is not distinct
-                dva = dvaStates[patients[me]['state']]
-                dva += random.choice(dvaWars)
-                if len(dva) > 3:
-                    dva += f'{random.randint(0, 9999):04d}'
-                elif len(dva) > 2:
-                    dva += f'{random.randint(0, 99999):05d}'
-                else:
-                    dva += f'{random.randint(0, 999999):06d}'
-                dva += random.choice(dvaLinks)
-                if dva not in usedDVAno:
+        if usedIHIno is not None:
+            usedIHIno.add(IHIno)
+        patient['IHI'] = IHIno
+        if block['dva'][j] < dvaLimit:
+            while True:        # Skip any DVA no the caller has already used
+                dvaFile = (dvaStates[patient['state']], identifierStream.choice(dvaWars))
+                dva = dvaFile[0] + dvaFile[1]
+                if dvaFile not in dvaAllocators:
+                    if len(dva) > 3:
+                        digits = 4
+                    elif len(dva) > 2:
+                        digits = 5
+                    else:
+                        digits = 6
+                    dvaAllocators[dvaFile] = (digits, IdentifierAllocator(*shardRange(0, 10**digits, shard, workers), identifierStream))
+                digits, dvaAllocator = dvaAllocators[dvaFile]
+                if len(dvaAllocator) == 0:      # This state and war is full, so try another
+                    continue
+                dva += f'{dvaAllocator.allocate():0{digits}d}'
+                dva += identifierStream.choice(dvaLinks)
+                if (usedDVAno is None) or (dva not in usedDVAno):
                     break
-            usedDVAno.add(dva)
-            patients[me]['dvaNo'] = dva
+            if usedDVAno is not None:
+                usedDVAno.add(dva)
+            patient['dvaNo'] = dva
             if ageDays < 365*21 + 5:
-                patients[me]['dvaType'] = 'GOL'
+                patient['dvaType'] = 'GOL'
             else:
-                patients[me]['dvaType'] = random.choice(dvaTypes)
+                patient['dvaType'] = identifierStream.choice(dvaTypes)
         else:
-            patients[me]['dvaNo'] = None
-            patients[me]['dvaType'] = None
+            patient['dvaNo'] = None
+            patient['dvaType'] = None
         ageYears = today.year - birthdate.year    # Some things (height, weight, marrital status) are age dependant
         ageMonths = ageYears * 12
         if today.month < birthdate.month:
@@ -770,285 +1806,59 @@ Of the remaining patients, 51% as assigned 'M' for married, 32% assigned 'S' for
                 ageMonths = ageMonths - 1
             if birthdate.month == 2 and birthdate.day == 29 and today.day == 28:
                 ageMonths = ageMonths + 1
-        percent = random.random() * 100
-        patients[me]['crnNo'] = None
-        patients[me]['PEN'] = None
-        patients[me]['SEN'] = None
-        patients[me]['HC'] = None
-        if percent < 30.0:          # 30% of Australians have an interaction with CentreLink
-            while True:        # Loop if the CRN no is not distinct
-                crnNo = random.randint(900000000, 999999999)
-                if crnNo not in usedCRNno:
+        patient['crnNo'] = None
+        patient['PEN'] = None
+        patient['SEN'] = None
+        patient['HC'] = None
+        if block['crn'][j] < crnLimit:          # 30% of Australians have an interaction with CentreLink
+            while True:        # Skip any CRN no the caller has already used
+                crnNo = CRNallocator.allocate()
+                if (usedCRNno is None) or (crnNo not in usedCRNno):
                     break
-            usedCRNno.add(crnNo)
-            crnNo = str(crnNo) + random.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
-            patients[me]['crnNo'] = crnNo
-            percent = random.random() * 100
+            if usedCRNno is not None:
+                usedCRNno.add(crnNo)
+            crnNo = str(crnNo) + letters[(block['crnLetter'][j] * len(letters)) >> uniformBits]
+            patient['crnNo'] = crnNo
+            percent = block['crnClass'][j] * 100.0 / uniformRange
             if ageMonths > (65 * 12):           # Seniors can have a pensiono or a senior's healthcare card
                 if percent < 60.0:              # 60% receive an aged care pension
-                    patients[me]['PEN'] = crnNo
+                    patient['PEN'] = crnNo
                 elif percent < 90.0:            # Seniors who don't qualify for the pension do qualify for a senior's healthcare card
-                    patients[me]['SEN'] = crnNo
+                    patient['SEN'] = crnNo
             elif percent < 65.0:                # Non-seniors may qualify for a HealthCare concession card
-                patients[me]['HC'] = crnNo
-        if ageMonths <= 960:
-            if ageMonths <= 6:
-                idx = 0
-                base = 0
-                mths = 6
-            elif ageMonths <= 24:
-                idx = 1
-                base = 6
-                mths = 24 - 6
-            elif ageMonths <= 216:
-                idx = 2
-                base = 24
-                mths = 216 - 24
-            elif ageMonths <= 600:
-                idx = 3
-                base = 216
-                mths = 600 - 216
-            else:
-                idx = 4
-                base = 600
-                mths = 960 - 600
-            hMin = ((heightPercentils[sex][idx + 1][0] - heightPercentils[sex][idx][0]) / mths) * (ageMonths - base) + heightPercentils[sex][idx][0]
-            hMax = ((heightPercentils[sex][idx + 1][1] - heightPercentils[sex][idx][1]) / mths) * (ageMonths - base) + heightPercentils[sex][idx][1]
-            wMin = ((weightPercentils[sex][idx + 1][0] - weightPercentils[sex][idx][0]) / mths) * (ageMonths - base) + weightPercentils[sex][idx][0]
-            wMax = ((weightPercentils[sex][idx + 1][1] - weightPercentils[sex][idx][1]) / mths) * (ageMonths - base) + weightPercentils[sex][idx][1]
-        else:
-            hMin = heightPercentils[sex][5][0]
-            hMax = heightPercentils[sex][5][1]
-            wMin = weightPercentils[sex][5][0]
-            wMax = weightPercentils[sex][5][1]
-        thisHeight = random.normalvariate((hMin + hMax)/2, (hMax - hMin)/4)
-        thisWeight = random.normalvariate((wMin + wMax)/2, (wMax - wMin)/4)
+                patient['HC'] = crnNo
+        hMin, hMax, wMin, wMax = percentileTable[sex][min(ageMonths, 961)]
+        thisHeight = (hMin + hMax)/2 + block['height'][j] * (hMax - hMin)/4
+        thisWeight = (wMin + wMax)/2 + block['weight'][j] * (wMax - wMin)/4
         thisWaist = thisHeight * 0.49                    # a ratio for all ages, both genders for normal, health persons
         thisWaist = thisWaist * (thisWeight/((wMax + wMin)/2))    # scaled by the over/under weight percentage
         if sex == 'M':
-            thisHips = thisWaist / random.normalvariate(0.90, 0.10)
+            thisHips = thisWaist / (0.90 + block['hips'][j] * 0.10)
         else:
-            thisHips = thisWaist / random.normalvariate(0.75, 0.10)
-        patients[me]['height'] = f'{thisHeight:.0f}'
-        patients[me]['weight'] = f'{thisWeight:.1f}'
-        patients[me]['waist'] = f'{thisWaist:.0f}'
-        patients[me]['hips'] = f'{thisHips:.0f}'
+            thisHips = thisWaist / (0.75 + block['hips'][j] * 0.10)
+        patient['height'] = f'{thisHeight:.0f}'
+        patient['weight'] = f'{thisWeight:.1f}'
+        patient['waist'] = f'{thisWaist:.0f}'
+        patient['hips'] = f'{thisHips:.0f}'
         if sex == 'F':
-            patients[me]['title'] = 'MS'
+            patient['title'] = 'MS'
         else:
-            patients[me]['title'] = 'MR'
+            patient['title'] = 'MR'
         if ageMonths <= 216:
-            patients[me]['married'] = 'S'
+            patient['married'] = 'S'
         else:
-            percent = random.randrange(100)
-            if percent < 51:
-                patients[me]['married'] = 'M'
+            married = block['married'][j]
+            patient['married'] = married
+            if married in ['M', 'W']:
                 if sex == 'F':
-                    patients[me]['title'] = 'MRS'
-            elif percent < 51 + 32:
-                patients[me]['married'] = 'S'
-            elif percent < 51 + 32 + 10:
-                patients[me]['married'] = 'D'
-                if (sex == 'F') and (random.randrange(100) < 51):
-                    patients[me]['title'] = 'MRS'
-            else:
-                patients[me]['married'] = 'W'
-                if sex == 'F':
-                    patients[me]['title'] = 'MRS'
-        percent = random.random() * 100
-        if percent > 3.0:
-            race = '4'
-        elif percent > 0.3:
-            race = '1'
-        elif percent > 0.12:
-            race = '2'
-        else:
-            race = '3'
-        patients[me]['race'] = race
-
-        # Setup the HL7 data
-        patients[me]['PID'] = 'PID|1||' + patients[me]['medicareNo'] + '^^^AUSHIC^MC~' + patients[me]['IHI'] + '^^^AUSHIC^NI'    # PID-3 Identifiers
-        if patients[me]['dvaNo'] is not None:
-            patients[me]['PID'] += '~' + patients[me]['dvaNo'] + '^^^AUSDVA'
-            if patients[me]['dvaType'] == 'GOL':
-                patients[me]['PID'] += '^DVG'
-            elif patients[me]['dvaType'] == 'WHT':
-                patients[me]['PID'] += '^DVW'
-            elif patients[me]['dvaType'] == 'ORN':
-                patients[me]['PID'] += '^DVO'
-        if patients[me]['crnNo'] is not None:
-            patients[me]['PID'] += '~' + patients[me]['crnNo'] + '^^^AUSLINK^AN'
-            if patients[me]['PEN'] is not None:
-                patients[me]['PID'] += '~' + patients[me]['PEN'] + '^^^^PEN'
-            if patients[me]['SEN'] is not None:
-                patients[me]['PID'] += '~' + patients[me]['SEN'] + '^^^^SEN'
-            if patients[me]['HC'] is not None:
-                patients[me]['PID'] += '~' + patients[me]['HC'] + '^^^^HC'
-        if addUR:
-            # Add a template for a hospital UR number as an extra repetition
-            patients[me]['PID'] += '~<UR>' + '^^^<AUTH>^MR'
-        patients[me]['PID'] += '||' + patients[me]['familyName'] + '^' + patients[me]['givenName'] + '^^^^^L'            # PID-5 Name
-        patients[me]['PID'] += '||' + patients[me]['birthdate'].replace('-', '')                        # PID-7 Date/Time of Birth
-        patients[me]['PID'] += '|' + patients[me]['sex']                                        # PID-8 Administrative Sex
-        patients[me]['PID'] += '||' + race                                            # PID-10 Race (Aboriginality/Indigenous Status)
-        if (useShortStreetTypes is not None) and useShortStreetTypes:
-            patients[me]['PID'] += '|' + patients[me]['streetNo'] + ' ' + patients[me]['streetName'] + ' ' + patients[me]['shortStreetType']
-        else:
-            patients[me]['PID'] += '|' + patients[me]['streetNo'] + ' ' + patients[me]['streetName'] + ' ' + patients[me]['streetType']
-        patients[me]['PID'] += '^^' + patients[me]['suburb'] + '^' + patients[me]['state'] + '^' + patients[me]['postcode'] + '^AUS^M'                # PID-11 Patient Address
-        patients[me]['PID'] += '||' + '^PRN^PH^^^^^^' + patients[me]['homePhone']                        # PID-13 Phone number - Home, mobile, email
-        patients[me]['PID'] += '~^PRN^CP^^^^^^' + patients[me]['mobile']
-        patients[me]['PID'] += '~^NET^Internet^' + patients[me]['email']
-        patients[me]['PID'] += '|' + '^WPN^PH^^^^^^' + patients[me]['businessPhone']                        # PID-14 Phone number - Business
-        patients[me]['PID'] += '||' + patients[me]['married']                                    # PID-16 Marital Status
-        patients[me]['PID'] += '||||||||||||||N'                                         # PID-30 Patient Death Indicator
-
-        # Set up the LIS2 data
-        patients[me]['LIS2'] = 'P|1|'           # P-1, P-2
-        if addUR:
-            # Add a template for a hospital UR number
-            patients[me]['LIS2'] += '<UR>||'    # P-3, P-4
-        else:
-            patients[me]['LIS2'] += '||'        # P-3, P-4
-        patients[me]['LIS2'] += patients[me]['medicareNo'] + '|' + patients[me]['familyName'] + '^' + patients[me]['givenName']    # P-5, P-6 Patient Name
-        patients[me]['LIS2'] += '||' + patients[me]['birthdate'].replace('-', '')                    # P-8 Birthdate
-        patients[me]['LIS2'] += '|' + patients[me]['sex'] + '|' + race                            # P-9 Patient Sex, P-10 Patient Race-Ethnic Origin (Aboriginality/Indegenous Status)
-        if (useShortStreetTypes is not None) and useShortStreetTypes:
-            patients[me]['LIS2'] += '|' + patients[me]['streetNo'] + ' ' + patients[me]['streetName'] + ' ' + patients[me]['shortStreetType']
-        else:
-            patients[me]['LIS2'] += '|' + patients[me]['streetNo'] + ' ' + patients[me]['streetName'] + ' ' + patients[me]['streetType']
-        patients[me]['LIS2'] += '^' + patients[me]['suburb'] + '^' + patients[me]['state'] + '^' + patients[me]['postcode'] + '^AUS'            # P-11 Patient Address
-        patients[me]['LIS2'] += '||' + patients[me]['homePhone']                            # P-13 Patient Telephone Number
-        patients[me]['LIS2'] += '||||' + patients[me]['height'] + '|' + patients[me]['weight']                # P-17 Patient Height, P-18 Patient Weight
-        patients[me]['LIS2'] += '||||||||||||' + patients[me]['married']                        # P-30 Married Status
-
-        # Set up the LIST data
-        dataList = []
-        dataList.append(patients[me]['title'])
-        dataList.append(patients[me]['familyName'])
-        dataList.append(patients[me]['givenName'])
-        dataList.append(patients[me]['birthdate'])
-        dataList.append(patients[me]['sex'])
-        dataList.append(patients[me]['streetNo'])
-        dataList.append(patients[me]['streetName'])
-        dataList.append(patients[me]['streetType'])
-        dataList.append(patients[me]['shortStreetType'])
-        dataList.append(patients[me]['suburb'])
-        dataList.append(patients[me]['state'])
-        dataList.append(patients[me]['postcode'])
-        dataList.append(patients[me]['longitude'])
-        dataList.append(patients[me]['latitude'])
-        dataList.append(patients[me]['meshblock'])
-        dataList.append(patients[me]['sa1'])
-        dataList.append(patients[me]['country'])
-        dataList.append(patients[me]['mobile'])
-        dataList.append(patients[me]['homePhone'])
-        dataList.append(patients[me]['businessPhone'])
-        dataList.append(patients[me]['email'])
-        dataList.append(patients[me]['medicareNo'])
-        dataList.append(patients[me]['IHI'])
-        dataList.append(patients[me]['dvaNo'])
-        dataList.append(patients[me]['dvaType'])
-        dataList.append(patients[me]['crnNo'])
-        dataList.append(patients[me]['PEN'])
-        dataList.append(patients[me]['SEN'])
-        dataList.append(patients[me]['HC'])
-        dataList.append(patients[me]['height'])
-        dataList.append(patients[me]['weight'])
-        dataList.append(patients[me]['waist'])
-        dataList.append(patients[me]['hips'])
-        dataList.append(patients[me]['married'])
-        dataList.append(patients[me]['race'])
-        patients[me]['LIST'] = dataList
-        patientKeys.append(me)
+                    patient['title'] = 'MRS'
+            elif married == 'D':
+                if (sex == 'F') and (block['divorcedTitle'][j] < divorcedTitleLimit):
+                    patient['title'] = 'MRS'
+        patient['race'] = block['race'][j]
+
+        yield me, patient
         if ((i + 1) % 100000) == 0:
             logging.info('%d demographic records created', i + 1)
-    logging.info('%d demographic records created', i + 1)
+    logging.info('%d demographic records created', numPatients)
     return
-
-
-
-def mkRandAddress(oldSA1, nearby, makeRandom):
-    '''
-    Select an address randomly and/or make up an invalid address
-    '''
-
-    thisAddr = {}
-
-    # Choose a random address. Either an address from the Geocoded National Address Files (G-NAF)
-    # Or a completely made up address made up of a random street name, suburb, postcode etc.
-    if not makeRandom:
-        #streetNo,streetName,streetType,suburb,state,postcode,country,meshblock,longitude,latitude,sa1
-        if (oldSA1 is None) or (not nearby):
-            # Choose a random address
-            sa1 = random.choice(SA1list)
-        else:
-            # Choose a 'nearby' address - one in the same SA3
-            sa1 = random.choice(list(SA3s[oldSA1[:5]]))
-        StreetNumber, StreetName, StreetType, StreetSuffix, Suburb, State, Postcode, Country, mb, longitude, latitude = random.choice(addresses[sa1])
-        thisAddr['streetNo'] = StreetNumber
-        thisAddr['streetName'] = StreetName
-        if StreetSuffix == '':
-            thisAddr['streetType'] = StreetType
-            thisAddr['shortStreetType'] = streetTypeAbbrev[StreetType]
-        else:
-            thisAddr['streetType'] = StreetType + ' ' + StreetSuffix
-            thisAddr['shortStreetType'] = streetTypeAbbrev[StreetType] + ' ' + StreetSuffix
-        thisAddr['suburb'] = Suburb
-        thisAddr['state'] = State
-        thisAddr['postcode'] = Postcode
-        thisAddr['country'] = Country
-        thisAddr['longitude'] = longitude
-        thisAddr['latitude'] = latitude
-        thisAddr['meshblock'] = mb
-        thisAddr['sa1'] = sa1
-    else:
-        # Choose an SA1 region, state and postcode
-        if (oldSA1 is None) or (not nearby):
-            # Choose a random SA1 region
-            sa1 = random.choice(SA1list)
-            state = SA1states[sa1[:1]]
-            # Choose a postcode from a different state
-            postcode = random.choice(postcodesList)
-            while state in postcodes[postcode]:
-                postcode = random.choice(postcodesList)
-        else:
-            # Choose an SA1 region from the same SA3 region
-            sa1 = random.choice(list(SA3s[oldSA1[:5]]))
-            state = SA1states[sa1[:1]]
-            # Choose a postcode from this SA3 region which may cross a state boarder
-            postcode = random.choice(list(SA3postcodes[oldSA1[:5]]))
-        thisAddr['sa1'] = sa1
-        thisAddr['postcode'] = postcode
-        thisAddr['state'] = state
-
-        # Choose a random geolocation from within this SA1
-        longitude, latitude, mb = random.choice(list(SA1s[sa1]))
-        thisAddr['longitude'] = longitude
-        thisAddr['latitude'] = latitude
-        thisAddr['meshblock'] = mb
-        thisAddr['country'] = 'AUS'
-
-        # Choose a suburb from a different state (and not in the same state(s) as the postcode)
-        suburb = random.choice(suburbsList)
-        while (state in suburbs[suburb]) or (state in postcodes[postcode]):
-            suburb = random.choice(suburbsList)
-        thisAddr['suburb'] = suburb.upper()
-
-        # Choose as street name that is not in this postcode
-        streetName = random.choice(streetNamesList)
-        while postcode in streetNames[streetName]:
-            streetName = random.choice(streetNamesList)
-        thisAddr['streetName'] = streetName.upper()
-
-        # Choose a street type that is never paired with this street name in this state
-        streetType = random.choice(list(streetTypeAbbrev))
-        while (streetType in streetNameTypes[streetName]) and (state in streetNameTypes[streetName][streetType]):
-            streetType = random.choice(list(streetTypeAbbrev))
-        thisAddr['streetType'] = streetType.upper()
-        thisAddr['shortStreetType'] = streetTypeAbbrev[streetType]
-
-        # Assign an random, presumably bogus, house number
-        thisAddr['streetNo'] = '999' + f'{random.randrange(100):0.2d}'
-
-    return thisAddr
@@ -0,0 +1,164 @@
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+Single pass, uniformly random sampling (without replacement) from a stream of items
+
+A Reservoir keeps a uniformly random sample of up to 'size' items from a stream of any length,
+using memory proportional to 'size', not the length of the stream.
+Each item is given a random key as it arrives and the reservoir keeps the 'size' items with the smallest keys (bottom-k sampling).
+Every subset of 'size' items is equally likely to have the smallest keys, so the sample is uniform.
+Keeping the keys means that reservoirs of separate parts of a stream can be merged exactly;
+the merged reservoir is a uniformly random sample of the whole stream.
+A StratifiedReservoir keeps a separate Reservoir, with its own quota, for each stratum (e.g. each state).
+
+sampleAbsent() draws a uniformly random sample, without replacement, of the numbers in a range that are absent from a set (e.g. the unused UR numbers),
+without listing them; it samples the ranks of the absent numbers and maps each one back to a number with a binary search of the gaps of the set.
+
+SYNOPSIS
+    from sampling import Reservoir, StratifiedReservoir, sampleAbsent
+
+    reservoir = Reservoir(1000)
+    for row in reader:
+        reservoir.add(row)
+    sample = reservoir.items()
+
+    stratified = StratifiedReservoir({'VIC':1000, 'WA':500})
+    for row in reader:
+        stratified.add(row['STATE'], row)
+    sample = stratified.items()
+
+    skippedURs = sampleAbsent(20, 1000, 1010, array.array('q', [0, 0, 3, 5]), rng)      # Up to 20 of the numbers 1000 to 1010, other than 1000, 1001, 1005 and 1008
+'''
+
+import random
+import heapq
+import bisect
+
+
+class Reservoir:
+    '''
+A uniformly random sample, without replacement, of up to size items from a stream of items
+    '''
+
+    def __init__(self, size, rng=None):
+        if rng is None:
+            rng = random
+        self.size = size
+        self.rng = rng
+        self.heap = []          # A max heap, on key, of (-key, sequence, item) tuples
+        self.seen = 0           # The number of items offered to this reservoir
+        self.sequence = 0       # A tie breaker, so that items are never compared
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, key, item):
+        '''
+Keep item, with this key, if it is one of the size smallest keys so far
+        '''
+        if len(self.heap) < self.size:
+            self.sequence += 1
+            heapq.heappush(self.heap, (-key, self.sequence, item))
+        elif (self.size > 0) and (key < -self.heap[0][0]):
+            self.sequence += 1
+            heapq.heapreplace(self.heap, (-key, self.sequence, item))
+
+    def add(self, item):
+        '''
+Offer item to the reservoir
+        '''
+        self.seen += 1
+        self.push(self.rng.random(), item)
+
+    def merge(self, other):
+        '''
+Merge another reservoir, of a separate part of the stream, into this reservoir
+        '''
+        self.seen += other.seen
+        for negKey, sequence, item in other.heap:
+            self.push(-negKey, item)
+
+    def items(self):
+        '''
+Return the sampled items, in random order (the order of their keys)
+        '''
+        return [item for negKey, sequence, item in sorted(self.heap, reverse=True)]
+
+
+class StratifiedReservoir:
+    '''
+A separate Reservoir for each stratum, each of which is filled up to its own quota.
+Items in a stratum with no quota, and no default quota, are ignored.
+    '''
+
+    def __init__(self, quotas, defaultQuota=None, rng=None):
+        self.quotas = quotas                # key=stratum, value=quota
+        self.defaultQuota = defaultQuota    # The quota for any stratum not in quotas
+        self.rng = rng
+        self.reservoirs = {}                # key=stratum, value=Reservoir
+
+    def __len__(self):
+        return sum(len(reservoir) for reservoir in self.reservoirs.values())
+
+    def reservoir(self, stratum):
+        '''
+Return the Reservoir for this stratum, or None if this stratum has no quota
+        '''
+        reservoir = self.reservoirs.get(stratum)
+        if reservoir is None:
+            quota = self.quotas.get(stratum, self.defaultQuota)
+            if not quota:
+                return None
+            reservoir = self.reservoirs[stratum] = Reservoir(quota, self.rng)
+        return reservoir
+
+    def add(self, stratum, item):
+        '''
+Offer item, from this stratum, to the reservoir
+        '''
+        reservoir = self.reservoir(stratum)
+        if reservoir is not None:
+            reservoir.add(item)
+
+    def merge(self, other):
+        '''
+Merge another stratified reservoir, of a separate part of the stream, into this stratified reservoir
+        '''
+        for stratum, otherReservoir in other.reservoirs.items():
+            reservoir = self.reservoir(stratum)
+            if reservoir is not None:
+                reservoir.merge(otherReservoir)
+
+    def shortfalls(self):
+        '''
+Return a dictionary of the strata that have not filled their quota (key=stratum, value=(number of items, quota))
+        '''
+        shortfalls = {}
+        for stratum, quota in self.quotas.items():
+            if quota and (stratum not in self.reservoirs):
+                shortfalls[stratum] = (0, quota)
+        for stratum, reservoir in self.reservoirs.items():
+            if len(reservoir) < reservoir.size:
+                shortfalls[stratum] = (len(reservoir), reservoir.size)
+        return shortfalls
+
+    def items(self):
+        '''
+Return the sampled items, from every stratum, in random order (the order of their keys)
+        '''
+        entries = []
+        for reservoir in self.reservoirs.values():
+            entries += reservoir.heap
+        return [item for negKey, sequence, item in sorted(entries, key=lambda entry: entry[0], reverse=True)]
+
+
+def sampleAbsent(count, lo, hi, gaps, rng=None):
+    '''
+Return a uniformly random sample of up to count distinct numbers, in random order, from the numbers lo to hi that are absent from a set of numbers.
+The set is described by its gaps (number less lo less rank, for the numbers in ascending order), so the k'th absent number is lo + k
+plus the number of gaps that are no more than k, and the absent numbers are sampled without listing them.
+    '''
+    if rng is None:
+        rng = random
+    absent = hi - lo + 1 - len(gaps)
+    return [lo + k + bisect.bisect_right(gaps, k) for k in rng.sample(range(absent), min(count, absent))]
@@ -6,11 +6,16 @@
 A script to select a subset of GNAF-CORE addresses.
 If the number of addresses in the subset is not specified then the whole of GNAF_CORE.psv is outout,
 but only the columns required for the mkHealth Population - Australia related scripts.
+Otherwise a uniformly random subset of the addresses is selected in a single pass (reservoir sampling),
+so only the selected addresses are held in memory.
+The subset can also be stratified by state, SA4 or SA3, with a quota for each stratum,
+in which case a uniformly random subset of each stratum is selected, again in a single pass.
 
 SYNOPSIS
 $ python selectGNAF.py [-D dataDir|--dataDir=dataDir] [-I GNAFinputfile|--GNAFinputfile=GNAFinputfile]
                        -O GNAFoutputfile|--GNAFoutputfile=GNAFoutputfile
-                       [-n addresses|--addresses=addresses] [-s states|--states=states]
+                       [-n addresses|--addresses=addresses] [-s states|--states=states] [-R seed|--seed=seed]
+                       [-t strata|--strata=strata -q quotas|--quotas=quotas] [-w workers|--workers=workers]
                        [-v loggingLevel|--loggingLevel=loggingLevel]
                        [-L logDir|--logDir=logDir] [-l logfile|--logfile=logfile]
 
@@ -31,6 +36,21 @@ The number of GNAF_CORE addresses in the subset
 -s states|-states=states
 The states to be included in the subset of GNAF_CORE addresses (e.g. -s VIC,WA)
 
+-R seed|--seed=seed
+Seed the random number generators, so that the same seed selects the same subset (default=unseeded)
+
+-t strata|--strata=strata
+Stratify the subset by 'state', 'SA4' or 'SA3' (the SA4 and SA3 are derived from the mesh block of each address)
+
+-q quotas|--quotas=quotas
+The comma separated list of the quota for each stratum (e.g. -t state -q VIC=1000,WA=500 or -t SA4 -q 206=0.25,207=25%,*=100)
+A quota is either a number of addresses, or a proportion (0.25 or 25%) of the number of addresses specified with -n.
+The quota for '*' applies to every stratum not otherwise listed. Strata without a quota are not included in the subset.
+
+-w workers|--workers=workers
+The number of worker processes used to read the GNAF-CORE addresses (default=1)
+The file is split into chunks, which are read in parallel. A seeded subset is reproducible for the same number of workers.
+
 -v loggingLevel|--verbose=loggingLevel
 Set the level of logging that you want.
 
@@ -42,13 +62,15 @@ The name of a logging file where you want all messages captured.
 '''
 
 import sys
-import io
 import os
 import csv
-import zipfile
+import shutil
 import random
 import argparse
 import logging
+from sampling import Reservoir, StratifiedReservoir
+from columnStore import getMeshBlockTable
+from gnafReader import addressColumns, readHeading, columnIndexes, iterColumns, mapChunks
 
 # This next section is plagurised from /usr/include/sysexits.h
 EX_OK = 0        # successful termination
@@ -71,6 +93,123 @@ EX_NOPERM = 77        # permission denied
 EX_CONFIG = 78        # configuration error
 
 
+# Map all the overseas territories into NSW and WA
+OTstates = {'2':'NSW', '6':'WA'}
+
+# The positions of the columns used to select addresses, in the rows returned by iterColumns()
+STATE = addressColumns.index('STATE')
+POSTCODE = addressColumns.index('POSTCODE')
+MB_CODE = addressColumns.index('MB_CODE')
+
+MB = None                  # The MeshBlockTable (Mesh Block 2021 code to SA1 code)
+
+
+def setMeshBlocks(meshBlocks):
+    '''
+Set up the Mesh Block to SA1 mapping in a worker process (a forked worker will already have it)
+    '''
+
+    # Declare any globals to which we are going to do assignment!
+    global MB
+
+    if MB is None:
+        MB = meshBlocks
+
+
+def selectChunk(filename, heading, start, end, statesList, strata, quotas, defaultQuota, noOfAddresses, seed, output):
+    '''
+Select the addresses in the byte range start to end of filename, keeping just the addressColumns of each address.
+Return the number of addresses read, the number selected and the selection; if not sampling, either None,
+if output is a csv writer (the chunk is being read in the caller's process) and the selected addresses have been written to it,
+or the name of a part file of the selected addresses (output being the name of the output file), which the caller appends to the output file,
+or, if sampling, a Reservoir (or StratifiedReservoir) of the sampled addresses, which the caller merges with those of the other chunks.
+    '''
+
+    if seed is None:
+        rng = random.Random()
+    else:
+        rng = random.Random(f'{seed}/{start}')      # Each chunk has its own random number stream
+    if strata is not None:
+        addresses = StratifiedReservoir(quotas, defaultQuota, rng)
+    elif noOfAddresses is not None:
+        addresses = Reservoir(noOfAddresses, rng)
+    else:
+        addresses = None
+        if isinstance(output, str):     # A worker process writes a part file
+            partFile = f'{output}.{start}.part'
+            selection = open(partFile, 'wt', encoding='utf-8', newline="")
+            gnafWriter = csv.writer(selection, delimiter='|')
+        else:                           # This process writes straight to the output file
+            partFile = None
+            gnafWriter = output
+    inCount = outCount = 0
+    for row in iterColumns(filename, heading, start, end):
+        inCount += 1
+        sa1 = MB.SA1(row[MB_CODE])
+        if sa1 is None:
+            continue
+        # Check if a required state
+        if (statesList is not None) or (strata == 'state'):
+            # Merge 'Other Territories' back into the nearest state (based on the first digit of the postcode)
+            State = row[STATE]
+            if State == 'OT':
+                State = OTstates[row[POSTCODE][0:1]]
+            if (statesList is not None) and (State not in statesList):
+                continue
+
+        # Save the address
+        outCount += 1
+        if addresses is None:
+            gnafWriter.writerow(row)
+        elif strata is None:
+            addresses.add(row)
+        elif strata == 'state':
+            addresses.add(State, row)
+        elif strata == 'SA4':
+            addresses.add(sa1[:3], row)
+        else:
+            addresses.add(sa1[:5], row)
+    if addresses is None:
+        if partFile is not None:
+            selection.close()
+        return inCount, outCount, partFile
+    return inCount, outCount, addresses
+
+
+def parseQuotas(quotaList, noOfAddresses):
+    '''
+Convert a comma separated list of stratum=quota into a dictionary of the number of addresses for each stratum.
+A quota is a number of addresses, or a proportion (0.25 or 25%) of noOfAddresses.
+    '''
+
+    quotas = {}
+    for row in csv.reader([quotaList], dialect=csv.excel):
+        for stratumQuota in row:
+            stratum, sep, quota = stratumQuota.partition('=')
+            stratum = stratum.strip()
+            quota = quota.strip()
+            if (sep != '=') or (stratum == '') or (quota == ''):
+                raise ValueError(f'invalid stratum quota ({stratumQuota})')
+            try:
+                if quota.endswith('%'):
+                    proportion = float(quota[:-1]) / 100.0
+                elif '.' in quota:
+                    proportion = float(quota)
+                else:
+                    proportion = None
+                    quotas[stratum] = int(quota)
+            except ValueError:
+                raise ValueError(f'invalid stratum quota ({stratumQuota})') from None
+            if proportion is not None:
+                if noOfAddresses is None:
+                    raise ValueError(f'the quota for stratum ({stratum}) is a proportion, but the number of addresses (-n) was not specified')
+                quotas[stratum] = round(noOfAddresses * proportion)
+            if quotas[stratum] < 0:
+                raise ValueError(f'invalid stratum quota ({stratumQuota})')
+        break
+    return quotas
+
+
 if __name__ == '__main__' :
     '''
 The main code
@@ -89,6 +228,11 @@ The main code
                          help='The name of the file for the subset of GNAF-CORE addresses to be created')
     parser.add_argument ('-n', '--addresses', dest='noOfAddresses', type=int, help='The number of GNAF_CORE addresses to be included in the subset')
     parser.add_argument ('-s', '--states', dest='states', help='The comma separated list of states to be included in the subset (e.g. -s VIC,WA)')
+    parser.add_argument ('-R', '--seed', dest='seed', type=int, help='The seed for the random number generator (default=unseeded)')
+    parser.add_argument ('-t', '--strata', dest='strata', choices=['state', 'SA4', 'SA3'], help='Stratify the subset by state, SA4 or SA3')
+    parser.add_argument ('-w', '--workers', dest='workers', type=int, default=1,
+                         help='The number of worker processes used to read the GNAF-CORE addresses (default=1)')
+    parser.add_argument ('-q', '--quotas', dest='quotas', help='The comma separated list of stratum=quota (e.g. -q VIC=1000,WA=25%%,*=100)')
     parser.add_argument ('-v', '--verbose', dest='loggingLevel', type=int, choices=range(0,5),
                          help='The level of logging\n\t0=CRITICAL,1=ERROR,2=WARNING,3=INFO,4=DEBUG')
     parser.add_argument ('-L', '--logDir', dest='logDir', default='logs',
@@ -129,108 +273,92 @@ The main code
     GNAFoutputfile = args.GNAFoutputfile
     noOfAddresses = args.noOfAddresses
     states = args.states
+    seed = args.seed
     statesList = None
     if states is not None:
         for row in csv.reader([states], dialect=csv.excel):
             statesList = row
             break
+    strata = args.strata
+    workers = args.workers
+    quotas = defaultQuota = None
+    if (strata is None) != (args.quotas is None):
+        logging.critical('Usage error - strata (-t) and quotas (-q) must be specified together')
+        logging.shutdown()
+        sys.exit(EX_USAGE)
+    if strata is not None:
+        try:
+            quotas = parseQuotas(args.quotas, noOfAddresses)
+        except ValueError as detail:
+            logging.critical('Usage error - %s', detail)
+            logging.shutdown()
+            sys.exit(EX_USAGE)
+        defaultQuota = quotas.pop('*', None)
+        addresses = StratifiedReservoir(quotas, defaultQuota)       # A uniformly random sample of each stratum, selected as they are read
+    elif noOfAddresses is not None:
+        addresses = Reservoir(noOfAddresses)        # A uniformly random sample of the addresses, selected as they are read
+    else:
+        addresses = None
 
-    # Read in Mesh Block data
-    # MB_CODE_2021,MB_CATEGORY_2021,CHANGE_FLAG_2021,CHANGE_LABEL_2021,SA1_CODE_2021,SA2_CODE_2021,SA2_NAME_2021,SA3_CODE_2021,SA3_NAME_2021,SA4_CODE_2021,SA4_NAME_2021,GCCSA_CODE_2021,GCCSA_NAME_2021,STATE_CODE_2021,STATE_NAME_2021,AUS_CODE_2021,AUS_NAME_2021,AREA_ALBERS_SQKM,ASGS_LOCI_URI_2021
-    MB = {}                    # key=Mesh Block 2016 code, value=SA1 code
-    logging.info('Reading Mesh Blocks')
-    with zipfile.ZipFile(os.path.join(dataDir, 'MB_2021_AUST.zip')) as zf:
-        with zf.open('MB_2021_AUST.csv', 'r') as mb:
-            mbReader = csv.DictReader(io.TextIOWrapper(mb, encoding='utf-8-sig'), dialect=csv.excel)
-            for row in mbReader:
-                MB[row['MB_CODE_2021']] = row['SA1_CODE_2021']
-
-    # Read in the G-NAF CORE addresses
+    # Get the Mesh Block to SA1 mapping from the compiled mesh block table
+    MB = getMeshBlockTable(dataDir)
+
+    # Read in the G-NAF CORE addresses, in chunks, in parallel if there is more than one worker
     # ADDRESS_DETAIL_PID|DATE_CREATED|ADDRESS_LABEL|ADDRESS_SITE_NAME|BUILDING_NAME|FLAT_TYPE|FLAT_NUMBER|LEVEL_TYPE|LEVEL_NUMBER|NUMBER_FIRST|NUMBER_LAST|LOT_NUMBER|STREET_NAME|STREET_TYPE|STREET_SUFFIX|LOCALITY_NAME|STATE|POSTCODE|LEGAL_PARCEL_ID|MB_CODE|ALIAS_PRINCIPAL|PRINCIPAL_PID|PRIMARY_SECONDARY|PRIMARY_PID|GEOCODE_TYPE|LONGITUDE|LATITUDE
     logging.info('Reading addresses')
-    addresses = []            # list of addresses
-
-    # Map all the overseas territories into NSW and WA
-    OTstates = {'2':'NSW', '6':'WA'}
+    # Only the addressColumns are copied to the subset; all the other columns are stripped out
+    GNAFfile = os.path.join(dataDir, GNAFinputfile)
+    try:
+        columnIndexes(readHeading(GNAFfile)[0])
+    except ValueError as detail:
+        logging.critical('Data error - %s of %s', detail, GNAFinputfile)
+        logging.shutdown()
+        sys.exit(EX_DATAERR)
+    outputFile = os.path.join(dataDir, GNAFoutputfile)
+    if addresses is None:
+        gnafSelection = open(outputFile, 'wt', encoding='utf-8-sig', newline="")
+        gnafWriter = csv.writer(gnafSelection, delimiter='|')
+        gnafWriter.writerow(addressColumns)
+        logging.info('Copying all %s addresses', GNAFinputfile)
     inCount = outCount = 0
-    with open(os.path.join(dataDir, GNAFinputfile), 'rt', encoding='utf-8-sig') as gnafCore:
-        gnafReader = csv.DictReader(gnafCore, delimiter='|')
-        header = True
-        stripColumns = False
-        for row in gnafReader:
-            if header:
-                if 'ADDRESS_DETAIL_PID' in row:
-                    stripColumns = True
-            # Strip out any unnecessary columns if they are present in the input file
-            if stripColumns:
-                del row['ADDRESS_DETAIL_PID']
-                del row['DATE_CREATED']
-                del row['ADDRESS_LABEL']
-                del row['ADDRESS_SITE_NAME']
-                del row['BUILDING_NAME']
-                del row['FLAT_TYPE']
-                del row['FLAT_NUMBER']
-                del row['LEVEL_TYPE']
-                del row['LEVEL_NUMBER']
-                del row['NUMBER_LAST']
-                del row['LOT_NUMBER']
-                del row['LEGAL_PARCEL_ID']
-                del row['ALIAS_PRINCIPAL']
-                del row['PRINCIPAL_PID']
-                del row['PRIMARY_SECONDARY']
-                del row['PRIMARY_PID']
-                del row['GEOCODE_TYPE']
-            if header:
-                heading = row.keys()
-                header = False
-                if noOfAddresses is None:
-                    gnafSelection = open(os.path.join(dataDir, GNAFoutputfile), 'wt', encoding='utf-8-sig', newline="")
-                    gnafWriter = csv.DictWriter(gnafSelection, fieldnames=heading, delimiter='|')
-                    gnafWriter.writeheader()
-                    logging.info('Copying all %s addresses', GNAFinputfile)
-
-            inCount += 1
-            if (inCount % 100000) == 0:
-                logging.info('%d addresses read in', inCount)
-            mb = row['MB_CODE']
-            if mb not in MB:
-                continue
-            # Check if a required state
-            if statesList is not None:
-                # Merge 'Other Territories' back into the nearest state (based on the first digit of the postcode)
-                if row['STATE'] == 'OT':
-                    Postcode = row['POSTCODE']
-                    State = OTstates[Postcode[0:1]]
-                else:
-                    State = row['STATE']
-                if State not in statesList:
-                    continue
-
-            # Save the address
-            if noOfAddresses is None:
-                gnafWriter.writerow(row)
-                outCount += 1
-                if (outCount % 100000) == 0:
-                    logging.info('%d GNAF_CORE addresses selected', outCount)
-                continue
-            addresses.append(row)
+    if (addresses is None) and (workers <= 1):
+        chunkArgs = (statesList, strata, quotas, defaultQuota, noOfAddresses, seed, gnafWriter)      # The one chunk is written straight to the output file
+    else:
+        chunkArgs = (statesList, strata, quotas, defaultQuota, noOfAddresses, seed, outputFile)      # Each chunk is written to a part file
+    for chunkInCount, chunkOutCount, selection in mapChunks(GNAFfile, selectChunk, chunkArgs, workers, setMeshBlocks, (MB,)):
+        inCount += chunkInCount
+        outCount += chunkOutCount
+        if addresses is None:
+            if selection is not None:
+                with open(selection, 'rt', encoding='utf-8', newline="") as part:
+                    shutil.copyfileobj(part, gnafSelection)
+                os.remove(selection)
+            logging.info('%d GNAF_CORE addresses selected', outCount)
+        else:
+            addresses.merge(selection)
+        logging.info('%d addresses read in', inCount)
     logging.info('Total of %d addresses read in', inCount)
 
-    if noOfAddresses is None:
+    if addresses is None:
         gnafSelection.close()
         logging.info('Total of %d GNAF_CORE addresses selected', outCount)
         sys.exit(EX_OK)
 
     # Create the subset of addresses
-    logging.info('Creating %d GNAF_CORE addresses', noOfAddresses)
-    with open(os.path.join(dataDir, GNAFoutputfile), 'wt', encoding='utf-8-sig', newline="") as gnafSelection:
-        gnafWriter = csv.DictWriter(gnafSelection, fieldnames=heading, delimiter='|')
-        gnafWriter.writeheader()
-        for i in range(noOfAddresses):
-            thisAddress = random.randrange(len(addresses))
-            gnafWriter.writerow(addresses[thisAddress])
-            del addresses[thisAddress]
-            if ((i + 1) % 100000) == 0:
-                logging.info('%d GNAF_CORE addresses selected', i + 1)
-    logging.info('Total of %d GNAF_CORE addresses selected', i + 1)
+    if strata is not None:
+        for stratum, (found, quota) in sorted(addresses.shortfalls().items()):
+            logging.warning('Only %d of the %d requested addresses are available for %s (%s)', found, quota, strata, stratum)
+    elif len(addresses) < noOfAddresses:
+        logging.warning('Only %d of the %d requested addresses are available', len(addresses), noOfAddresses)
+    logging.info('Creating %d GNAF_CORE addresses', len(addresses))
+    outCount = 0
+    with open(outputFile, 'wt', encoding='utf-8-sig', newline="") as gnafSelection:
+        gnafWriter = csv.writer(gnafSelection, delimiter='|')
+        gnafWriter.writerow(addressColumns)
+        for row in addresses.items():
+            gnafWriter.writerow(row)
+            outCount += 1
+            if (outCount % 100000) == 0:
+                logging.info('%d GNAF_CORE addresses selected', outCount)
+    logging.info('Total of %d GNAF_CORE addresses selected', outCount)
     sys.exit(EX_OK)
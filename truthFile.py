@@ -0,0 +1,88 @@
+# pylint: disable=invalid-name, line-too-long, pointless-string-statement
+
+'''
+A machine readable record of what was done to the records of a PMI (the ground truth for testing an EMPI or PMI Consolidation solution)
+
+A TruthFile is a CSV file, with a header row, written through one csv.writer on one buffered file,
+so each record costs one writerow() call; there is no per-record string formatting and no logging.
+The columns that hold lists (e.g. the perturbed fields) are written as values separated by '|'.
+
+A linkage file is a truth file, created alongside a PMI file (e.g. master_truth.csv alongside master.csv), with a row for every PMI record,
+giving the PID of the record, the true entity (person) the record belongs to, what was done to the record and which fields were perturbed.
+An entity is named after the PMI file and PID of its first record (e.g. master:500091), so entities are distinct across PMI files,
+and every record of one person (aliases, merges, duplicates and records linked to a master PMI) has the same entity.
+
+SYNOPSIS
+    from truthFile import TruthFile, linkageFields, linkageFile, entityName, readLinkage
+
+    with TruthFile(os.path.join(outputDir, 'truth.csv'), ['PID', 'UR', 'actions', 'perturbed']) as truth:
+        truth.write([PID, UR, actions, perturbed])         # actions and perturbed are lists
+
+    linkage = TruthFile(os.path.join(outputDir, linkageFile('master.csv')), linkageFields)
+    masterEntities = readLinkage(os.path.join(inputDir, linkageFile('master.csv')))       # key=PID, value=entity
+'''
+
+import os
+import csv
+
+linkageFields = ['PID', 'UR', 'entity', 'type', 'perturbed']
+
+
+class TruthFile:
+    '''
+A CSV file of truth records, written through one reused, buffered writer
+    '''
+
+    def __init__(self, filename, fields, bufferSize=1024*1024):
+        self.fields = fields
+        self.file = open(filename, 'wt', newline='', encoding='utf-8', buffering=bufferSize)        # pylint: disable=consider-using-with
+        self.writer = csv.writer(self.file, dialect=csv.excel)
+        self.writer.writerow(fields)
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def write(self, row):
+        '''
+Write one truth record; lists (and tuples) are written as values separated by '|'
+        '''
+        self.writer.writerow(['|'.join(value) if isinstance(value, (list, tuple)) else value for value in row])
+        self.count += 1
+
+    def close(self):
+        '''
+Flush and close the truth file
+        '''
+        if not self.file.closed:
+            self.file.close()
+
+
+def linkageFile(PMIfile):
+    '''
+Return the name of the linkage file for PMIfile (e.g. master_truth.csv for master.csv)
+    '''
+    return f'{os.path.splitext(PMIfile)[0]}_truth.csv'
+
+
+def entityName(PMIfile, PID):
+    '''
+Return the name of the entity whose first record is record PID of PMIfile (e.g. master:500091)
+    '''
+    return f'{os.path.splitext(os.path.basename(PMIfile))[0]}:{PID}'
+
+
+def readLinkage(filename):
+    '''
+Return a dictionary of the entity of each PID in a linkage file, or an empty dictionary if there is no linkage file
+    '''
+    entities = {}
+    if not os.path.isfile(filename):
+        return entities
+    with open(filename, 'rt', newline='', encoding='utf-8') as linkage:
+        for row in csv.DictReader(linkage, dialect=csv.excel):
+            entities[row['PID']] = row['entity']
+    return entities